@@ -1,19 +1,76 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import (Flask, render_template, request, redirect, url_for, flash, send_file, Response, g, has_app_context,
+                   stream_with_context)
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import and_, event, func, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
 import os
+import time
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
 from werkzeug.utils import secure_filename
+from learning_gap_shared import metrics
+from learning_gap_shared.blobstore import BlobStore, hash_file, write_file
+from learning_gap_shared.downloads import init_app as init_downloads, send_material
+from learning_gap_shared.export import FORMATS as EXPORT_FORMATS, check_format, stream_export
+from learning_gap_shared.jobs import JobQueue
+from learning_gap_shared.textextract import make_thumbnail, page_count
+from roster import RosterError, format_summary, import_roster
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///students.db'
+# DATABASE_URL points the app at another database (e.g. the benchmark's synthetic school)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///students.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = 'your_secret_key'
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['THUMBNAIL_FOLDER'] = 'thumbnails'  # mirrors uploads/, kept apart from the uploaded files
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
+# Per-route latency and per-request SQL on /metrics; SLOW_REQUEST_MS logs slow requests with their queries
+app.config['SLOW_REQUEST_MS'] = os.environ.get('SLOW_REQUEST_MS')
+metrics.init_app(app)
+
+# Downloads are cacheable and support Range requests. SENDFILE_MODE 'x-sendfile'
+# or 'x-accel' (nginx, X_ACCEL_PREFIX mapped to uploads/) hands the bytes to the proxy.
+init_downloads(app)
+
+# Rows per page on the dashboards
+DASHBOARD_PAGE_SIZE = 50
+
+# Rows per batch when streaming /teacher/export/submissions
+EXPORT_BATCH_SIZE = 10000
+
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Uploaded materials are stored once by content hash and hard-linked into uploads/
+blob_store = BlobStore()
+
+# Post-upload work (hashing, page counts, thumbnails) runs on a background pool
+# so uploads return as soon as the bytes are stored. Jobs are kept in jobs.db
+# next to this file (JOBS_DB overrides it) and picked up again after a crash;
+# /jobs/<id> reports their status.
+job_queue = JobQueue(os.environ.get('JOBS_DB') or
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+
+@job_queue.handler('inspect_upload')
+def inspect_upload(path, digest=None):
+    if not os.path.exists(path):
+        return {'skipped': 'file no longer exists'}
+    relpath = os.path.relpath(path, app.config['UPLOAD_FOLDER'])
+    thumbnail = make_thumbnail(path, os.path.join(app.config['THUMBNAIL_FOLDER'], relpath + '.png'))
+    return {'file': relpath, 'bytes': os.path.getsize(path),
+            'sha256': digest or hash_file(path), 'pages': page_count(path),
+            'thumbnail': os.path.relpath(thumbnail, app.config['THUMBNAIL_FOLDER']) if thumbnail else None}
+
+# Workers start in a serving process (on its first request, or on the first
+# enqueue), never on import: scripts such as risk_job.py and roster.py import
+# this module and must not run jobs. Starting resumes jobs left queued or
+# running by a previous process.
+@app.before_request
+def start_job_workers():
+    job_queue.start()
+
 db = SQLAlchemy(app)
 
 class Student(db.Model):
@@ -26,6 +83,19 @@ class Student(db.Model):
     progress = db.Column(db.Integer, default=0)
     risk_level = db.Column(db.String(20), default='Low')
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
+    # Risk model features on the scale of its training data, from roster imports (NULL = unknown)
+    days_absent = db.Column(db.Integer)
+    missed_topics = db.Column(db.Integer)
+    avg_marks = db.Column(db.Float)
+    difficulty_score = db.Column(db.Integer)
+    # Features and model version risk_level was last computed from (see risk_job.py)
+    risk_inputs = db.Column(db.String(100))
+
+    __table_args__ = (
+        # Dashboard attendance counts (covering) and per-class paging by id
+        db.Index('ix_student_class_attendance', 'student_class', 'attendance'),
+        db.Index('ix_student_class_id', 'student_class', 'id'),
+    )
 
     def __repr__(self):
         return f'<Student {self.name}>'
@@ -39,6 +109,11 @@ class Material(db.Model):
     uploaded_date = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Student dashboard: a class's materials, newest first
+        db.Index('ix_material_class_uploaded', 'class_id', 'uploaded_date', 'id'),
+    )
+
     def __repr__(self):
         return f'<Material {self.title}>'
 
@@ -55,9 +130,79 @@ class Assignment(db.Model):
     due_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Keyset pagination of a class's submissions, newest first
+        db.Index('ix_assignment_class_submitted', 'class_id', 'submitted_date', 'id'),
+        # Student dashboard: one student's submissions in a class, newest first
+        db.Index('ix_assignment_student_class_submitted', 'student_id', 'class_id', 'submitted_date', 'id'),
+    )
+
     def __repr__(self):
         return f'<Assignment {self.assignment_title}>'
 
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+    context.query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    metrics.record_query(statement, time.perf_counter() - context.query_started)
+
+def query_count():
+    """SQL statements executed so far in the current request/app context"""
+    return g.get('sql_queries', 0)
+
+def ensure_columns():
+    """Add model columns missing from tables created before they existed"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                type_sql = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {type_sql}')
+
+def ensure_indexes():
+    """Create model indexes missing from an existing database"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def upgrade_schema():
+    """Create missing tables, then add columns and indexes missing from existing ones.
+
+    Every step checks before it acts, so this is a no-op on an up-to-date
+    database. When several workers start at once, one may lose a race to
+    create something. Its second pass then finds nothing left to do.
+    """
+    for attempt in range(2):
+        try:
+            db.create_all()
+            ensure_columns()
+            ensure_indexes()
+            return
+        except OperationalError:
+            if attempt:
+                raise
+
+# Bring an existing database up to the models before the first request
+with app.app_context():
+    upgrade_schema()
+
+def encode_cursor(submitted_date, row_id):
+    return f'{submitted_date.isoformat()}_{row_id}'
+
+def decode_cursor(cursor):
+    """Parse a (submitted_date, id) keyset cursor; None if missing or invalid"""
+    try:
+        date_part, id_part = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -65,15 +210,42 @@ def index():
 @app.route('/teacher/dashboard')
 def dashboard():
     selected_class = request.args.get('class', default='8', type=str)
-    students = Student.query.filter_by(student_class=int(selected_class)).all()
-    total_students = len(students)
-    present_today = sum(1 for student in students if student.attendance == 'Present')
+    class_id = int(selected_class)
+    page_size = DASHBOARD_PAGE_SIZE
+
+    # Attendance counts in one grouped query instead of loading every student
+    counts = dict(db.session.query(Student.attendance, func.count(Student.id))
+                  .filter(Student.student_class == class_id)
+                  .group_by(Student.attendance).all())
+    total_students = sum(counts.values())
+    present_today = counts.get('Present', 0)
     absent_today = total_students - present_today
+
+    # One page of students, keyset-paginated on id
+    after_student = request.args.get('after_student', type=int)
+    student_query = Student.query.filter_by(student_class=class_id)
+    if after_student:
+        student_query = student_query.filter(Student.id > after_student)
+    students = student_query.order_by(Student.id).limit(page_size + 1).all()
+    next_student = students[page_size - 1].id if len(students) > page_size else None
+    students = students[:page_size]
+
+    # One page of submissions (most recent first), keyset-paginated on (submitted_date, id)
+    before = decode_cursor(request.args.get('before'))
+    assignment_query = Assignment.query.filter_by(class_id=class_id)
+    if before:
+        assignment_query = assignment_query.filter(tuple_(Assignment.submitted_date, Assignment.id) < before)
+    assignments = (assignment_query
+                   .order_by(Assignment.submitted_date.desc(), Assignment.id.desc())
+                   .limit(page_size + 1).all())
+    next_before = None
+    if len(assignments) > page_size:
+        last = assignments[page_size - 1]
+        next_before = encode_cursor(last.submitted_date, last.id)
+    assignments = assignments[:page_size]
     
-    # Get assignments submitted by students in this class (most recent first)
-    assignments = Assignment.query.filter_by(class_id=int(selected_class)).order_by(Assignment.submitted_date.desc()).all()
-    
-    return render_template('dashboard.html', total_students=total_students, present_today=present_today, absent_today=absent_today, students=students, selected_class=selected_class, assignments=assignments)
+    return render_template('dashboard.html', total_students=total_students, present_today=present_today, absent_today=absent_today, students=students, selected_class=selected_class, assignments=assignments,
+                           next_student=next_student, after_student=after_student, next_before=next_before, before=request.args.get('before'))
 
 @app.route('/teacher/edit/<int:id>', methods=['GET', 'POST'])
 def edit_student(id):
@@ -106,7 +278,8 @@ def teacher_upload(class_id):
             class_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(class_id))
             os.makedirs(class_folder, exist_ok=True)
             filepath = os.path.join(class_folder, filename)
-            file.save(filepath)
+            digest = blob_store.save(file.stream, filepath)
+            job_id = job_queue.enqueue('inspect_upload', path=filepath, digest=digest)
             
             # Save material info to database
             material = Material(
@@ -119,42 +292,94 @@ def teacher_upload(class_id):
             db.session.add(material)
             db.session.commit()
             
-            flash('Material uploaded successfully!', 'success')
+            flash(f'Material uploaded successfully! Processing in the background (job #{job_id}).', 'success')
             return redirect(url_for('teacher_upload', class_id=class_id))
         else:
             flash('Invalid file type', 'error')
     
     return render_template('teacher_upload.html', class_id=class_id)
 
+@app.route('/teacher/roster/import', methods=['GET', 'POST'])
+def import_roster_upload():
+    summary = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(request.url)
+        try:
+            # Streamed from the upload in chunks; existing students are upserted, never dropped
+            summary = import_roster(db.session, Student.__table__, file.stream, file.filename)
+        except RosterError as e:
+            flash(str(e), 'error')
+            return redirect(request.url)
+        app.logger.info(f'Roster import from {file.filename}: {format_summary(summary)}')
+        flash(format_summary(summary), 'success' if not summary['invalid'] else 'warning')
+    return render_template('import_roster.html', summary=summary)
+
+def load_student_dashboard(class_id, roll_number=None, materials_before=None, submissions_before=None,
+                           page_size=DASHBOARD_PAGE_SIZE):
+    """Columns the student dashboard renders, in at most two statements.
+
+    The current student and one page of their submissions come from a single
+    outer join; one page of the class's materials is the second statement.
+    Both lists are newest first with (date, id) keyset cursors.
+    """
+    data = {'current_student': None, 'student_submissions': [], 'next_submissions': None}
+
+    if roll_number:
+        join_on = and_(Assignment.student_id == Student.id, Assignment.class_id == class_id)
+        if submissions_before:
+            join_on = and_(join_on, tuple_(Assignment.submitted_date, Assignment.id) < submissions_before)
+        rows = (db.session.query(Student.id, Student.name, Student.roll_number, Student.attendance,
+                                 Student.progress, Student.risk_level,
+                                 Assignment.id.label('submission_id'), Assignment.assignment_title,
+                                 Assignment.subject, Assignment.submitted_date, Assignment.filename,
+                                 Assignment.class_id)
+                .select_from(Student)
+                .outerjoin(Assignment, join_on)
+                .filter(Student.roll_number == roll_number)
+                .order_by(Assignment.submitted_date.desc(), Assignment.id.desc())
+                .limit(page_size + 1).all())
+        if rows:
+            first = rows[0]
+            data['current_student'] = {
+                'id': first.id, 'name': first.name, 'roll_number': first.roll_number,
+                'attendance': first.attendance, 'progress': first.progress, 'risk_level': first.risk_level,
+            }
+            submissions = [row for row in rows if row.submission_id is not None]
+            if len(submissions) > page_size:
+                last = submissions[page_size - 1]
+                data['next_submissions'] = encode_cursor(last.submitted_date, last.submission_id)
+            data['student_submissions'] = submissions[:page_size]
+
+    material_query = (db.session.query(Material.id, Material.title, Material.subject,
+                                       Material.filename, Material.uploaded_date)
+                      .filter(Material.class_id == class_id))
+    if materials_before:
+        material_query = material_query.filter(tuple_(Material.uploaded_date, Material.id) < materials_before)
+    materials = (material_query.order_by(Material.uploaded_date.desc(), Material.id.desc())
+                 .limit(page_size + 1).all())
+    data['next_materials'] = None
+    if len(materials) > page_size:
+        last = materials[page_size - 1]
+        data['next_materials'] = encode_cursor(last.uploaded_date, last.id)
+    data['materials'] = materials[:page_size]
+    return data
+
 @app.route('/student/dashboard')
 def student_dashboard():
     selected_class = request.args.get('class', default='8', type=str)
     roll_number = request.args.get('roll', default=None, type=str)
     
-    # Get current student - use roll number from query param
-    current_student = None
-    if roll_number:
-        current_student = Student.query.filter_by(roll_number=roll_number).first()
-    
-    all_students = Student.query.filter_by(student_class=int(selected_class)).all()
-    
-    # Get uploaded materials for this class with dates
-    materials = Material.query.filter_by(class_id=int(selected_class)).all()
-    
-    # Get student's own submissions
-    student_submissions = []
-    if current_student:
-        student_submissions = Assignment.query.filter_by(
-            student_id=current_student.id,
-            class_id=int(selected_class)
-        ).all()
-    
+    data = load_student_dashboard(int(selected_class), roll_number,
+                                  materials_before=decode_cursor(request.args.get('materials_before')),
+                                  submissions_before=decode_cursor(request.args.get('submissions_before')))
+
     return render_template('student_dashboard.html', 
-                         students=all_students, 
                          selected_class=selected_class,
-                         current_student=current_student,
-                         materials=materials,
-                         student_submissions=student_submissions)
+                         roll_number=roll_number,
+                         **data)
 
 @app.route('/student/upload/<int:class_id>', methods=['GET', 'POST'])
 def student_upload(class_id):
@@ -182,7 +407,8 @@ def student_upload(class_id):
             student_folder = os.path.join(app.config['UPLOAD_FOLDER'], f'class_{class_id}_submissions')
             os.makedirs(student_folder, exist_ok=True)
             filepath = os.path.join(student_folder, filename)
-            file.save(filepath)
+            write_file(filepath, file.stream)  # replaces, never writes through, an existing file
+            job_queue.enqueue('inspect_upload', path=filepath)
             
             # Save assignment submission to database
             assignment = Assignment(
@@ -209,6 +435,58 @@ def student_upload(class_id):
     
     return render_template('student_upload.html', class_id=class_id)
 
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'error': 'Job not found'}, 404
+    return job
+
+# (name, type) of each exported Assignment column, as learning_gap_shared.export expects
+SUBMISSION_EXPORT_COLUMNS = [('id', 'int'), ('student_id', 'int'), ('student_name', 'text'),
+                             ('roll_number', 'text'), ('class_id', 'int'), ('assignment_title', 'text'),
+                             ('subject', 'text'), ('filename', 'text'), ('submitted_date', 'text'),
+                             ('due_date', 'text'), ('created_at', 'text')]
+
+def export_day(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} must be a date like 2026-01-31, not {value!r}')
+
+# Streamed dump of submissions: ?format=csv|parquet|arrow&class=8&subject=Maths&from=2026-01-01&to=2026-03-31
+@app.route('/teacher/export/submissions')
+def export_submissions():
+    output_format = request.args.get('format', 'csv')
+    query = db.select(*(Assignment.__table__.c[name] for name, _ in SUBMISSION_EXPORT_COLUMNS))
+    try:
+        check_format(output_format)
+        if request.args.get('class'):
+            if not request.args['class'].isdigit():
+                raise ValueError(f"class must be a number, not {request.args['class']!r}")
+            query = query.where(Assignment.class_id == int(request.args['class']))
+        if request.args.get('subject'):
+            query = query.where(Assignment.subject == request.args['subject'])
+        if request.args.get('from'):
+            query = query.where(Assignment.submitted_date >= export_day(request.args['from'], 'from'))
+        if request.args.get('to'):
+            query = query.where(Assignment.submitted_date < export_day(request.args['to'], 'to') + timedelta(days=1))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    def batches():
+        # yield_per steps the cursor EXPORT_BATCH_SIZE rows at a time instead of loading the result
+        result = db.session.execute(query.order_by(Assignment.id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    mimetype, extension = EXPORT_FORMATS[output_format]
+    body = stream_export(SUBMISSION_EXPORT_COLUMNS, batches(), output_format)
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=submissions.{extension}'})
+
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf', 'txt', 'doc', 'docx', 'png', 'jpg', 'jpeg', 'gif', 'xlsx', 'xls'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -216,17 +494,16 @@ def allowed_file(filename):
 @app.route('/uploads/<path:filepath>')
 def download_file(filepath):
     try:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filepath)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        else:
-            flash('File not found', 'error')
-            return redirect(url_for('student_dashboard'))
+        return send_material(app.config['UPLOAD_FOLDER'], filepath)
+    except NotFound:
+        flash('File not found', 'error')
+        return redirect(url_for('student_dashboard'))
+    except RequestedRangeNotSatisfiable:
+        raise  # 416 tells a resuming client its range is past the end
     except Exception as e:
         flash(f'Error downloading file: {str(e)}', 'error')
         return redirect(url_for('student_dashboard'))
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()  # Create database tables
+    job_queue.start()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""Dashboard latency on a synthetic school.
+
+Builds a throwaway students database with students, materials and
+submissions spread over classes 1-12. The app reads it through
+DATABASE_URL. The script then times /teacher/dashboard and
+/student/dashboard through the Flask test client. Results use the JSON
+format of learning-gap-ml/benchmark.py, whose suite runs this script.
+
+Usage (run from the app directory):
+
+    python dashboard_benchmark.py --students 9500 --submissions 1000000 --output dashboards.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Timing and result helpers are shared with the ML app's benchmark suite
+ML_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'learning-gap-ml')
+sys.path.append(ML_APP_DIR)
+from benchmark import measure, ok, print_stats, save_results, suite_metadata  # noqa: E402
+
+CLASSES = list(range(1, 13))
+SUBJECTS = ['Maths', 'Science', 'English', 'History', 'Geography']
+CHUNK_SIZE = 5000
+
+
+def insert_chunks(db, table, rows):
+    """executemany INSERTs of CHUNK_SIZE rows, one transaction each"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+
+
+def build_school(students, materials, submissions, seed):
+    """Fill the (empty) DATABASE_URL database; the same arguments give the same data"""
+    from app import db, Assignment, Material, Student
+
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    db.create_all()
+
+    insert_chunks(db, Student.__table__, (
+        {'name': f'Student {i}', 'roll_number': f'R{i}', 'student_class': CLASSES[i % len(CLASSES)],
+         'section': 'AB'[i % 2], 'attendance': rng.choice(('Present', 'Absent')),
+         'progress': rng.randint(0, 100), 'risk_level': rng.choice(('Low', 'Medium', 'High')),
+         'last_active': start}
+        for i in range(students)))
+    insert_chunks(db, Material.__table__, (
+        {'filename': f'material{i}.pdf', 'class_id': CLASSES[i % len(CLASSES)], 'title': f'Material {i}',
+         'subject': rng.choice(SUBJECTS), 'uploaded_date': start + timedelta(minutes=rng.randrange(525600)),
+         'created_at': start}
+        for i in range(materials)))
+
+    def submission():
+        i = rng.randrange(students)  # student ids follow insert order
+        return {'student_id': i + 1, 'student_name': f'Student {i}', 'roll_number': f'R{i}',
+                'class_id': CLASSES[i % len(CLASSES)], 'filename': 'answer.pdf',
+                'assignment_title': f'Assignment {rng.randrange(5000)}', 'subject': rng.choice(SUBJECTS),
+                'submitted_date': start + timedelta(minutes=rng.randrange(525600)),
+                'due_date': start, 'created_at': start}
+    insert_chunks(db, Assignment.__table__, (submission() for _ in range(submissions)))
+
+
+def run(students, repeats, seed):
+    from app import app
+
+    app.config['TESTING'] = True  # also enforces the student dashboard's query budget
+    client = app.test_client()
+    rng = random.Random(seed)
+    results = {}
+
+    def timed(name, fn):
+        results[name] = measure(fn, repeats)
+        print_stats(name, results[name])
+
+    timed('GET /teacher/dashboard', lambda: ok(client.get(f'/teacher/dashboard?class={rng.choice(CLASSES)}')))
+    timed('GET /teacher/dashboard (later page)', lambda: ok(client.get(
+        f'/teacher/dashboard?class={rng.choice(CLASSES)}&after_student={rng.randrange(students // 2)}')))
+    timed('GET /student/dashboard', lambda: ok(client.get(
+        f'/student/dashboard?class={rng.choice(CLASSES)}&roll=R{rng.randrange(students)}')))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the teacher and student dashboards')
+    parser.add_argument('--students', type=int, default=9500)
+    parser.add_argument('--materials', type=int, default=100000)
+    parser.add_argument('--submissions', type=int, default=1000000)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='where to build (and reuse) the database')
+    parser.add_argument('--output', default='dashboard-results.json')
+    args = parser.parse_args()
+
+    settings = {'students': args.students, 'materials': args.materials,
+                'submissions': args.submissions, 'seed': args.seed}
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), f'lg-dashboards-{args.seed}')
+    os.makedirs(data_dir, exist_ok=True)
+    manifest = os.path.join(data_dir, 'school.json')
+    reuse = False
+    if os.path.exists(manifest):
+        with open(manifest, encoding='utf-8') as f:
+            reuse = json.load(f) == settings
+    db_path = os.path.join(data_dir, 'students.db')
+    if not reuse and os.path.exists(db_path):
+        os.remove(db_path)
+    # Must be set before app is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import app
+
+    if not reuse:
+        started = time.perf_counter()
+        with app.app_context():
+            build_school(args.students, args.materials, args.submissions, args.seed)
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        print(f'dashboards school built in {time.perf_counter() - started:.1f}s')
+    # Outside any app context, so each request gets its own (and its own query count)
+    results = run(args.students, args.repeats, args.seed)
+    save_results(args.output, suite_metadata(repeats=args.repeats, **settings), results)
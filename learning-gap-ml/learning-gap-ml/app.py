@@ -1,26 +1,108 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response, stream_with_context
 import os
+import io
+import csv
 import json
+import math
 from datetime import datetime
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from werkzeug.utils import secure_filename
-from model import load_model, predict_risk
+from learning_gap_shared import metrics
+from learning_gap_shared.blobstore import BlobStore, write_file
+from learning_gap_shared.downloads import init_app as init_downloads, send_material
+from learning_gap_shared.export import FORMATS as EXPORT_FORMATS, check_format, stream_export
+from learning_gap_shared.jobs import JobQueue
+from learning_gap_shared.model import (registry as model_registry, predict_risk, predict_risk_batch,
+                                      probability_columns, iter_batches, FEATURES)
+from learning_gap_shared.textextract import extract_text, page_count
+from catalog import MaterialsCatalog, SavedClasses
+from database import (get_db_stats, init_db, index_document, material_title, search_documents,
+                      record_search, get_popular_searches, get_assignment_analytics,
+                      EXPORTS, export_columns, export_query, iter_export)
+from markupsafe import Markup, escape
+from prediction_cache import PredictionCache
+from zipstream import BundleCache, manifest, zip_chunks
 
 app = Flask(__name__)
 
+# Per-route latency and per-request SQL on /metrics; SLOW_REQUEST_MS logs slow requests with their queries
+app.config['SLOW_REQUEST_MS'] = os.environ.get('SLOW_REQUEST_MS')
+metrics.init_app(app)
+
 # Folder to store uploaded files
 UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 CLASSES_FILE = 'classes_subjects.json'
 
+# File delivery: downloads are cacheable and support Range requests. Set
+# SENDFILE_MODE to 'x-sendfile' (Apache/lighttpd) or 'x-accel' (nginx, which
+# must map X_ACCEL_PREFIX to the uploads folder as an internal location) to let
+# the front proxy stream the bytes instead of a Python worker.
+init_downloads(app)
+
 # Allowed file types
 ALLOWED_EXTENSIONS = {'pdf', 'txt', 'doc', 'docx'}
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Create tables and run pending migrations (including the search index)
+init_db()
+
+# Uploaded files are stored once by content hash and hard-linked into uploads/
+blob_store = BlobStore()
+
+# Index of uploads/<class>/<subject>/<date>/ so /student never walks the tree;
+# its watcher starts with the job workers (start_background_work)
+materials_catalog = MaterialsCatalog(UPLOAD_FOLDER).build()
+
+# Classes/subjects saved in CLASSES_FILE, re-parsed only when the file changes
+saved_classes = SavedClasses(CLASSES_FILE)
+_classes_cache = {'key': None, 'classes': {}}
+
+# "Download all" ZIPs; small bundles are kept per catalog version, so a popular one is built once
+bundle_cache = BundleCache()
+
+# Warm the risk model once per process instead of unpickling it per request
+try:
+    model_registry.load()
+except Exception as e:
+    app.logger.warning(f"Risk model not loaded at startup: {e}")
+
+# Repeated form submissions are answered from an LRU shared by all workers on this host
+prediction_cache = PredictionCache()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Post-upload work (text extraction, search indexing, page counts) runs on a
+# background pool so an upload returns as soon as the bytes are stored.
+# Jobs are kept in jobs.db next to this file (JOBS_DB overrides it) and
+# picked up again after a crash.
+job_queue = JobQueue(os.environ.get('JOBS_DB') or
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+
+@job_queue.handler('process_material')
+def process_material(class_name, subject, date, filename, digest=None):
+    """Index an uploaded file for search; the result is shown on /jobs/<id>"""
+    path = os.path.join(app.config['UPLOAD_FOLDER'], class_name, subject, date, filename)
+    if not os.path.exists(path):
+        return {'skipped': 'file no longer exists'}
+    text = extract_text(path)
+    index_document('material', f'{class_name}/{subject}/{date}/{filename}', class_name, subject,
+                   material_title(subject, date, filename), text)
+    return {'file': f'{class_name}/{subject}/{date}/{filename}', 'bytes': os.path.getsize(path),
+            'sha256': digest, 'pages': page_count(path), 'characters': len(text)}
+
+# Background threads start in a serving process (on its first request, or the
+# first enqueue for the job workers), never on import: benchmark.py and the
+# tests import this module and must not run jobs from the live queue. Starting
+# the workers resumes jobs left queued or running by a previous process.
+@app.before_request
+def start_background_work():
+    job_queue.start()
+    materials_catalog.start_watcher()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -30,6 +112,7 @@ def index():
 def teacher():
     message = None
     message_type = None
+    job_ids = []
     
     if request.method == 'POST':
         class_name = request.form.get('class_name', '').strip()
@@ -53,94 +136,160 @@ def teacher():
 
                 # Save content as text file if content is written
                 if content:
-                    with open(os.path.join(folder_path, 'notes.txt'), 'w', encoding='utf-8') as f:
-                        f.write(content)
+                    # A new file, never a write through an existing notes.txt (which may be a blob link)
+                    write_file(os.path.join(folder_path, 'notes.txt'), io.BytesIO(content.encode('utf-8')))
+                    materials_catalog.add_file(class_name, subject, date, 'notes.txt')
+                    job_ids.append(job_queue.enqueue('process_material', class_name=class_name, subject=subject,
+                                                     date=date, filename='notes.txt'))
 
                 # Save uploaded file
                 if file and file.filename:
                     if allowed_file(file.filename):
                         filename = secure_filename(file.filename)
-                        file.save(os.path.join(folder_path, filename))
+                        digest = blob_store.save(file.stream, os.path.join(folder_path, filename))
+                        materials_catalog.add_file(class_name, subject, date, filename)
+                        job_ids.append(job_queue.enqueue('process_material', class_name=class_name, subject=subject,
+                                                         date=date, filename=filename, digest=digest))
                     else:
                         message = "File type not allowed. Please use: PDF, TXT, DOC, DOCX"
                         message_type = "error"
                         return render_template('teacher.html', message=message, message_type=message_type)
 
-                message = "✓ Content uploaded successfully!"
+                message = "✓ Content uploaded successfully! It will appear in search once processed."
                 message_type = "success"
             except Exception as e:
                 message = f"Error uploading content: {str(e)}"
                 message_type = "error"
 
-    return render_template('teacher.html', message=message, message_type=message_type)
+    return render_template('teacher.html', message=message, message_type=message_type, job_ids=job_ids)
+
+# Status of a background job, polled by the teacher page after an upload
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+# Full-text search over assignments and uploaded materials
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    class_name = request.args.get('class_name', '').strip()
+    subject = request.args.get('subject', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    results, has_next = [], False
+    if query:
+        rows, has_next = search_documents(query, class_name or None, subject or None, page)
+        for row in rows:
+            # Escape the snippet, then turn the \x02/\x03 match markers into <mark>
+            snippet = str(escape(row['snippet'] or '')).replace('\x02', '<mark>').replace('\x03', '</mark>')
+            results.append({
+                'name': row['title'] or row['ref'],
+                'type': row['kind'],
+                'class_name': row['class_name'],
+                'subject': row['subject'],
+                'snippet': Markup(snippet),
+                'path': row['ref'] if row['kind'] == 'material' else None,
+            })
+        if page == 1:
+            record_search(0, query)  # searches are anonymous in this app
+
+    return render_template('search.html', query=query, results=results, page=page, has_next=has_next,
+                           class_name=class_name, subject=subject,
+                           classes_subjects=get_available_classes_subjects(),
+                           popular_searches=get_popular_searches())
+
+# Submission analytics, read from the maintained assignment_stats counts
+@app.route('/analytics')
+def analytics():
+    class_name = request.args.get('class_name', '').strip() or None
+    return render_template('analytics.html', analytics_data=get_assignment_analytics(class_name))
+
+# Streamed table dumps for reports: /export/submissions?format=parquet&class_name=8th&from=2026-01-01
+@app.route('/export/<name>')
+def export_table(name):
+    if name not in EXPORTS:
+        return jsonify({'error': f"Unknown export {name!r} (use {', '.join(sorted(EXPORTS))})"}), 404
+    output_format = request.args.get('format', 'csv')
+    filters = {'class_name': request.args.get('class_name', '').strip() or None,
+               'subject': request.args.get('subject', '').strip() or None,
+               'date_from': request.args.get('from') or None,
+               'date_to': request.args.get('to') or None}
+    try:
+        check_format(output_format)
+        export_query(name, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[output_format]
+    body = stream_export(export_columns(name), iter_export(name, **filters), output_format)
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={name}.{extension}'})
 
 # Student View
 @app.route('/student', methods=['GET','POST'])
 def student():
     content_list = []
+    selection = None
     classes_subjects = get_available_classes_subjects()
     if request.method == 'POST':
         class_name = request.form['class_name']
         subject = request.form['subject']
-        upload_root = app.config['UPLOAD_FOLDER']
-
-        def gather_from_folder(class_name_val, subject_val):
-            results = []
-            base = os.path.join(upload_root, class_name_val, subject_val)
-            if not os.path.exists(base):
-                return results
-            for date_folder in sorted(os.listdir(base)):
-                date_path = os.path.join(base, date_folder)
-                try:
-                    files = os.listdir(date_path)
-                except Exception:
-                    continue
-
-                files_list = []
-                for f in files:
-                    rel_path = os.path.join(class_name_val, subject_val, date_folder, f).replace('\\', '/')
-                    files_list.append({'name': f, 'path': rel_path})
-
-                results.append({'class': class_name_val, 'subject': subject_val, 'date': date_folder, 'files': files_list})
-            return results
-
-        # Support selecting all classes or all subjects
-        if class_name == 'ALL':
-            # iterate all classes
-            for cls in sorted(os.listdir(upload_root)):
-                class_path = os.path.join(upload_root, cls)
-                if not os.path.isdir(class_path):
-                    continue
-                if subject and subject != 'ALL':
-                    content_list.extend(gather_from_folder(cls, subject))
-                else:
-                    # gather from all subjects under this class
-                    for subj in sorted(os.listdir(class_path)):
-                        subj_path = os.path.join(class_path, subj)
-                        if not os.path.isdir(subj_path):
-                            continue
-                        content_list.extend(gather_from_folder(cls, subj))
-        else:
-            # specific class selected
-            if subject == 'ALL':
-                # iterate all subjects under the selected class
-                class_path = os.path.join(upload_root, class_name)
-                if os.path.exists(class_path):
-                    for subj in sorted(os.listdir(class_path)):
-                        subj_path = os.path.join(class_path, subj)
-                        if not os.path.isdir(subj_path):
-                            continue
-                        content_list.extend(gather_from_folder(class_name, subj))
-            else:
-                content_list = gather_from_folder(class_name, subject)
+        # Answered from the in-memory catalog; supports 'ALL' for class and/or subject
+        content_list = materials_catalog.materials(class_name, subject)
+        selection = {'class_name': class_name, 'subject': subject}
+
+    return render_template('student.html', content_list=content_list, classes_subjects=classes_subjects,
+                           selection=selection)
+
+# Every file of a /student selection as one ZIP, streamed while it is built.
+# class_name/subject accept 'ALL'; from/to limit the date folders (inclusive).
+@app.route('/download-all')
+def download_all():
+    class_name = request.args.get('class_name', 'ALL')
+    subject = request.args.get('subject', 'ALL')
+    date_from = request.args.get('from', '')
+    date_to = request.args.get('to', '')
 
-    return render_template('student.html', content_list=content_list, classes_subjects=classes_subjects)
+    # Cached archives are valid for one catalog version; any upload starts a new one
+    key = (materials_catalog.version, class_name, subject, date_from, date_to)
+    filename = secure_filename(f'{class_name}-{subject}-materials.zip')
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    cached = bundle_cache.get(key)
+    if cached is not None:
+        etag, data = cached
+        response = Response(data, mimetype='application/zip', headers=headers)
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    entries = []
+    for group in materials_catalog.materials(class_name, subject):
+        if (date_from and group['date'] < date_from) or (date_to and group['date'] > date_to):
+            continue
+        for file in group['files']:
+            entries.append((file['path'], os.path.join(app.config['UPLOAD_FOLDER'], *file['path'].split('/'))))
+    files, etag = manifest(entries)
+    if not files:
+        return "No materials found for this selection", 404
+
+    chunks = zip_chunks(files)
+    # Only bundles that can fit in the cache are copied aside while streaming
+    if sum(size for _, _, size, _ in files) <= bundle_cache.max_entry_bytes:
+        chunks = bundle_cache.tee(key, etag, chunks)
+    response = Response(stream_with_context(chunks), mimetype='application/zip', headers=headers)
+    # Otherwise make_conditional() reads the whole stream to work out Content-Length
+    response.implicit_sequence_conversion = False
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 # Risk Prediction
 @app.route('/risk-prediction', methods=['GET', 'POST'])
 def risk_prediction():
     prediction = None
     risk_info = None
+    model_version = None
     message = None
     message_type = None
     
@@ -158,14 +307,17 @@ def risk_prediction():
             if not student_name or not class_name:
                 message = "Please provide student name and class"
                 message_type = "error"
-            elif days_absent < 0 or missed_topics < 0 or avg_marks < 0 or difficulty_score < 0:
+            elif not valid_features([days_absent, missed_topics, avg_marks, difficulty_score]):
                 message = "Please enter valid non-negative values"
                 message_type = "error"
             else:
-                # Load model and make prediction
-                model = load_model()
+                # Use the warm, compiled model held by the registry
+                loaded = model_registry.current()
                 data = [days_absent, missed_topics, avg_marks, difficulty_score]
-                prediction = predict_risk(model, data)
+                prediction = prediction_cache.get_or_compute(
+                    loaded.version, data, lambda: predict_risk(loaded.engine, data))
+                model_version = loaded.version
+                app.logger.info(f'Risk prediction for {student_name}: {prediction} (model {model_version})')
                 
                 # Get risk level color and recommendations
                 risk_level = prediction.split()[0].lower()
@@ -214,67 +366,194 @@ def risk_prediction():
     return render_template('risk_prediction.html', 
                          prediction=prediction, 
                          risk_info=risk_info,
+                         model_version=model_version,
                          message=message, 
                          message_type=message_type)
 
 
+def valid_features(values):
+    """True if every value is a finite, non-negative number (float() accepts 'nan', 'inf' and 1e400)"""
+    return all(math.isfinite(v) and v >= 0 for v in values)
+
+
+def parse_feature_row(row):
+    """Extract the model features from a CSV/JSON row (raises ValueError)"""
+    values = [float(row[name]) for name in FEATURES]
+    if not valid_features(values):
+        raise ValueError("feature values must be finite and non-negative")
+    return values
+
+
+def json_safe(value):
+    """value with non-finite floats as strings, so an echoed row is still standard JSON"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def score_rows(model, rows):
+    """Yield (row, label, probabilities) for rows, scoring one batch at a time"""
+    for batch in iter_batches(rows):
+        features = []
+        valid = []
+        for row in batch:
+            try:
+                features.append(parse_feature_row(row))
+                valid.append(True)
+            except (KeyError, TypeError, ValueError):
+                valid.append(False)
+
+        labels, proba = predict_risk_batch(model, features)
+        scored = 0
+        for row, ok in zip(batch, valid):
+            if ok:
+                yield row, labels[scored], proba[scored]
+                scored += 1
+            else:
+                yield row, None, None
+
+
+def stream_scores_csv(model, rows, fieldnames):
+    prob_cols = probability_columns(model)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fieldnames + ['risk_level'] + prob_cols + ['error'])
+    for count, (row, label, proba) in enumerate(score_rows(model, rows), 1):
+        values = [row.get(name, '') for name in fieldnames]
+        if label is None:
+            writer.writerow(values + [''] * (len(prob_cols) + 1) + ['invalid feature values'])
+        else:
+            writer.writerow(values + [label] + [round(float(p), 4) for p in proba] + [''])
+        if count % 1000 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_scores_json(model, rows):
+    prob_cols = probability_columns(model)
+    yield '['
+    for count, (row, label, proba) in enumerate(score_rows(model, rows)):
+        result = json_safe(dict(row))
+        if label is None:
+            result['risk_level'] = None
+            result['error'] = 'invalid feature values'
+        else:
+            result['risk_level'] = label
+            result['probabilities'] = {col: round(float(p), 4) for col, p in zip(prob_cols, proba)}
+        yield (',' if count else '') + json.dumps(result, allow_nan=False)
+    yield ']'
+
+
+# Bulk Risk Prediction (CSV upload or JSON API)
+@app.route('/risk-prediction/bulk', methods=['POST'])
+def bulk_risk_prediction():
+    def fail(message):
+        if request.is_json:
+            return jsonify({'error': message}), 400
+        return render_template('risk_prediction.html', message=message, message_type='error'), 400
+
+    try:
+        loaded = model_registry.current()
+    except Exception as e:
+        return fail(f"Model not available: {str(e)}")
+
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        rows = payload.get('rows') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            return fail("Expected a JSON list of rows or {\"rows\": [...]}")
+        rows = [dict(zip(FEATURES, r)) if isinstance(r, list) else r if isinstance(r, dict) else {} for r in rows]
+        fieldnames = list(FEATURES)
+        output_format = request.args.get('format', 'json')
+    else:
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return fail("Please upload a CSV file")
+        reader = csv.DictReader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+        fieldnames = reader.fieldnames or []
+        missing = [name for name in FEATURES if name not in fieldnames]
+        if missing:
+            return fail(f"CSV is missing required columns: {', '.join(missing)}")
+        rows = reader
+        output_format = request.form.get('format', request.args.get('format', 'csv'))
+
+    headers = {'X-Model-Version': loaded.version}
+    if output_format == 'json':
+        body = stream_scores_json(loaded.engine, rows)
+        mimetype = 'application/json'
+    else:
+        body = stream_scores_csv(loaded.engine, rows, fieldnames)
+        mimetype = 'text/csv'
+        headers['Content-Disposition'] = 'attachment; filename=risk_predictions.csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+@app.route('/model/info')
+def model_info():
+    return jsonify(model_registry.info())
+
+
+@app.route('/model/cache')
+def model_cache_stats():
+    return jsonify(prediction_cache.stats())
+
+
+@app.route('/db/stats')
+def db_stats():
+    return jsonify(get_db_stats())
+
+
 @app.route('/download/<path:filepath>')
 def download_file(filepath):
     try:
-        directory = os.path.dirname(os.path.join(app.config['UPLOAD_FOLDER'], filepath))
-        filename = os.path.basename(filepath)
-        return send_from_directory(directory, filename, as_attachment=True)
+        return send_material(app.config['UPLOAD_FOLDER'], filepath)
+    except RequestedRangeNotSatisfiable:
+        raise  # 416 tells a resuming client its range is past the end
     except Exception as e:
         return f"Error downloading file: {str(e)}", 404
 
+
 # Helper function to get available classes and subjects
 def get_available_classes_subjects():
-    classes = {}
-    # Load from filesystem
-    if os.path.exists(app.config['UPLOAD_FOLDER']):
-        for class_name in os.listdir(app.config['UPLOAD_FOLDER']):
-            class_path = os.path.join(app.config['UPLOAD_FOLDER'], class_name)
-            if os.path.isdir(class_path):
-                subjects = [s for s in os.listdir(class_path) if os.path.isdir(os.path.join(class_path, s))]
-                classes[class_name] = sorted(subjects)
-
-    # Load from classes file and merge
-    if os.path.exists(CLASSES_FILE):
-        try:
-            with open(CLASSES_FILE, 'r', encoding='utf-8') as f:
-                saved = json.load(f)
-                if isinstance(saved, dict):
-                    for cls, subs in saved.items():
-                        if cls in classes:
-                            # merge unique
-                            combined = set(classes[cls]) | set(subs or [])
-                            classes[cls] = sorted(combined)
-                        else:
-                            classes[cls] = sorted(list(subs or []))
-        except Exception:
-            pass
+    # Merged listing is rebuilt only when the catalog or the saved file changes
+    key = (materials_catalog.version, saved_classes.current_version())
+    if _classes_cache['key'] == key:
+        return _classes_cache['classes']
+
+    # Classes/subjects present under uploads/, from the catalog index
+    classes = materials_catalog.classes_subjects()
 
+    # Merge in classes from the saved classes file
+    for cls, subs in saved_classes.get().items():
+        if cls in classes:
+            # merge unique
+            combined = set(classes[cls]) | set(subs or [])
+            classes[cls] = sorted(combined)
+        else:
+            classes[cls] = sorted(list(subs or []))
+
+    _classes_cache['key'] = key
+    _classes_cache['classes'] = classes
     return classes
 
 
 def load_saved_classes():
-    if os.path.exists(CLASSES_FILE):
-        try:
-            with open(CLASSES_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data if isinstance(data, dict) else {}
-        except Exception:
-            return {}
-    return {}
+    return dict(saved_classes.get())
 
 
 def save_classes(data):
     try:
-        with open(CLASSES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        saved_classes.save(data)
         return True
     except Exception:
         return False
 
 if __name__ == '__main__':
+    start_background_work()
     app.run(debug=True)
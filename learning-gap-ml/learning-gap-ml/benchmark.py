@@ -0,0 +1,566 @@
+"""Performance benchmarks for the learning gap system.
+
+Each benchmark runs against throwaway data, never learning_gap.db or uploads/.
+Run from this directory, e.g.:
+
+    python benchmark.py progress --rows 20000
+    python benchmark.py download --size-mb 512
+    python benchmark.py forest --rows 100000
+    python benchmark.py search --docs 100000
+    python benchmark.py provision --users 5000
+
+The suite builds a synthetic school and times the database.py functions
+and the main routes of both apps, saving p50/p95/p99 latency and
+throughput as JSON so runs can be compared:
+
+    python benchmark.py suite --scale 0.1 --output before.json
+    python benchmark.py suite --scale 0.1 --output after.json
+    python benchmark.py compare before.json after.json
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+import database
+import provision
+
+
+def fresh_db():
+    """Point database.py at a new, empty database; returns its directory"""
+    tmpdir = tempfile.mkdtemp(prefix='lg-bench-')
+    database.close_db_connections()
+    database.DB_FILE = os.path.join(tmpdir, 'bench.db')
+    database.init_db()
+    return tmpdir
+
+
+def drop_db(tmpdir):
+    database.close_db_connections()
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def report(name, count, seconds):
+    rate = count / seconds if seconds else float('inf')
+    print(f'{name:<32} {count:>9} rows  {seconds:8.3f}s  {rate:12,.0f} rows/s')
+    return rate
+
+
+def progress_records(rows, subjects=5):
+    """Synthetic progress rows: (student_id, subject, topics, score, viewed)"""
+    students = max(rows // subjects, 1)
+    for i in range(rows):
+        yield (i % students, f'subject{i % subjects}', i % 20, float(i % 100), i % 7)
+
+
+def bench_progress(rows):
+    """update_progress() per row vs bulk_update_progress() in one transaction"""
+    tmpdir = fresh_db()
+    try:
+        start = time.perf_counter()
+        for record in progress_records(rows):
+            database.update_progress(*record)
+        per_row = report('update_progress (per row)', rows, time.perf_counter() - start)
+    finally:
+        drop_db(tmpdir)
+
+    tmpdir = fresh_db()
+    try:
+        start = time.perf_counter()
+        database.bulk_update_progress(progress_records(rows))
+        bulk = report('bulk_update_progress', rows, time.perf_counter() - start)
+    finally:
+        drop_db(tmpdir)
+
+    print(f'speedup: {bulk / per_row:.1f}x')
+
+
+def bench_download(size_mb):
+    """Stream a large upload through /download and check memory stays flat"""
+    from app import app
+
+    tmpdir = tempfile.mkdtemp(prefix='lg-bench-')
+    old_folder = app.config['UPLOAD_FOLDER']
+    try:
+        folder = os.path.join(tmpdir, '10', 'Science', '2026-01-01')
+        os.makedirs(folder)
+        size = size_mb * 1024 * 1024
+        with open(os.path.join(folder, 'big.pdf'), 'wb') as f:
+            f.truncate(size)  # sparse file: no need to write the bytes
+        app.config['UPLOAD_FOLDER'] = tmpdir
+        client = app.test_client()
+        url = '/download/10/Science/2026-01-01/big.pdf'
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(url, buffered=False)
+        received = sum(len(chunk) for chunk in response.response)
+        response.close()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert response.status_code == 200 and received == size, (response.status_code, received)
+        print(f'full download   {size_mb} MB in {seconds:.2f}s  '
+              f'({size_mb / seconds:,.0f} MB/s), peak Python memory {peak / 1024:,.0f} KB')
+        assert peak < 16 * 1024 * 1024, 'download memory grew with file size'
+
+        etag = response.headers['ETag']
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304, cached.status_code
+        partial = client.get(url, headers={'Range': 'bytes=1000-1999'})
+        assert partial.status_code == 206 and len(partial.data) == 1000, partial.status_code
+        print(f'If-None-Match -> {cached.status_code}, Range -> {partial.status_code} '
+              f'({partial.headers["Content-Range"]})')
+    finally:
+        app.config['UPLOAD_FOLDER'] = old_folder
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def latency(fn, repeats):
+    """Median and 99th percentile wall time of fn() in microseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(times, [50, 99]) * 1e6
+    return p50, p99
+
+
+def bench_forest(rows, repeats):
+    """Compiled forest vs scikit-learn: parity, single-row latency, batch throughput"""
+    from learning_gap_shared import forest, model
+
+    loaded = model.registry.load()
+    estimator = loaded.model
+    engine = forest.compile_forest(estimator)
+    X = forest.sample_inputs(estimator, rows)
+    forest.check_parity(estimator, engine, X)
+    print(f'model {loaded.version}: {engine.n_trees} trees, {len(engine.feature)} nodes, depth {engine.depth}; '
+          f'parity OK on {rows} rows')
+
+    row = X[:1]
+    for name, predictor, n in (('sklearn', estimator, max(repeats // 50, 20)), ('compiled', engine, repeats)):
+        p50, p99 = latency(lambda: predictor.predict(row), n)
+        print(f'{name + " single row":<32} p50 {p50:10.1f}us  p99 {p99:10.1f}us')
+    for name, predictor in (('sklearn', estimator), ('compiled', engine)):
+        start = time.perf_counter()
+        predictor.predict(X)
+        report(f'{name} batch', rows, time.perf_counter() - start)
+
+
+def synthetic_documents(docs, seed=0):
+    """Assignment rows and material documents over a Zipf-like vocabulary"""
+    rng = random.Random(seed)
+    # Random letter words, so a prefix query expands to a handful of terms as in real text
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocabulary = list(dict.fromkeys(''.join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(5000)))
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    subjects = ['Maths', 'Science', 'English', 'History', 'Geography']
+
+    def words(n):
+        return ' '.join(rng.choices(vocabulary, weights, k=n))
+
+    assignments, materials = [], []
+    for i in range(docs):
+        class_name, subject = str(rng.randint(1, 12)), rng.choice(subjects)
+        if i % 2:
+            assignments.append((1, words(6), words(60), subject, class_name, '2026-01-01'))
+        else:
+            materials.append(('material', f'{class_name}/{subject}/2026-01-01/doc{i}.txt',
+                              class_name, subject, f'doc{i}.txt', words(200)))
+    return vocabulary, subjects, assignments, materials
+
+
+def bench_search(docs, queries):
+    """FTS5 indexing rate and BM25 query latency vs a LIKE scan"""
+    vocabulary, subjects, assignments, materials = synthetic_documents(docs)
+    tmpdir = fresh_db()
+    try:
+        conn = database.get_db_connection()
+        start = time.perf_counter()
+        # Assignments reach the index through the migration 3 triggers
+        conn.executemany('INSERT INTO assignments (teacher_id, title, description, subject, class_name, due_date) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', assignments)
+        conn.commit()
+        conn.close()
+        report('index assignments (triggers)', len(assignments), time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(0, len(materials), database.BULK_CHUNK_SIZE):
+            database.index_documents(materials[i:i + database.BULK_CHUNK_SIZE])
+        report('index materials', len(materials), time.perf_counter() - start)
+
+        rng = random.Random(1)
+        # Mid-frequency terms: common enough to match many documents, rare enough to rank
+        terms = [' '.join(rng.sample(vocabulary[20:500], rng.choice((1, 2)))) for _ in range(queries)]
+        cases = (
+            ('bm25 page 1', lambda q: database.search_documents(q)),
+            ('bm25 page 5', lambda q: database.search_documents(q, page=5)),
+            ('bm25 class+subject filter', lambda q: database.search_documents(
+                q, str(rng.randint(1, 12)), rng.choice(subjects))),
+        )
+        for name, fn in cases:
+            it = iter(terms * 2)
+            p50, p99 = latency(lambda: fn(next(it)), queries)
+            print(f'{name:<32} p50 {p50 / 1000:8.2f}ms  p99 {p99 / 1000:8.2f}ms')
+
+        conn = database.get_db_connection()
+        it = iter(terms)
+        like = lambda: conn.execute(
+            'SELECT kind, ref, title FROM search_documents WHERE title LIKE ? OR body LIKE ? LIMIT 21',
+            (f'%{next(it)}%',) * 2).fetchall()
+        p50, p99 = latency(like, min(queries, 50))
+        conn.close()
+        print(f'{"LIKE scan (first 21, unranked)":<32} p50 {p50 / 1000:8.2f}ms  p99 {p99 / 1000:8.2f}ms')
+    finally:
+        drop_db(tmpdir)
+
+
+def users_csv(users, duplicates=0):
+    """A provisioning CSV of users students, plus duplicates rows reusing earlier usernames"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(provision.COLUMNS)
+    for i in range(users):
+        writer.writerow((f'student{i}', f'secret-{i}', f'student{i}@school.test', 'student',
+                         f'Student {i}', str(i % 12 + 1)))
+    for i in range(duplicates):
+        writer.writerow((f'student{i}', 'secret', f'other{i}@school.test', 'student', f'Other {i}', '1'))
+    return out.getvalue().encode('utf-8')
+
+
+def bench_provision(users, single, workers):
+    """register_user() per account vs provision_users() on a CSV"""
+    tmpdir = fresh_db()
+    try:
+        start = time.perf_counter()
+        for i in range(single):
+            database.register_user(f'single{i}', f'secret-{i}', f'single{i}@school.test', 'student',
+                                   f'Single {i}', '1')
+        per_user = report('register_user (per user)', single, time.perf_counter() - start)
+
+        data = users_csv(users, duplicates=users // 100)
+        summary = provision.provision_users(io.BytesIO(data), workers)
+        bulk = report(f'provision_users ({workers or os.cpu_count()} workers)', summary['created'],
+                      summary['seconds'])
+        print(f'{summary["conflicts"]} conflicts reported, {summary["invalid"]} invalid')
+        print(f'speedup: {bulk / per_user:.1f}x')
+        logged_in, user = database.login_user('student0', 'secret-0')
+        assert logged_in and user['role'] == 'student', 'provisioned account cannot log in'
+    finally:
+        drop_db(tmpdir)
+
+
+
+# ---- benchmark suite -----------------------------------------------------
+
+# Full-size school (--scale 1); --scale multiplies every count
+SUITE_SCALE = {'users': 10000, 'assignments': 5000, 'submissions': 1000000, 'files': 100000}
+SUITE_CLASSES = [str(c) for c in range(1, 13)]
+SUITE_SUBJECTS = ['Maths', 'Science', 'English', 'History', 'Geography']
+FILES_PER_FOLDER = 10
+TEACHER_SHARE = 20  # one teacher per this many users
+ROOT_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, repeats, warmup=2):
+    """Latency percentiles (ms) and throughput of repeated fn() calls"""
+    for _ in range(min(warmup, repeats)):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    p50, p95, p99 = np.percentile(times, [50, 95, 99]) * 1000
+    return {'n': repeats, 'p50_ms': round(p50, 4), 'p95_ms': round(p95, 4), 'p99_ms': round(p99, 4),
+            'mean_ms': round(sum(times) / repeats * 1000, 4), 'ops_per_sec': round(repeats / sum(times), 1)}
+
+
+def print_stats(name, stats):
+    print(f'{name:<40} p50 {stats["p50_ms"]:9.2f}ms  p95 {stats["p95_ms"]:9.2f}ms  '
+          f'p99 {stats["p99_ms"]:9.2f}ms  {stats["ops_per_sec"]:10,.1f}/s')
+
+
+def ok(response):
+    """Fail the benchmark on an error page instead of timing it"""
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.request.method} {response.request.path} -> {response.status_code}')
+    return response
+
+
+def suite_metadata(**settings):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=ROOT_APP_DIR, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return dict(settings, timestamp=datetime.now().isoformat(timespec='seconds'), commit=commit,
+                python=platform.python_version(), sqlite=sqlite3.sqlite_version, machine=platform.platform())
+
+
+def save_results(path, meta, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+    print(f'Saved {len(results)} results to {path}')
+
+
+def generate_school(data_dir, users, assignments, submissions, files, seed=0):
+    """Build a synthetic school in data_dir: learning_gap.db plus uploads/.
+
+    The same counts and seed always give the same data. A school already
+    built with the same settings is reused.
+    """
+    settings = {'users': users, 'assignments': assignments, 'submissions': submissions,
+                'files': files, 'seed': seed}
+    manifest = os.path.join(data_dir, 'school.json')
+    database.close_db_connections()
+    database.DB_FILE = os.path.join(data_dir, 'learning_gap.db')
+    if os.path.exists(manifest):
+        with open(manifest, encoding='utf-8') as f:
+            if json.load(f) == settings:
+                return False
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+    database.init_db()
+    rng = random.Random(seed)
+
+    # One hash for everyone: hashing 10k passwords would dominate the build
+    password = generate_password_hash('password')
+    teachers = max(users // TEACHER_SHARE, 1)
+    students_by_class = {c: [] for c in SUITE_CLASSES}
+    user_rows = []
+    for i in range(users):
+        if i < teachers:
+            user_rows.append((f'teacher{i}', password, f'teacher{i}@school.test', 'teacher', f'Teacher {i}', None))
+        else:
+            class_name = SUITE_CLASSES[i % len(SUITE_CLASSES)]
+            students_by_class[class_name].append(i + 1)  # ids are assigned in insert order
+            user_rows.append((f'student{i}', password, f'student{i}@school.test', 'student',
+                              f'Student {i}', class_name))
+
+    assignment_rows, assignment_classes = [], []
+    for i in range(assignments):
+        class_name = rng.choice(SUITE_CLASSES)
+        assignment_classes.append(class_name)
+        due = date(2026, 1, 1) + timedelta(days=rng.randrange(365))
+        assignment_rows.append((rng.randint(1, teachers), f'Assignment {i}', f'Exercises for topic {i % 97}',
+                                rng.choice(SUITE_SUBJECTS), class_name, due.isoformat()))
+
+    conn = database.get_db_connection()
+    try:
+        conn.executemany('INSERT INTO users (username, password, email, role, name, class_name) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', user_rows)
+        conn.executemany('INSERT INTO assignments (teacher_id, title, description, subject, class_name, due_date) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', assignment_rows)
+        conn.commit()
+        # Each submission is by a student of the assignment's class
+        for start in range(0, submissions, database.BULK_CHUNK_SIZE):
+            chunk = []
+            for _ in range(min(database.BULK_CHUNK_SIZE, submissions - start)):
+                a = rng.randrange(assignments)
+                chunk.append((a + 1, rng.choice(students_by_class[assignment_classes[a]]), 'My answer', None))
+            conn.executemany('INSERT INTO submissions (assignment_id, student_id, submission_text, file_path) '
+                             'VALUES (?, ?, ?, ?)', chunk)
+            conn.commit()
+    finally:
+        conn.close()
+
+    database.bulk_update_progress(
+        (student, subject, rng.randint(0, 20), float(rng.randint(0, 100)), rng.randint(0, 30))
+        for ids in students_by_class.values() for student in ids for subject in SUITE_SUBJECTS)
+
+    # uploads/<class>/<subject>/<date>/, FILES_PER_FOLDER files per folder
+    for i in range(files):
+        folder = i // FILES_PER_FOLDER
+        class_name = SUITE_CLASSES[folder % len(SUITE_CLASSES)]
+        subject = SUITE_SUBJECTS[folder // len(SUITE_CLASSES) % len(SUITE_SUBJECTS)]
+        day = date(2026, 1, 1) + timedelta(days=folder // (len(SUITE_CLASSES) * len(SUITE_SUBJECTS)))
+        path = os.path.join(data_dir, 'uploads', class_name, subject, day.isoformat())
+        if i % FILES_PER_FOLDER == 0:
+            os.makedirs(path, exist_ok=True)
+        extension = 'pdf' if i % 2 else 'txt'
+        with open(os.path.join(path, f'material{i}.{extension}'), 'w', encoding='utf-8') as f:
+            f.write(f'{subject} material {i} for class {class_name}\n')
+
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump(settings, f)
+    return True
+
+
+def school_app(data_dir):
+    """The ML app's Flask app, reading the generated school instead of the real data"""
+    import app as app_module
+    from catalog import MaterialsCatalog
+    from prediction_cache import PredictionCache
+
+    uploads = os.path.join(data_dir, 'uploads')
+    os.makedirs(uploads, exist_ok=True)
+    app_module.app.config['UPLOAD_FOLDER'] = uploads
+    app_module.materials_catalog = MaterialsCatalog(uploads).build()
+    app_module.prediction_cache = PredictionCache(shared_path=os.path.join(data_dir, 'prediction_cache.db'))
+    return app_module.app
+
+
+def run_dashboards(counts, repeats, seed, data_dir):
+    """Time the root app's dashboards in a child process (it is a separate Flask app)"""
+    output = os.path.join(data_dir, 'dashboards.json')
+    subprocess.run([sys.executable, 'dashboard_benchmark.py',
+                    '--students', str(counts['users'] - max(counts['users'] // TEACHER_SHARE, 1)),
+                    '--materials', str(counts['files']), '--submissions', str(counts['submissions']),
+                    '--repeats', str(repeats), '--seed', str(seed),
+                    '--data-dir', os.path.join(data_dir, 'dashboards'), '--output', output],
+                   cwd=ROOT_APP_DIR, check=True)
+    with open(output, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def bench_suite(scale, repeats, seed, data_dir, output, dashboards=True):
+    """Time database.py functions and the main routes on a synthetic school"""
+    counts = {name: max(int(n * scale), 1) for name, n in SUITE_SCALE.items()}
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), f'lg-school-{seed}')
+    start = time.perf_counter()
+    built = generate_school(data_dir, seed=seed, **counts)
+    print(f'school in {data_dir}: ' + ', '.join(f'{n:,} {name}' for name, n in counts.items())
+          + (f' (built in {time.perf_counter() - start:.1f}s)' if built else ' (reused)'))
+
+    rng = random.Random(seed)
+    teachers = max(counts['users'] // TEACHER_SHARE, 1)
+    results = {}
+
+    def run(name, fn, n=repeats):
+        results[name] = measure(fn, n)
+        print_stats(name, results[name])
+
+    def student():
+        return rng.randint(teachers + 1, counts['users'])
+
+    run('db.get_user', lambda: database.get_user(rng.randint(1, counts['users'])))
+    run('db.login_user', lambda: database.login_user('teacher0', 'password'), max(repeats // 10, 5))
+    run('db.get_assignments_by_class', lambda: database.get_assignments_by_class(rng.choice(SUITE_CLASSES)))
+    run('db.get_assignment', lambda: database.get_assignment(rng.randint(1, counts['assignments'])))
+    run('db.get_submissions_for_assignment',
+        lambda: database.get_submissions_for_assignment(rng.randint(1, counts['assignments'])))
+    run('db.get_student_progress', lambda: database.get_student_progress(student()))
+    run('db.get_assignment_analytics', lambda: database.get_assignment_analytics(rng.choice(SUITE_CLASSES)))
+    run('db.get_popular_searches', database.get_popular_searches)
+    run('db.search_documents', lambda: database.search_documents(f'topic {rng.randrange(97)}'))
+    run('db.update_progress', lambda: database.update_progress(
+        student(), rng.choice(SUITE_SUBJECTS), topics_completed=rng.randint(0, 20)))
+    run('db.submit_assignment', lambda: database.submit_assignment(
+        rng.randint(1, counts['assignments']), student(), 'Benchmark answer'))
+
+    client = school_app(data_dir).test_client()
+    run('GET /student', lambda: ok(client.get('/student')))
+    run('POST /student', lambda: ok(client.post('/student', data={
+        'class_name': rng.choice(SUITE_CLASSES), 'subject': rng.choice(SUITE_SUBJECTS)})))
+    run('POST /student (ALL/ALL)', lambda: ok(client.post('/student', data={
+        'class_name': 'ALL', 'subject': 'ALL'})), max(repeats // 10, 5))
+    run('GET /risk-prediction', lambda: ok(client.get('/risk-prediction')))
+    run('POST /risk-prediction', lambda: ok(client.post('/risk-prediction', data={
+        'student_name': 'Bench', 'class_name': rng.choice(SUITE_CLASSES),
+        'days_absent': rng.randint(0, 30), 'missed_topics': rng.randint(0, 20),
+        'avg_marks': rng.randint(0, 100), 'difficulty_score': rng.randint(1, 10)})))
+    run('GET /analytics', lambda: ok(client.get(f'/analytics?class_name={rng.choice(SUITE_CLASSES)}')))
+
+    if dashboards:
+        results.update(run_dashboards(counts, repeats, seed, data_dir))
+
+    meta = suite_metadata(scale=scale, counts=counts, repeats=repeats, seed=seed)
+    save_results(output, meta, results)
+
+
+def compare_results(baseline_path, current_path, tolerance):
+    """Print p50/p95 changes; returns the names whose p95 regressed beyond tolerance"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+    if baseline['meta'].get('counts') != current['meta'].get('counts'):
+        print('warning: runs used different school sizes')
+
+    regressions = []
+    print(f'{"benchmark":<40} {"p50":>20} {"p95":>20}')
+    for name in sorted(baseline['results'].keys() & current['results'].keys()):
+        old, new = baseline['results'][name], current['results'][name]
+        cells = []
+        for key in ('p50_ms', 'p95_ms'):
+            change = new[key] / old[key] - 1 if old[key] else 0.0
+            cells.append(f'{old[key]:8.2f}->{new[key]:8.2f} {change:+6.0%}')
+        flag = ''
+        if old['p95_ms'] and new['p95_ms'] / old['p95_ms'] - 1 > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<40} {cells[0]:>20} {cells[1]:>20}{flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('progress', help='per-row vs bulk progress upserts')
+    p.add_argument('--rows', type=int, default=20000)
+
+    p = sub.add_parser('download', help='large-file download memory, 304 and Range')
+    p.add_argument('--size-mb', type=int, default=512)
+
+    p = sub.add_parser('forest', help='compiled forest parity and latency vs scikit-learn')
+    p.add_argument('--rows', type=int, default=100000)
+    p.add_argument('--repeats', type=int, default=2000)
+
+    p = sub.add_parser('search', help='full-text index build and BM25 query latency')
+    p.add_argument('--docs', type=int, default=100000)
+    p.add_argument('--queries', type=int, default=200)
+
+    p = sub.add_parser('provision', help='per-user registration vs bulk CSV provisioning')
+    p.add_argument('--users', type=int, default=5000)
+    p.add_argument('--single', type=int, default=200, help='accounts created one at a time for the baseline')
+    p.add_argument('--workers', type=int, help='hashing processes (default: one per CPU)')
+
+    p = sub.add_parser('suite', help='synthetic school: database functions and routes, saved as JSON')
+    p.add_argument('--scale', type=float, default=1.0,
+                   help='multiplies 10k users, 5k assignments, 1M submissions, 100k files')
+    p.add_argument('--repeats', type=int, default=200)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--data-dir', help='where to build (and reuse) the school; default under the temp dir')
+    p.add_argument('--output', default='benchmark-results.json')
+    p.add_argument('--no-dashboards', action='store_true', help="skip the root app's dashboards")
+
+    p = sub.add_parser('compare', help='compare two suite result files')
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown (0.2 = 20%%)')
+
+    args = parser.parse_args()
+    if args.command == 'progress':
+        bench_progress(args.rows)
+    elif args.command == 'download':
+        bench_download(args.size_mb)
+    elif args.command == 'forest':
+        bench_forest(args.rows, args.repeats)
+    elif args.command == 'search':
+        bench_search(args.docs, args.queries)
+    elif args.command == 'provision':
+        bench_provision(args.users, args.single, args.workers)
+    elif args.command == 'suite':
+        bench_suite(args.scale, args.repeats, args.seed, args.data_dir, args.output, not args.no_dashboards)
+    elif args.command == 'compare':
+        regressions = compare_results(args.baseline, args.current, args.tolerance)
+        if regressions:
+            raise SystemExit(f'{len(regressions)} benchmark(s) regressed: {", ".join(regressions)}')
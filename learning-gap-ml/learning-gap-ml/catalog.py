@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from learning_gap_shared import metrics
+
+# Directory levels below the uploads root: class / subject / date (holding files)
+CLASS, SUBJECT, DATE = 0, 1, 2
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class MaterialsCatalog:
+    """In-memory index of uploads/<class>/<subject>/<date>/<file>.
+
+    The tree is built once and then kept current by add_file() (called when
+    a teacher saves content) and by refresh(), which compares directory
+    mtimes to pick up out-of-band changes. Updates are copy-on-write and
+    swapped in with a single assignment, so queries are plain dictionary
+    lookups that never touch the filesystem and never wait on a writer.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.version = 0
+        self._tree = {}
+        self._mtimes = {}
+        self._write_lock = threading.Lock()
+        self._watcher = None
+
+    # ---- building and syncing -------------------------------------------
+
+    def _list(self, path, depth):
+        """Return sorted child names of a directory at the given depth"""
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return []
+        # Hidden entries are temp files/links (e.g. from BlobStore.link)
+        entries = [e for e in entries if not e.name.startswith('.')]
+        if depth == DATE:
+            return sorted(e.name for e in entries if e.is_file())
+        return sorted(e.name for e in entries if e.is_dir())
+
+    def _scan(self, path, depth):
+        """Fully scan a directory subtree, recording directory mtimes"""
+        self._mtimes[path] = _mtime(path)
+        names = self._list(path, depth)
+        if depth == DATE:
+            return names
+        return {name: self._scan(os.path.join(path, name), depth + 1) for name in names}
+
+    def _forget(self, path):
+        prefix = path + os.sep
+        for key in [k for k in self._mtimes if k == path or k.startswith(prefix)]:
+            del self._mtimes[key]
+
+    def _sync(self, path, depth, node):
+        """Return node updated for changes under path (or node itself if none)"""
+        mtime = _mtime(path)
+        changed = mtime != self._mtimes.get(path)
+        self._mtimes[path] = mtime
+
+        if depth == DATE:
+            return self._list(path, depth) if changed else node
+
+        if changed:
+            names = self._list(path, depth)
+            for gone in set(node) - set(names):
+                self._forget(os.path.join(path, gone))
+        else:
+            names = list(node)
+
+        updated = {}
+        for name in names:
+            child_path = os.path.join(path, name)
+            if name in node:
+                updated[name] = self._sync(child_path, depth + 1, node[name])
+            else:
+                updated[name] = self._scan(child_path, depth + 1)
+
+        if not changed and all(updated[name] is node[name] for name in names):
+            return node
+        return updated
+
+    def build(self):
+        """Scan the whole uploads tree from scratch"""
+        with self._write_lock, metrics.timer('catalog_build'):
+            self._mtimes = {}
+            self._tree = self._scan(self.root, CLASS - 1) if os.path.isdir(self.root) else {}
+            self.version += 1
+        return self
+
+    def refresh(self):
+        """Pick up out-of-band changes by comparing directory mtimes"""
+        with self._write_lock, metrics.timer('catalog_refresh'):
+            tree = self._sync(self.root, CLASS - 1, self._tree)
+            if tree is not self._tree:
+                self._tree = tree
+                self.version += 1
+                return True
+        return False
+
+    def add_file(self, class_name, subject, date, filename):
+        """Record a file a teacher just saved, without rescanning"""
+        with self._write_lock:
+            tree = dict(self._tree)
+            subjects = tree[class_name] = dict(tree.get(class_name, {}))
+            dates = subjects[subject] = dict(subjects.get(subject, {}))
+            files = dates.get(date, [])
+            if filename not in files:
+                dates[date] = sorted(files + [filename])
+            self._tree = tree
+            self.version += 1
+
+            # Remember the new directory mtimes so refresh() does not rescan them
+            path = self.root
+            self._mtimes[path] = _mtime(path)
+            for part in (class_name, subject, date):
+                path = os.path.join(path, part)
+                self._mtimes[path] = _mtime(path)
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception:
+                pass
+
+    def start_watcher(self, interval=5.0):
+        """Run refresh() periodically on a daemon thread; later calls do nothing"""
+        if self._watcher is not None:
+            return
+        with self._write_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                                 name="catalog-watcher", daemon=True)
+                self._watcher.start()
+
+    # ---- queries (memory only) ------------------------------------------
+
+    def classes_subjects(self):
+        """Map each class to its sorted list of subjects"""
+        return {cls: sorted(subjects) for cls, subjects in self._tree.items()}
+
+    def materials(self, class_name, subject):
+        """Materials grouped by date for a class/subject; either may be 'ALL'"""
+        tree = self._tree
+        classes = sorted(tree) if class_name == 'ALL' else [class_name]
+        results = []
+        for cls in classes:
+            subjects = tree.get(cls, {})
+            if subject and subject != 'ALL':
+                names = [subject]
+            else:
+                names = sorted(subjects)
+            for subj in names:
+                dates = subjects.get(subj, {})
+                for date in sorted(dates):
+                    files = [{'name': f, 'path': f'{cls}/{subj}/{date}/{f}'} for f in dates[date]]
+                    results.append({'class': cls, 'subject': subj, 'date': date, 'files': files})
+        return results
+
+
+class SavedClasses:
+    """Cached view of classes_subjects.json shared safely between workers.
+
+    Reads are served from memory; the file is re-parsed only when its mtime
+    changes (checked at most every check_interval seconds). Writes go to a
+    temp file in the same directory that is then renamed over the original,
+    so other processes never observe a half-written file.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._data = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval and self.version:
+            return
+        self._last_check = now
+        mtime = _mtime(self.path)
+        if mtime == self._mtime and self.version:
+            return
+        with self._lock:
+            data = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        loaded = json.load(f)
+                    data = loaded if isinstance(loaded, dict) else {}
+                except (OSError, ValueError):
+                    return
+            self._data = data
+            self._mtime = mtime
+            self.version += 1
+
+    def current_version(self):
+        """Version counter, bumped whenever the file contents are reloaded or saved"""
+        self._reload_if_changed()
+        return self.version
+
+    def get(self):
+        """Saved class -> subjects mapping (do not mutate the result)"""
+        self._reload_if_changed()
+        return self._data
+
+    def save(self, data):
+        """Atomically replace the file with data (temp file + rename)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix='.classes-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._data = dict(data)
+            self._mtime = _mtime(self.path)
+            self.version += 1
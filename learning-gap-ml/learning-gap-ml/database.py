@@ -1,16 +1,162 @@
 import sqlite3
 import os
-from datetime import datetime
+import re
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from learning_gap_shared import metrics
+
 DB_FILE = 'learning_gap.db'
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_FILE)
+# Connection pool and SQLite tuning
+POOL_SIZE = 8                    # idle connections kept per process
+BUSY_TIMEOUT_MS = 5000           # wait for locks instead of failing with "database is locked"
+CACHE_SIZE_KB = 16000            # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024    # memory-mapped I/O window
+CACHED_STATEMENTS = 256          # prepared statements kept per connection
+
+_pool = []
+_pool_key = None
+_pool_lock = threading.Lock()
+
+_stats = {'connections_opened': 0, 'connections_reused': 0, 'queries': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor that counts executed statements"""
+
+    def execute(self, sql, parameters=()):
+        _count('queries')
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        _count('queries')
+        return super().executemany(sql, seq_of_parameters)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection whose close() returns it to the pool instead of closing it.
+
+    Keeping connections open means the schema is parsed once per connection
+    and sqlite3's per-connection statement cache reuses prepared statements
+    across calls.
+    """
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        _release(self)
+
+    def close_for_real(self):
+        super().close()
+
+
+def _current_key():
+    return (os.getpid(), os.path.abspath(DB_FILE))
+
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT_MS / 1000, factory=PooledConnection,
+                           check_same_thread=False, cached_statements=CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL').fetchone()
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.set_trace_callback(_statement_tracer())
+    _count('connections_opened')
+    return conn
+
+
+def _statement_tracer():
+    """A trace callback that passes each statement to metrics.record_query().
+
+    sqlite3 reports every trigger step a statement fires as that statement
+    again (SQLite's '-- TRIGGER name' text is not passed on), so an immediate
+    repeat of the same text on a connection is not counted a second time.
+    """
+    last = None
+
+    def trace(statement):
+        nonlocal last
+        if statement != last and not statement.startswith('--'):
+            metrics.record_query(statement)
+        last = statement
+    return trace
+
+
+def _release(conn):
+    """Return a connection to the pool (or close it if the pool is full)"""
+    # Time from checkout to close(): the statements plus reading their rows
+    metrics.record_sql_time(time.perf_counter() - conn.checked_out)
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if _pool_key == _current_key() and len(_pool) < POOL_SIZE:
+            _pool.append(conn)
+            return
+    conn.close_for_real()
+
+
+def get_db_connection():
+    """Get a pooled database connection; call close() to hand it back"""
+    global _pool_key
+    key = _current_key()
+    stale = []
+    with _pool_lock:
+        if _pool_key != key:
+            # DB_FILE changed: close the old connections. After a fork they
+            # belong to the parent process and are only dropped.
+            if _pool_key is not None and _pool_key[0] == key[0]:
+                stale = list(_pool)
+            _pool.clear()
+            _pool_key = key
+        conn = _pool.pop() if _pool else None
+    for old in stale:
+        old.close_for_real()
+    if conn is None:
+        conn = _connect()
+    else:
+        _count('connections_reused')
+    conn.checked_out = time.perf_counter()
     return conn
 
+
+def close_db_connections():
+    """Close every idle pooled connection"""
+    with _pool_lock:
+        idle = list(_pool)
+        _pool.clear()
+    for conn in idle:
+        conn.close_for_real()
+
+
+def get_db_stats():
+    """Connection and query counters since process start"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['pool_idle'] = len(_pool)
+    return stats
+
 def init_db():
     """Initialize database with all required tables"""
     conn = get_db_connection()
@@ -77,8 +223,260 @@ def init_db():
     )''')
     
     conn.commit()
+    migrate(conn)
     conn.close()
 
+# Queries kept as constants so check_query_plans() verifies the exact SQL in use
+ASSIGNMENTS_BY_CLASS_SQL = '''SELECT a.*, u.name as teacher_name FROM assignments a 
+                 JOIN users u ON a.teacher_id = u.id 
+                 WHERE a.class_name = ? ORDER BY a.due_date DESC'''
+
+SUBMISSIONS_FOR_ASSIGNMENT_SQL = '''SELECT s.*, u.name as student_name FROM submissions s
+                 JOIN users u ON s.student_id = u.id
+                 WHERE s.assignment_id = ? ORDER BY s.submitted_at DESC'''
+
+# Insert or update in one statement; relies on ux_progress_student_subject.
+# Fields passed as NULL keep their current value on update.
+UPSERT_PROGRESS_SQL = '''INSERT INTO progress (student_id, subject, topics_completed, assessment_score, materials_viewed)
+                 VALUES (:student_id, :subject, COALESCE(:topics_completed, 0), :assessment_score,
+                         COALESCE(:materials_viewed, 0))
+                 ON CONFLICT (student_id, subject) DO UPDATE SET
+                     topics_completed = COALESCE(:topics_completed, topics_completed),
+                     assessment_score = COALESCE(:assessment_score, assessment_score),
+                     materials_viewed = COALESCE(:materials_viewed, materials_viewed),
+                     updated_at = CURRENT_TIMESTAMP'''
+
+# Rows per executemany() call in bulk_update_progress
+BULK_CHUNK_SIZE = 5000
+
+STUDENT_PROGRESS_SQL = 'SELECT * FROM progress WHERE student_id = ? ORDER BY subject'
+
+# Reads the maintained search_counts aggregate: O(k) via idx_search_counts_count
+POPULAR_SEARCHES_SQL = '''SELECT query, count FROM search_counts
+                 ORDER BY count DESC LIMIT 10'''
+
+# assignment_stats recomputed from scratch (migration 4 backfill and rebuild_assignment_stats)
+ASSIGNMENT_STATS_SQL = '''SELECT a.id, a.class_name,
+                        (SELECT COUNT(*) FROM users u WHERE u.role = 'student' AND u.class_name = a.class_name),
+                        (SELECT COUNT(DISTINCT s.student_id) FROM submissions s WHERE s.assignment_id = a.id)
+                 FROM assignments a'''
+
+# Analytics page: precomputed counts in one query, for one class or all of them
+_ANALYTICS_SELECT = '''SELECT a.*, st.total_students, st.submitted FROM assignments a
+                 JOIN assignment_stats st ON st.assignment_id = a.id'''
+ASSIGNMENT_ANALYTICS_SQL = _ANALYTICS_SELECT + ' WHERE a.class_name = ? ORDER BY a.due_date DESC'
+ALL_ASSIGNMENT_ANALYTICS_SQL = _ANALYTICS_SELECT + ' ORDER BY a.due_date DESC'
+
+class MigrationError(RuntimeError):
+    """A migration cannot be applied to the data as it stands"""
+
+PROGRESS_DUPLICATES_SQL = '''SELECT student_id, subject, COUNT(*) FROM progress
+                 GROUP BY student_id, subject HAVING COUNT(*) > 1 ORDER BY student_id, subject'''
+
+def _require_unique_progress(conn):
+    """Refuse to build ux_progress_student_subject over duplicate rows rather than pick a winner"""
+    duplicates = conn.execute(PROGRESS_DUPLICATES_SQL).fetchall()
+    if not duplicates:
+        return
+    shown = ', '.join(f'student {row[0]} / {row[1]!r} ({row[2]} rows)' for row in duplicates[:10])
+    more = f' and {len(duplicates) - 10} more' if len(duplicates) > 10 else ''
+    raise MigrationError(
+        f'progress has more than one row for {len(duplicates)} (student_id, subject) pair(s): {shown}{more}. '
+        'Keep one row per pair (list them with: ' + ' '.join(PROGRESS_DUPLICATES_SQL.split()) + '), '
+        'then run python database.py migrate again. Nothing was changed.')
+
+# Schema migrations, applied in order and tracked in PRAGMA user_version.
+# Each entry is (version, [statements]); a statement is SQL or a callable taking
+# the connection. Never edit a released entry, add a new one.
+MIGRATIONS = [
+    (1, [
+        # get_assignments_by_class: WHERE class_name ORDER BY due_date
+        'CREATE INDEX IF NOT EXISTS idx_assignments_class_due ON assignments (class_name, due_date)',
+        # get_submissions_for_assignment: WHERE assignment_id ORDER BY submitted_at
+        'CREATE INDEX IF NOT EXISTS idx_submissions_assignment_submitted ON submissions (assignment_id, submitted_at)',
+        # update_progress / get_student_progress: one row per (student_id, subject)
+        _require_unique_progress,
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_progress_student_subject ON progress (student_id, subject)',
+        # get_popular_searches: GROUP BY query
+        'CREATE INDEX IF NOT EXISTS idx_search_history_query ON search_history (query)',
+    ]),
+    (2, [
+        # Per-query totals maintained by flush_searches()
+        '''CREATE TABLE IF NOT EXISTS search_counts (
+               query TEXT PRIMARY KEY,
+               count INTEGER NOT NULL DEFAULT 0,
+               last_searched TIMESTAMP
+           )''',
+        '''INSERT OR REPLACE INTO search_counts (query, count, last_searched)
+           SELECT query, COUNT(*), MAX(searched_at) FROM search_history GROUP BY query''',
+        'CREATE INDEX IF NOT EXISTS idx_search_counts_count ON search_counts (count DESC)',
+    ]),
+    (3, [
+        # Full-text search: one row per assignment or uploaded material file
+        '''CREATE TABLE IF NOT EXISTS search_documents (
+               id INTEGER PRIMARY KEY,
+               kind TEXT NOT NULL,
+               ref TEXT NOT NULL,
+               class_name TEXT,
+               subject TEXT,
+               title TEXT,
+               body TEXT,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               UNIQUE (kind, ref)
+           )''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+               title, body, class_name, subject,
+               content='search_documents', content_rowid='id', tokenize='porter unicode61'
+           )''',
+        # BM25 with title matches weighted 10x body; the filter columns don't score
+        "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(10.0, 1.0, 0.0, 0.0)')",
+        # Keep the external-content index in step with search_documents
+        '''CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+               INSERT INTO search_index (rowid, title, body, class_name, subject)
+               VALUES (new.id, new.title, new.body, new.class_name, new.subject);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+               INSERT INTO search_index (search_index, rowid, title, body, class_name, subject)
+               VALUES ('delete', old.id, old.title, old.body, old.class_name, old.subject);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+               INSERT INTO search_index (search_index, rowid, title, body, class_name, subject)
+               VALUES ('delete', old.id, old.title, old.body, old.class_name, old.subject);
+               INSERT INTO search_index (rowid, title, body, class_name, subject)
+               VALUES (new.id, new.title, new.body, new.class_name, new.subject);
+           END''',
+        # Assignments are (re)indexed whenever create_assignment() or an edit writes them
+        '''CREATE TRIGGER IF NOT EXISTS assignments_search_ai AFTER INSERT ON assignments BEGIN
+               INSERT INTO search_documents (kind, ref, class_name, subject, title, body)
+               VALUES ('assignment', CAST(new.id AS TEXT), new.class_name, new.subject, new.title, new.description);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS assignments_search_au AFTER UPDATE ON assignments BEGIN
+               UPDATE search_documents
+               SET class_name = new.class_name, subject = new.subject, title = new.title,
+                   body = new.description, updated_at = CURRENT_TIMESTAMP
+               WHERE kind = 'assignment' AND ref = CAST(new.id AS TEXT);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS assignments_search_ad AFTER DELETE ON assignments BEGIN
+               DELETE FROM search_documents WHERE kind = 'assignment' AND ref = CAST(old.id AS TEXT);
+           END''',
+        '''INSERT OR IGNORE INTO search_documents (kind, ref, class_name, subject, title, body)
+           SELECT 'assignment', CAST(id AS TEXT), class_name, subject, title, description FROM assignments''',
+    ]),
+    (4, [
+        # Per-assignment analytics counts, maintained by the triggers below in the
+        # same transaction as register_user(), create_assignment() and submit_assignment()
+        '''CREATE TABLE IF NOT EXISTS assignment_stats (
+               assignment_id INTEGER PRIMARY KEY REFERENCES assignments(id),
+               class_name TEXT NOT NULL,
+               total_students INTEGER NOT NULL DEFAULT 0,
+               submitted INTEGER NOT NULL DEFAULT 0
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_assignment_stats_class ON assignment_stats (class_name)',
+        # Students per class, counted when an assignment is created
+        'CREATE INDEX IF NOT EXISTS idx_users_role_class ON users (role, class_name)',
+        # "Has this student already submitted?" for the submission triggers
+        'CREATE INDEX IF NOT EXISTS idx_submissions_assignment_student ON submissions (assignment_id, student_id)',
+        '''CREATE TRIGGER IF NOT EXISTS assignments_stats_ai AFTER INSERT ON assignments BEGIN
+               INSERT INTO assignment_stats (assignment_id, class_name, total_students, submitted)
+               VALUES (new.id, new.class_name,
+                       (SELECT COUNT(*) FROM users WHERE role = 'student' AND class_name = new.class_name), 0);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS assignments_stats_au AFTER UPDATE OF class_name ON assignments BEGIN
+               UPDATE assignment_stats
+               SET class_name = new.class_name,
+                   total_students = (SELECT COUNT(*) FROM users WHERE role = 'student' AND class_name = new.class_name)
+               WHERE assignment_id = new.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS assignments_stats_ad AFTER DELETE ON assignments BEGIN
+               DELETE FROM assignment_stats WHERE assignment_id = old.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_stats_ai AFTER INSERT ON users WHEN new.role = 'student' BEGIN
+               UPDATE assignment_stats SET total_students = total_students + 1 WHERE class_name = new.class_name;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_stats_ad AFTER DELETE ON users WHEN old.role = 'student' BEGIN
+               UPDATE assignment_stats SET total_students = total_students - 1 WHERE class_name = old.class_name;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_stats_au AFTER UPDATE OF role, class_name ON users BEGIN
+               UPDATE assignment_stats SET total_students = total_students - 1
+               WHERE old.role = 'student' AND class_name = old.class_name;
+               UPDATE assignment_stats SET total_students = total_students + 1
+               WHERE new.role = 'student' AND class_name = new.class_name;
+           END''',
+        # submitted counts students, not submissions: only a student's first one counts
+        '''CREATE TRIGGER IF NOT EXISTS submissions_stats_ai AFTER INSERT ON submissions
+           WHEN NOT EXISTS (SELECT 1 FROM submissions WHERE assignment_id = new.assignment_id
+                            AND student_id = new.student_id AND id != new.id) BEGIN
+               UPDATE assignment_stats SET submitted = submitted + 1 WHERE assignment_id = new.assignment_id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS submissions_stats_ad AFTER DELETE ON submissions
+           WHEN NOT EXISTS (SELECT 1 FROM submissions WHERE assignment_id = old.assignment_id
+                            AND student_id = old.student_id) BEGIN
+               UPDATE assignment_stats SET submitted = submitted - 1 WHERE assignment_id = old.assignment_id;
+           END''',
+        'INSERT OR REPLACE INTO assignment_stats (assignment_id, class_name, total_students, submitted) '
+        + ASSIGNMENT_STATS_SQL,
+    ]),
+    (5, [
+        # A submission moved to another assignment or student: uncount the old
+        # pair if that was its only submission, count the new pair if it is now its first
+        '''CREATE TRIGGER IF NOT EXISTS submissions_stats_au AFTER UPDATE OF assignment_id, student_id ON submissions
+           WHEN old.assignment_id IS NOT new.assignment_id OR old.student_id IS NOT new.student_id BEGIN
+               UPDATE assignment_stats SET submitted = submitted - 1
+               WHERE assignment_id = old.assignment_id
+                 AND NOT EXISTS (SELECT 1 FROM submissions WHERE assignment_id = old.assignment_id
+                                 AND student_id = old.student_id);
+               UPDATE assignment_stats SET submitted = submitted + 1
+               WHERE assignment_id = new.assignment_id
+                 AND NOT EXISTS (SELECT 1 FROM submissions WHERE assignment_id = new.assignment_id
+                                 AND student_id = new.student_id AND id != new.id);
+           END''',
+        # Recount whatever drifted while such updates went untracked
+        'DELETE FROM assignment_stats',
+        'INSERT INTO assignment_stats (assignment_id, class_name, total_students, submitted) '
+        + ASSIGNMENT_STATS_SQL,
+    ]),
+    (6, [
+        # Popular searches read search_counts (migration 2); nothing groups search_history by query now
+        'DROP INDEX IF EXISTS idx_search_history_query',
+    ]),
+]
+
+def get_schema_version(conn):
+    """Current schema version stored in PRAGMA user_version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn=None):
+    """Apply pending migrations, each in its own transaction; returns the new version"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        version = get_schema_version(conn)
+        for target, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-check under the write lock in case another worker migrated first
+                if get_schema_version(conn) >= target:
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {int(target)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            version = target
+        return get_schema_version(conn)
+    finally:
+        if own_conn:
+            conn.close()
+
 def register_user(username, password, email, role, name, class_name=None):
     """Register a new user"""
     conn = get_db_connection()
@@ -134,9 +532,7 @@ def get_assignments_by_class(class_name):
     """Get all assignments for a class"""
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('''SELECT a.*, u.name as teacher_name FROM assignments a 
-                 JOIN users u ON a.teacher_id = u.id 
-                 WHERE a.class_name = ? ORDER BY a.due_date DESC''', (class_name,))
+    c.execute(ASSIGNMENTS_BY_CLASS_SQL, (class_name,))
     assignments = [dict(row) for row in c.fetchall()]
     conn.close()
     return assignments
@@ -166,70 +562,523 @@ def get_submissions_for_assignment(assignment_id):
     """Get all submissions for an assignment"""
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('''SELECT s.*, u.name as student_name FROM submissions s
-                 JOIN users u ON s.student_id = u.id
-                 WHERE s.assignment_id = ? ORDER BY s.submitted_at DESC''', (assignment_id,))
+    c.execute(SUBMISSIONS_FOR_ASSIGNMENT_SQL, (assignment_id,))
     submissions = [dict(row) for row in c.fetchall()]
     conn.close()
     return submissions
 
 def update_progress(student_id, subject, topics_completed=None, assessment_score=None, materials_viewed=None):
-    """Update student progress"""
+    """Update student progress (atomic insert-or-update)"""
     conn = get_db_connection()
     c = conn.cursor()
-    
-    # Check if record exists
-    c.execute('SELECT id FROM progress WHERE student_id = ? AND subject = ?', (student_id, subject))
-    exists = c.fetchone()
-    
-    if exists:
-        update_parts = ['updated_at = CURRENT_TIMESTAMP']
-        params = []
-        
-        if topics_completed is not None:
-            update_parts.append('topics_completed = ?')
-            params.append(topics_completed)
-        if assessment_score is not None:
-            update_parts.append('assessment_score = ?')
-            params.append(assessment_score)
-        if materials_viewed is not None:
-            update_parts.append('materials_viewed = ?')
-            params.append(materials_viewed)
-        
-        params.extend([student_id, subject])
-        query = f"UPDATE progress SET {', '.join(update_parts)} WHERE student_id = ? AND subject = ?"
-        c.execute(query, params)
-    else:
-        c.execute('''INSERT INTO progress (student_id, subject, topics_completed, assessment_score, materials_viewed)
-                     VALUES (?, ?, ?, ?, ?)''',
-                  (student_id, subject, topics_completed or 0, assessment_score, materials_viewed or 0))
-    
+    c.execute(UPSERT_PROGRESS_SQL, {
+        'student_id': student_id,
+        'subject': subject,
+        'topics_completed': topics_completed,
+        'assessment_score': assessment_score,
+        'materials_viewed': materials_viewed,
+    })
     conn.commit()
     conn.close()
 
+def _progress_params(record):
+    """Normalize a progress record (dict or tuple) to UPSERT_PROGRESS_SQL parameters"""
+    if isinstance(record, dict):
+        return {
+            'student_id': record['student_id'],
+            'subject': record['subject'],
+            'topics_completed': record.get('topics_completed'),
+            'assessment_score': record.get('assessment_score'),
+            'materials_viewed': record.get('materials_viewed'),
+        }
+    student_id, subject, *rest = record
+    rest = list(rest) + [None] * (3 - len(rest))
+    return {
+        'student_id': student_id,
+        'subject': subject,
+        'topics_completed': rest[0],
+        'assessment_score': rest[1],
+        'materials_viewed': rest[2],
+    }
+
+def bulk_update_progress(records, chunk_size=BULK_CHUNK_SIZE):
+    """Upsert many progress records in a single transaction.
+
+    records is any iterable of dicts (student_id, subject and optional
+    topics_completed, assessment_score, materials_viewed) or tuples in that
+    order. It is consumed in chunks, so a generator over a large import file
+    is never fully materialized. Returns the number of records applied.
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    total = 0
+    try:
+        c.execute('BEGIN IMMEDIATE')
+        chunk = []
+        for record in records:
+            chunk.append(_progress_params(record))
+            if len(chunk) >= chunk_size:
+                c.executemany(UPSERT_PROGRESS_SQL, chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            c.executemany(UPSERT_PROGRESS_SQL, chunk)
+            total += len(chunk)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return total
+
 def get_student_progress(student_id):
     """Get all progress records for a student"""
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('SELECT * FROM progress WHERE student_id = ? ORDER BY subject', (student_id,))
+    c.execute(STUDENT_PROGRESS_SQL, (student_id,))
     progress = [dict(row) for row in c.fetchall()]
     conn.close()
     return progress
 
+# Write-behind buffer for search_history
+SEARCH_FLUSH_SIZE = 500          # flush once this many searches are pending
+SEARCH_FLUSH_INTERVAL = 5.0      # ... or after this many seconds
+
+_search_buffer = []
+_search_lock = threading.Lock()
+_search_flusher = None
+
+def _search_flush_loop():
+    while True:
+        time.sleep(SEARCH_FLUSH_INTERVAL)
+        try:
+            flush_searches()
+        except Exception:
+            pass
+
+def _start_search_flusher():
+    global _search_flusher
+    with _search_lock:
+        if _search_flusher is None:
+            _search_flusher = threading.Thread(target=_search_flush_loop, name='search-flusher', daemon=True)
+            _search_flusher.start()
+
 def record_search(user_id, query):
-    """Record user search query"""
+    """Record user search query (buffered; written by flush_searches)"""
+    if _search_flusher is None:
+        _start_search_flusher()
+    searched_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    with _search_lock:
+        _search_buffer.append((user_id, query, searched_at))
+        full = len(_search_buffer) >= SEARCH_FLUSH_SIZE
+    if full:
+        flush_searches()
+
+def flush_searches():
+    """Write pending searches and update search_counts in one transaction"""
+    global _search_buffer
+    with _search_lock:
+        pending, _search_buffer = _search_buffer, []
+    if not pending:
+        return 0
+
+    counts = Counter()
+    last_searched = {}
+    for _, query, searched_at in pending:
+        counts[query] += 1
+        last_searched[query] = max(searched_at, last_searched.get(query, searched_at))
+
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('INSERT INTO search_history (user_id, query) VALUES (?, ?)', (user_id, query))
+    try:
+        c.executemany('INSERT INTO search_history (user_id, query, searched_at) VALUES (?, ?, ?)', pending)
+        c.executemany('''INSERT INTO search_counts (query, count, last_searched) VALUES (?, ?, ?)
+                         ON CONFLICT (query) DO UPDATE SET
+                             count = count + excluded.count,
+                             last_searched = MAX(COALESCE(last_searched, ''), excluded.last_searched)''',
+                      [(query, n, last_searched[query]) for query, n in counts.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Put the events back so the next flush retries them
+        with _search_lock:
+            _search_buffer = pending + _search_buffer
+        raise
+    finally:
+        conn.close()
+    return len(pending)
+
+# Never lose buffered searches on a clean shutdown
+atexit.register(flush_searches)
+
+# Full-text search (search_documents + the search_index FTS5 table, migration 3)
+SEARCH_PAGE_SIZE = 20
+
+UPSERT_DOCUMENT_SQL = '''INSERT INTO search_documents (kind, ref, class_name, subject, title, body)
+                 VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT (kind, ref) DO UPDATE SET
+                     class_name = excluded.class_name, subject = excluded.subject,
+                     title = excluded.title, body = excluded.body, updated_at = CURRENT_TIMESTAMP'''
+
+# Ranked by the bm25 weights configured in migration 3. Snippet highlights are
+# marked with \x02/\x03 so the caller can escape the text before adding markup.
+# class_name and subject are exact filters on the content table; a NULL
+# parameter means any.
+SEARCH_SQL = '''SELECT d.kind, d.ref, d.class_name, d.subject, d.title,
+                        snippet(search_index, -1, char(2), char(3), '…', 16) AS snippet
+                 FROM search_index JOIN search_documents d ON d.id = search_index.rowid
+                 WHERE search_index MATCH :query
+                   AND (:class_name IS NULL OR d.class_name = :class_name)
+                   AND (:subject IS NULL OR d.subject = :subject)
+                 ORDER BY rank LIMIT :limit OFFSET :offset'''
+
+_SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def fts_query(text):
+    """Turn free text into a safe FTS5 query (all terms, last one as a prefix).
+
+    Returns None when text has no searchable terms. Terms match title and
+    body only. class_name and subject are in the index too (migration 3) but
+    are filtered exactly by SEARCH_SQL, never searched.
+    """
+    terms = _SEARCH_TERM.findall(text or '')
+    if not terms:
+        return None
+    query = ' '.join(_fts_phrase(t) for t in terms[:-1])
+    query = (query + ' ' + _fts_phrase(terms[-1]) + '*').strip()
+    return f'{{title body}} : ({query})'
+
+def index_documents(documents):
+    """Add or replace (kind, ref, class_name, subject, title, body) rows in one transaction"""
+    conn = get_db_connection()
+    try:
+        conn.executemany(UPSERT_DOCUMENT_SQL, documents)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def index_document(kind, ref, class_name, subject, title, body):
+    """Add or replace one searchable document"""
+    index_documents([(kind, ref, class_name, subject, title, body)])
+
+def remove_document(kind, ref):
+    conn = get_db_connection()
+    conn.execute('DELETE FROM search_documents WHERE kind = ? AND ref = ?', (kind, ref))
+    conn.commit()
+    conn.close()
+
+def search_documents(text, class_name=None, subject=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """One page of BM25-ranked matches; returns (rows, has_next_page)"""
+    query = fts_query(text)
+    if query is None:
+        return [], False
+    params = {'query': query, 'class_name': class_name or None, 'subject': subject or None,
+              'limit': page_size + 1, 'offset': (page - 1) * page_size}
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(SEARCH_SQL, params).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows[:page_size]], len(rows) > page_size
+
+def reindex_materials(root):
+    """Index every file under root/<class>/<subject>/<date>/ and drop vanished ones"""
+    from learning_gap_shared.textextract import extract_text
+
+    seen, batch = set(), []
+    with metrics.timer('materials_reindex'):
+        for class_name in sorted(os.listdir(root)):
+            for subject, date, filename in _material_files(root, class_name):
+                ref = f'{class_name}/{subject}/{date}/{filename}'
+                seen.add(ref)
+                text = extract_text(os.path.join(root, class_name, subject, date, filename))
+                batch.append(('material', ref, class_name, subject, material_title(subject, date, filename), text))
+                if len(batch) >= BULK_CHUNK_SIZE:
+                    index_documents(batch)
+                    batch = []
+        if batch:
+            index_documents(batch)
+
+    conn = get_db_connection()
+    stale = [row['ref'] for row in conn.execute("SELECT ref FROM search_documents WHERE kind = 'material'")
+             if row['ref'] not in seen]
+    conn.executemany("DELETE FROM search_documents WHERE kind = 'material' AND ref = ?", [(r,) for r in stale])
     conn.commit()
     conn.close()
+    return len(seen), len(stale)
+
+def _material_files(root, class_name):
+    class_dir = os.path.join(root, class_name)
+    if not os.path.isdir(class_dir):
+        return
+    for subject in sorted(os.listdir(class_dir)):
+        subject_dir = os.path.join(class_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        for date in sorted(os.listdir(subject_dir)):
+            date_dir = os.path.join(subject_dir, date)
+            if not os.path.isdir(date_dir):
+                continue
+            for filename in sorted(os.listdir(date_dir)):
+                if not filename.startswith('.') and os.path.isfile(os.path.join(date_dir, filename)):
+                    yield subject, date, filename
+
+def material_title(subject, date, filename):
+    """Display title for an uploaded file in search results"""
+    if filename == 'notes.txt':
+        return f'{subject} notes ({date})'
+    return filename
+
+def get_assignment_analytics(class_name=None):
+    """Assignments with their total_students/submitted counts, newest due date first"""
+    conn = get_db_connection()
+    if class_name is None:
+        rows = conn.execute(ALL_ASSIGNMENT_ANALYTICS_SQL).fetchall()
+    else:
+        rows = conn.execute(ASSIGNMENT_ANALYTICS_SQL, (class_name,)).fetchall()
+    conn.close()
+    analytics = []
+    for row in rows:
+        assignment = dict(row)
+        analytics.append({'assignment': assignment,
+                          'total_students': assignment.pop('total_students'),
+                          'submitted': assignment.pop('submitted')})
+    return analytics
+
+def rebuild_assignment_stats(check_only=False):
+    """Recompute assignment_stats from the base tables.
+
+    Returns the assignment ids whose stored counts were wrong (missing, stale
+    or orphaned rows). With check_only the table is left untouched.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        expected = {row[0]: tuple(row[1:]) for row in conn.execute(ASSIGNMENT_STATS_SQL)}
+        stored = {row[0]: tuple(row[1:]) for row in conn.execute(
+            'SELECT assignment_id, class_name, total_students, submitted FROM assignment_stats')}
+        wrong = sorted(i for i in expected.keys() | stored.keys() if expected.get(i) != stored.get(i))
+        if check_only or not wrong:
+            conn.rollback()
+            return wrong
+        conn.execute('DELETE FROM assignment_stats')
+        conn.execute('INSERT INTO assignment_stats (assignment_id, class_name, total_students, submitted) '
+                     + ASSIGNMENT_STATS_SQL)
+        conn.commit()
+        return wrong
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def get_popular_searches():
     """Get popular search queries"""
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('''SELECT query, COUNT(*) as count FROM search_history 
-                 GROUP BY query ORDER BY count DESC LIMIT 10''')
+    c.execute(POPULAR_SEARCHES_SQL)
     searches = [dict(row) for row in c.fetchall()]
     conn.close()
     return searches
+
+# Full-table exports (/export/<name>, python database.py export). Columns are
+# (name, SQL expression, type) with type 'int', 'float' or 'text' for learning_gap_shared.export;
+# class_name, subject and date name what each filter applies to.
+EXPORT_BATCH_SIZE = 10000
+EXPORTS = {
+    'submissions': {
+        'from': '''submissions s JOIN assignments a ON a.id = s.assignment_id
+                   LEFT JOIN users u ON u.id = s.student_id''',
+        'columns': [('submission_id', 's.id', 'int'), ('assignment_id', 's.assignment_id', 'int'),
+                    ('assignment', 'a.title', 'text'), ('class_name', 'a.class_name', 'text'),
+                    ('subject', 'a.subject', 'text'), ('due_date', 'a.due_date', 'text'),
+                    ('student_id', 's.student_id', 'int'), ('student_username', 'u.username', 'text'),
+                    ('student_name', 'u.name', 'text'), ('submitted_at', 's.submitted_at', 'text'),
+                    ('status', 's.status', 'text'), ('file_path', 's.file_path', 'text'),
+                    ('submission_text', 's.submission_text', 'text')],
+        'class_name': 'a.class_name', 'subject': 'a.subject', 'date': 's.submitted_at', 'order': 's.id',
+    },
+    'progress': {
+        'from': 'progress p LEFT JOIN users u ON u.id = p.student_id',
+        'columns': [('progress_id', 'p.id', 'int'), ('student_id', 'p.student_id', 'int'),
+                    ('student_username', 'u.username', 'text'), ('student_name', 'u.name', 'text'),
+                    ('class_name', 'u.class_name', 'text'), ('subject', 'p.subject', 'text'),
+                    ('topics_completed', 'p.topics_completed', 'int'),
+                    ('assessment_score', 'p.assessment_score', 'float'),
+                    ('materials_viewed', 'p.materials_viewed', 'int'),
+                    ('last_accessed', 'p.last_accessed', 'text'), ('updated_at', 'p.updated_at', 'text')],
+        'class_name': 'u.class_name', 'subject': 'p.subject', 'date': 'p.updated_at', 'order': 'p.id',
+    },
+    'assignments': {
+        'from': '''assignments a LEFT JOIN users u ON u.id = a.teacher_id
+                   LEFT JOIN assignment_stats st ON st.assignment_id = a.id''',
+        'columns': [('assignment_id', 'a.id', 'int'), ('title', 'a.title', 'text'),
+                    ('class_name', 'a.class_name', 'text'), ('subject', 'a.subject', 'text'),
+                    ('due_date', 'a.due_date', 'text'), ('teacher_id', 'a.teacher_id', 'int'),
+                    ('teacher_name', 'u.name', 'text'), ('created_at', 'a.created_at', 'text'),
+                    ('total_students', 'st.total_students', 'int'), ('submitted', 'st.submitted', 'int'),
+                    ('description', 'a.description', 'text')],
+        'class_name': 'a.class_name', 'subject': 'a.subject', 'date': 'a.due_date', 'order': 'a.id',
+    },
+}
+
+def _export_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} must be a date like 2026-01-31, not {value!r}')
+
+def export_query(name, class_name=None, subject=None, date_from=None, date_to=None):
+    """SQL and parameters for an EXPORTS table; the date range is inclusive (YYYY-MM-DD)"""
+    spec = EXPORTS[name]
+    where, params = [], []
+    if class_name:
+        where.append(f"{spec['class_name']} = ?")
+        params.append(class_name)
+    if subject:
+        where.append(f"{spec['subject']} = ?")
+        params.append(subject)
+    # Dates and timestamps are stored as ISO text, so whole days compare as strings
+    if date_from:
+        where.append(f"{spec['date']} >= ?")
+        params.append(_export_date(date_from, 'date_from').strftime('%Y-%m-%d'))
+    if date_to:
+        where.append(f"{spec['date']} < ?")
+        params.append((_export_date(date_to, 'date_to') + timedelta(days=1)).strftime('%Y-%m-%d'))
+    sql = (f"SELECT {', '.join(expr for _, expr, _ in spec['columns'])} FROM {spec['from']}"
+           + (f" WHERE {' AND '.join(where)}" if where else '') + f" ORDER BY {spec['order']}")
+    return sql, params
+
+def export_columns(name):
+    """(name, type) pairs of an export, as learning_gap_shared.export expects"""
+    return [(column, kind) for column, _, kind in EXPORTS[name]['columns']]
+
+def iter_export(name, class_name=None, subject=None, date_from=None, date_to=None,
+                batch_size=EXPORT_BATCH_SIZE):
+    """Yield an export's rows in batches of up to batch_size rows.
+
+    Rows are stepped from one open cursor, never fetched all at once, so
+    memory stays flat however large the table. The connection is held until
+    the generator is exhausted or closed.
+    """
+    sql, params = export_query(name, class_name, subject, date_from, date_to)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+# Queries that must be answered from an index, with sample parameters
+PLAN_CHECKS = {
+    'get_assignments_by_class': (ASSIGNMENTS_BY_CLASS_SQL, ('8',)),
+    'get_submissions_for_assignment': (SUBMISSIONS_FOR_ASSIGNMENT_SQL, (1,)),
+    'get_student_progress': (STUDENT_PROGRESS_SQL, (1,)),
+    'get_popular_searches': (POPULAR_SEARCHES_SQL, ()),
+    'get_assignment_analytics': (ASSIGNMENT_ANALYTICS_SQL, ('8',)),
+    'search_documents': (SEARCH_SQL, {'query': fts_query('fractions'), 'class_name': '8', 'subject': 'Maths',
+                                      'limit': SEARCH_PAGE_SIZE + 1, 'offset': 0}),
+}
+
+def explain(sql, params=(), conn=None):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+    finally:
+        if own_conn:
+            conn.close()
+
+def check_query_plans(conn=None):
+    """Raise RuntimeError if any PLAN_CHECKS query does a full table scan.
+
+    A SCAN through a covering index is allowed; a bare 'SCAN <table>' is not.
+    """
+    failures = []
+    for name, (sql, params) in PLAN_CHECKS.items():
+        for detail in explain(sql, params, conn):
+            if detail.startswith('SCAN') and 'INDEX' not in detail:
+                failures.append(f'{name}: {detail}')
+    if failures:
+        raise RuntimeError('Full table scans in query plans:\n  ' + '\n  '.join(failures))
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Learning gap database tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('migrate', help='create tables and apply pending migrations')
+    sub.add_parser('check-plans', help='fail if indexed queries fall back to table scans')
+    reindex = sub.add_parser('reindex', help='rebuild the search index for uploaded materials')
+    reindex.add_argument('uploads', nargs='?', default='uploads')
+    stats = sub.add_parser('rebuild-stats', help='recompute assignment_stats from scratch')
+    stats.add_argument('--check', action='store_true', help='only report rows that are out of date')
+    export = sub.add_parser('export', help='stream a table to CSV, Parquet or Arrow')
+    export.add_argument('table', choices=sorted(EXPORTS))
+    export.add_argument('--format', default='csv', choices=['csv', 'parquet', 'arrow'])
+    export.add_argument('--class-name')
+    export.add_argument('--subject')
+    export.add_argument('--from', dest='date_from', help='first day, YYYY-MM-DD')
+    export.add_argument('--to', dest='date_to', help='last day, YYYY-MM-DD')
+    export.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    export.add_argument('--output', '-o', help='default: <table>.<format>')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        try:
+            init_db()
+        except MigrationError as e:
+            raise SystemExit(str(e))
+        conn = get_db_connection()
+        print(f'Schema version: {get_schema_version(conn)}')
+        conn.close()
+    elif args.command == 'check-plans':
+        init_db()
+        for name, (sql, params) in PLAN_CHECKS.items():
+            print(f'{name}:')
+            for detail in explain(sql, params):
+                print(f'    {detail}')
+        check_query_plans()
+        print('OK: no full table scans')
+    elif args.command == 'reindex':
+        init_db()
+        indexed, removed = reindex_materials(args.uploads)
+        print(f'Indexed {indexed} material files, removed {removed} stale entries')
+    elif args.command == 'rebuild-stats':
+        init_db()
+        wrong = rebuild_assignment_stats(check_only=args.check)
+        if args.check and wrong:
+            raise SystemExit(f'assignment_stats out of date for {len(wrong)} assignment(s): {wrong[:20]}')
+        action = 'found' if args.check else 'fixed'
+        print(f'OK: assignment_stats consistent ({len(wrong)} row(s) {action})')
+    elif args.command == 'export':
+        from learning_gap_shared.export import check_format, write_export
+
+        init_db()
+        output = args.output or f'{args.table}.{args.format}'
+        try:
+            check_format(args.format)
+            export_query(args.table, args.class_name, args.subject, args.date_from, args.date_to)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        start = time.perf_counter()
+        rows = write_export(output, export_columns(args.table),
+                            iter_export(args.table, args.class_name, args.subject, args.date_from,
+                                        args.date_to, args.batch_size), args.format)
+        print(f'Exported {rows} {args.table} rows to {output} in {time.perf_counter() - start:.1f}s')
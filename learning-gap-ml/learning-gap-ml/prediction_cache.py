@@ -0,0 +1,194 @@
+"""Two-tier cache of risk predictions keyed on (model version, feature row).
+
+The four features are small integers and marks, so the same rows come back
+all day. A bounded in-process LRU answers repeats without touching the model.
+Behind it, a small SQLite file shared by every worker process on the host
+lets a prediction made in one worker serve the others. Keys include the
+model version: when the registry swaps models, entries for the old version
+stop matching and the local tier is cleared. The shared tier records when
+each version was first seen and deletes entries of versions older than the
+one a worker is using. Entries of a newer version are never deleted, so a
+worker that has not reloaded yet cannot wipe those of one that has.
+
+The shared tier is best effort. If the file is locked or unavailable, the
+cache simply behaves as a local one.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LOCAL_MAXSIZE = 4096
+SHARED_CACHE_FILE = "prediction_cache.db"
+SHARED_MAXSIZE = 100000
+SHARED_TIMEOUT = 0.05      # seconds to wait for a lock before skipping the shared tier
+TRIM_EVERY = 256           # shared writes between size checks
+TOUCH_INTERVAL = 60.0      # refresh a shared entry's recency at most this often
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    version TEXT NOT NULL,
+    features TEXT NOT NULL,
+    label TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (version, features)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_predictions_used ON predictions(used);
+CREATE TABLE IF NOT EXISTS versions (
+    version TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def feature_key(features):
+    """Canonical text form of a feature row (repr round-trips floats exactly)"""
+    return ",".join(repr(float(v)) for v in features)
+
+
+class PredictionCache:
+    def __init__(self, maxsize=LOCAL_MAXSIZE, shared_path=SHARED_CACHE_FILE, shared_maxsize=SHARED_MAXSIZE):
+        self.maxsize = maxsize
+        self.shared_path = shared_path
+        self.shared_maxsize = shared_maxsize
+        self._local = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+        self._writes = 0
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0,
+                       "shared_evictions": 0, "invalidations": 0, "shared_errors": 0}
+
+    # ---- shared tier -----------------------------------------------------
+
+    def _conn(self):
+        conn = getattr(self._conns, "conn", None)
+        if conn is None or getattr(self._conns, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.shared_path, timeout=SHARED_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # it is only a cache
+            conn.executescript(SCHEMA)
+            self._conns.conn, self._conns.pid = conn, os.getpid()
+        return conn
+
+    def _shared(self, fn):
+        if not self.shared_path:
+            return None
+        try:
+            return fn(self._conn())
+        except sqlite3.Error:
+            self._count("shared_errors")
+            return None
+
+    def _shared_get(self, version, key):
+        def lookup(conn):
+            row = conn.execute("SELECT label, used FROM predictions WHERE version = ? AND features = ?",
+                               (version, key)).fetchone()
+            if row and time.time() - row[1] > TOUCH_INTERVAL:
+                conn.execute("UPDATE predictions SET used = ? WHERE version = ? AND features = ?",
+                             (time.time(), version, key))
+            return row[0] if row else None
+        return self._shared(lookup)
+
+    def _shared_put(self, version, key, label):
+        def store(conn):
+            conn.execute("INSERT OR REPLACE INTO predictions (version, features, label, used) VALUES (?, ?, ?, ?)",
+                         (version, key, label, time.time()))
+            with self._lock:
+                self._writes += 1
+                trim = self._writes % TRIM_EVERY == 0
+            if trim:
+                self._trim(conn, version)
+        self._shared(store)
+
+    def _drop_older_versions(self, conn, version):
+        """Record version's first sighting; delete entries of versions first seen before it"""
+        conn.execute("INSERT OR IGNORE INTO versions (version, first_seen) VALUES (?, ?)", (version, time.time()))
+        return conn.execute(
+            "DELETE FROM predictions WHERE version IN (SELECT version FROM versions WHERE first_seen < "
+            "(SELECT first_seen FROM versions WHERE version = ?))", (version,)).rowcount
+
+    def _trim(self, conn, version):
+        """Drop older model versions, then the least recently used rows over shared_maxsize"""
+        removed = self._drop_older_versions(conn, version)
+        excess = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.shared_maxsize
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM predictions WHERE (version, features) IN "
+                "(SELECT version, features FROM predictions ORDER BY used LIMIT ?)", (excess,)).rowcount
+        self._count("shared_evictions", removed)
+
+    # ---- local tier ------------------------------------------------------
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _check_version(self, version):
+        """Forget everything cached for a previous model version"""
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            had_version = self._version is not None
+            self._local.clear()
+            self._version = version
+            if had_version:
+                self._stats["invalidations"] += 1
+        self._shared(lambda conn: self._drop_older_versions(conn, version))
+
+    def get(self, version, features):
+        """Cached label for a feature row under a model version, or None"""
+        self._check_version(version)
+        key = feature_key(features)
+        with self._lock:
+            label = self._local.get(key)
+            if label is not None:
+                self._local.move_to_end(key)
+                self._stats["hits"] += 1
+                return label
+        label = self._shared_get(version, key)
+        if label is None:
+            self._count("misses")
+        else:
+            self._count("shared_hits")
+            self._store_local(key, label)
+        return label
+
+    def _store_local(self, key, label):
+        with self._lock:
+            self._local[key] = label
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def put(self, version, features, label):
+        self._check_version(version)
+        key = feature_key(features)
+        self._store_local(key, label)
+        self._shared_put(version, key, label)
+
+    def get_or_compute(self, version, features, compute):
+        """Cached label, or compute() it (and cache it) on a miss"""
+        label = self.get(version, features)
+        if label is None:
+            label = compute()
+            self.put(version, features, label)
+        return label
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self._shared(lambda conn: conn.execute("DELETE FROM predictions"))
+
+    def stats(self):
+        """Counters plus sizes and hit rate (hits from either tier / lookups)"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._local), maxsize=self.maxsize, version=self._version)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 4) if lookups else None
+        stats["shared_size"] = self._shared(lambda conn: conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0])
+        return stats
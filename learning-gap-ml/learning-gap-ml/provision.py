@@ -0,0 +1,211 @@
+"""Bulk account provisioning from a CSV of users.
+
+register_user() hashes one password and commits one INSERT per call, which
+is fine for a sign-up form but takes minutes for a whole school. The
+password hash is deliberately slow. provision_users() reads the CSV in
+chunks and, for each chunk:
+
+- validates the rows and reports bad ones by line number,
+- skips rows whose username or email is already taken, either in the
+  database or earlier in the file, before paying for a hash,
+- hashes the remaining passwords in parallel on a process pool,
+- inserts the rows in one transaction.
+
+A conflict or invalid row is reported and skipped. It never aborts the
+rest of the file.
+
+Usage from the command line (run from the app directory):
+
+    python provision.py users.csv --workers 8
+
+The CSV needs username, password, email, role (teacher or student) and name
+columns. class_name is optional.
+"""
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+import database
+
+CHUNK_SIZE = 1000
+MIN_PARALLEL = 16  # fewer hashes than this are done inline, not worth starting a pool
+
+COLUMNS = ('username', 'password', 'email', 'role', 'name', 'class_name')
+REQUIRED = ('username', 'password', 'email', 'role', 'name')
+ROLES = ('teacher', 'student')
+
+# Rows that lose a race with a concurrent sign-up are skipped, not failed
+INSERT_USER_SQL = '''INSERT INTO users (username, password, email, role, name, class_name)
+                     VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING'''
+
+
+class ProvisionError(ValueError):
+    """The file as a whole cannot be used (bad format or header)"""
+
+
+def iter_users(stream):
+    """Yield (line_number, {column: text}) from a binary CSV stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        rows = csv.reader(text)
+        try:
+            header = [cell.strip().lower().replace(' ', '_') for cell in next(rows)]
+        except StopIteration:
+            raise ProvisionError('The file is empty')
+        missing = [c for c in REQUIRED if c not in header]
+        if missing:
+            raise ProvisionError(f'Missing required column(s): {", ".join(missing)}')
+        for line, row in enumerate(rows, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            yield line, {column: cell.strip() for column, cell in zip(header, row) if column in COLUMNS}
+    finally:
+        text.detach()  # leave the caller's stream open
+
+
+def clean_user(record):
+    """Validate one record; returns a users row (password still plain) or raises ValueError"""
+    for column in REQUIRED:
+        if not record.get(column):
+            raise ValueError(f'{column} is required')
+    role = record['role'].lower()
+    if role not in ROLES:
+        raise ValueError(f'role {record["role"]!r} is not teacher/student')
+    if '@' not in record['email']:
+        raise ValueError(f'email {record["email"]!r} is not an email address')
+    return (record['username'], record['password'], record['email'], role, record['name'],
+            record.get('class_name') or None)
+
+
+def _taken(conn, column, values):
+    """The subset of values already present in users.<column>"""
+    values = list(values)
+    if not values:
+        return set()
+    placeholders = ','.join('?' * len(values))
+    return {row[0] for row in conn.execute(f'SELECT {column} FROM users WHERE {column} IN ({placeholders})',
+                                           values)}
+
+
+def provision_users(stream, workers=None, chunk_size=CHUNK_SIZE):
+    """Create the accounts in a users CSV. Returns a summary dict.
+
+    summary['errors'] lists every skipped row as 'line N: reason'. Invalid
+    rows and conflicts (username or email already taken) are counted
+    separately.
+    """
+    summary = {'rows': 0, 'created': 0, 'invalid': 0, 'conflicts': 0, 'errors': []}
+    seen_usernames, seen_emails = set(), set()
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    start = time.perf_counter()
+
+    def skip(kind, line, reason):
+        summary[kind] += 1
+        summary['errors'].append(f'line {line}: {reason}')
+
+    def flush(chunk):
+        nonlocal pool
+        conn = database.get_db_connection()
+        try:
+            taken_usernames = _taken(conn, 'username', (row[0] for _, row in chunk))
+            taken_emails = _taken(conn, 'email', (row[2] for _, row in chunk))
+        finally:
+            conn.close()
+        pending = []
+        for line, row in chunk:
+            if row[0] in taken_usernames:
+                skip('conflicts', line, f'username {row[0]!r} already exists')
+            elif row[2] in taken_emails:
+                skip('conflicts', line, f'email {row[2]!r} already exists')
+            else:
+                pending.append((line, row))
+        if not pending:
+            return
+
+        passwords = [row[1] for _, row in pending]
+        if len(passwords) < MIN_PARALLEL or workers == 1:
+            hashes = [generate_password_hash(p) for p in passwords]
+        else:
+            if pool is None:
+                pool = ProcessPoolExecutor(workers)
+            hashes = list(pool.map(generate_password_hash, passwords,
+                                   chunksize=max(1, len(passwords) // (workers * 4))))
+
+        conn = database.get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for (line, row), hashed in zip(pending, hashes):
+                if conn.execute(INSERT_USER_SQL, (row[0], hashed) + row[2:]).rowcount:
+                    summary['created'] += 1
+                else:
+                    skip('conflicts', line, f'username {row[0]!r} or email {row[2]!r} already exists')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    chunk = []
+    try:
+        for line, record in iter_users(stream):
+            summary['rows'] += 1
+            try:
+                row = clean_user(record)
+            except ValueError as e:
+                skip('invalid', line, e)
+                continue
+            if row[0] in seen_usernames:
+                skip('conflicts', line, f'username {row[0]!r} appears earlier in the file')
+                continue
+            if row[2] in seen_emails:
+                skip('conflicts', line, f'email {row[2]!r} appears earlier in the file')
+                continue
+            seen_usernames.add(row[0])
+            seen_emails.add(row[2])
+            chunk.append((line, row))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ProvisionError(f'Could not read the file after {summary["rows"]} rows: {e}')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['users_per_sec'] = summary['created'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def format_summary(summary):
+    return (f"{summary['created']} accounts created, {summary['conflicts']} conflicts and "
+            f"{summary['invalid']} invalid rows skipped ({summary['rows']} rows in {summary['seconds']:.2f}s, "
+            f"{summary['users_per_sec']:,.0f} users/s)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Create user accounts from a CSV file')
+    parser.add_argument('users')
+    parser.add_argument('--workers', type=int, help='hashing processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    database.init_db()
+    with open(args.users, 'rb') as f:
+        try:
+            summary = provision_users(f, args.workers, args.chunk_size)
+        except ProvisionError as e:
+            raise SystemExit(str(e))
+    for error in summary['errors']:
+        print(f'[SKIP] {error}')
+    print(f'[OK] {format_summary(summary)}')
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly initialised database file under tmp_path"""
+    monkeypatch.setattr(database, 'DB_FILE', str(tmp_path / 'learning_gap.db'))
+    database.init_db()
+    yield database
+    database.close_db_connections()
+
+
+@pytest.fixture(scope='session')
+def flask_app(tmp_path_factory):
+    """The app module, imported in a scratch directory.
+
+    Importing it creates the database, uploads/ and prediction_cache.db
+    in the current directory; JOBS_DB keeps the job queue there too.
+    """
+    work_dir = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    database.DB_FILE = str(work_dir / 'learning_gap.db')
+    os.environ['JOBS_DB'] = str(work_dir / 'jobs.db')
+    import app
+    yield app
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.app.test_client()
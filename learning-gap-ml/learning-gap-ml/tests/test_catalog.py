@@ -0,0 +1,128 @@
+import os
+import time
+
+import pytest
+
+from catalog import MaterialsCatalog
+
+
+def _touch(root, relpath, data=b'x'):
+    path = root.joinpath(*relpath.split('/'))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _bump_mtime(path):
+    """Make a directory change visible even on filesystems with coarse mtimes"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    root = tmp_path / 'uploads'
+    _touch(root, '8/Maths/2026-01-05/notes.txt')
+    _touch(root, '8/Maths/2026-01-05/fractions.pdf')
+    _touch(root, '8/Maths/2026-01-12/decimals.pdf')
+    _touch(root, '8/Science/2026-01-06/cells.pdf')
+    _touch(root, '9/English/2026-01-07/poems.pdf')
+    _touch(root, '8/Maths/2026-01-05/.tmp-link')  # hidden: BlobStore.link temp file
+    return root
+
+
+def _files(catalog, class_name, subject):
+    return [file['path'] for group in catalog.materials(class_name, subject) for file in group['files']]
+
+
+def test_build_indexes_the_tree(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    assert catalog.version == 1
+    assert catalog.classes_subjects() == {'8': ['Maths', 'Science'], '9': ['English']}
+    groups = catalog.materials('8', 'Maths')
+    assert [(g['class'], g['subject'], g['date']) for g in groups] == [
+        ('8', 'Maths', '2026-01-05'), ('8', 'Maths', '2026-01-12')]
+    assert [f['name'] for f in groups[0]['files']] == ['fractions.pdf', 'notes.txt']
+    assert groups[0]['files'][0]['path'] == '8/Maths/2026-01-05/fractions.pdf'
+
+
+def test_all_classes_and_subjects(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    assert len(_files(catalog, 'ALL', 'ALL')) == 5
+    assert _files(catalog, '8', 'ALL') == ['8/Maths/2026-01-05/fractions.pdf', '8/Maths/2026-01-05/notes.txt',
+                                           '8/Maths/2026-01-12/decimals.pdf', '8/Science/2026-01-06/cells.pdf']
+    assert _files(catalog, 'ALL', 'English') == ['9/English/2026-01-07/poems.pdf']
+    assert _files(catalog, '10', 'Maths') == []
+    assert _files(catalog, '8', 'History') == []
+
+
+def test_missing_root_is_empty(tmp_path):
+    catalog = MaterialsCatalog(str(tmp_path / 'nothing')).build()
+    assert catalog.classes_subjects() == {}
+    assert catalog.materials('ALL', 'ALL') == []
+
+
+def test_add_file_without_rescanning(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    before = catalog.classes_subjects()
+    _touch(uploads, '10/History/2026-02-01/rome.pdf')
+    catalog.add_file('10', 'History', '2026-02-01', 'rome.pdf')
+    catalog.add_file('10', 'History', '2026-02-01', 'rome.pdf')  # saved twice: listed once
+    assert catalog.version == 3
+    assert _files(catalog, '10', 'History') == ['10/History/2026-02-01/rome.pdf']
+    assert '10' not in before  # earlier results are snapshots, not live views
+    # The new directories' mtimes are recorded, so refresh() finds nothing to do
+    assert catalog.refresh() is False
+
+
+def test_refresh_picks_up_out_of_band_changes(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    assert catalog.refresh() is False
+    version = catalog.version
+
+    day = uploads / '8' / 'Maths' / '2026-01-05'
+    _touch(uploads, '8/Maths/2026-01-05/ratios.pdf')
+    _bump_mtime(day)
+    (uploads / '9' / 'English' / '2026-01-07' / 'poems.pdf').unlink()
+    _bump_mtime(uploads / '9' / 'English' / '2026-01-07')
+    _touch(uploads, '11/Art/2026-03-01/colour.pdf')
+    _bump_mtime(uploads)
+
+    assert catalog.refresh() is True
+    assert catalog.version == version + 1
+    assert '8/Maths/2026-01-05/ratios.pdf' in _files(catalog, '8', 'Maths')
+    assert _files(catalog, '9', 'English') == []
+    assert _files(catalog, '11', 'Art') == ['11/Art/2026-03-01/colour.pdf']
+
+
+def test_removed_class_is_forgotten(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    for path in sorted((uploads / '9').rglob('*'), reverse=True):
+        path.unlink() if path.is_file() else path.rmdir()
+    (uploads / '9').rmdir()
+    _bump_mtime(uploads)
+    assert catalog.refresh() is True
+    assert '9' not in catalog.classes_subjects()
+
+
+def test_watcher_refreshes_in_the_background(uploads):
+    catalog = MaterialsCatalog(str(uploads)).build()
+    catalog.start_watcher(interval=0.05)
+    watcher = catalog._watcher
+    catalog.start_watcher(interval=0.05)
+    assert catalog._watcher is watcher  # started once
+
+    _touch(uploads, '12/Music/2026-04-01/scales.pdf')
+    _bump_mtime(uploads)
+    deadline = time.monotonic() + 5
+    while '12' not in catalog.classes_subjects() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert catalog.classes_subjects()['12'] == ['Music']
+
+
+def test_student_page_lists_catalog_materials(flask_app, client, uploads, monkeypatch):
+    monkeypatch.setattr(flask_app, 'materials_catalog', MaterialsCatalog(str(uploads)).build())
+    response = client.post('/student', data={'class_name': '8', 'subject': 'Maths'})
+    assert response.status_code == 200
+    assert b'fractions.pdf' in response.data and b'decimals.pdf' in response.data
+    assert b'cells.pdf' not in response.data
@@ -0,0 +1,93 @@
+import threading
+
+import database
+
+
+def test_connections_are_reused(db):
+    first = db.get_db_connection()
+    first.close()
+    stats = db.get_db_stats()
+    second = db.get_db_connection()
+    assert second is first
+    assert db.get_db_stats()['connections_reused'] == stats['connections_reused'] + 1
+    second.close()
+
+
+def test_connections_are_tuned(db):
+    conn = db.get_db_connection()
+    try:
+        def pragma(name):
+            return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == database.BUSY_TIMEOUT_MS
+        assert pragma('cache_size') == -database.CACHE_SIZE_KB
+        assert pragma('temp_store') == 2  # MEMORY
+    finally:
+        conn.close()
+
+
+def test_close_rolls_back_an_open_transaction(db):
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO search_history (user_id, query) VALUES (1, 'left open')")
+    assert conn.in_transaction
+    conn.close()
+
+    conn = db.get_db_connection()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM search_history').fetchone()[0] == 0
+    conn.close()
+
+
+def test_pool_keeps_at_most_pool_size_idle(db):
+    conns = [db.get_db_connection() for _ in range(database.POOL_SIZE + 3)]
+    assert len({id(conn) for conn in conns}) == len(conns)
+    for conn in conns:
+        conn.close()
+    assert db.get_db_stats()['pool_idle'] == database.POOL_SIZE
+
+
+def test_changing_db_file_drops_the_pool(db, tmp_path, monkeypatch):
+    old = db.get_db_connection()
+    old.close()
+    monkeypatch.setattr(database, 'DB_FILE', str(tmp_path / 'other.db'))
+    new = db.get_db_connection()
+    assert new is not old
+    assert new.execute('PRAGMA database_list').fetchone()['file'].endswith('other.db')
+    new.close()
+    assert db.get_db_stats()['pool_idle'] == 1
+
+
+def test_statements_are_counted(db):
+    before = db.get_db_stats()['queries']
+    conn = db.get_db_connection()
+    conn.execute('SELECT 1').fetchone()
+    conn.executemany('INSERT INTO search_history (user_id, query) VALUES (?, ?)', [(1, 'a'), (1, 'b')])
+    conn.commit()
+    conn.close()
+    assert db.get_db_stats()['queries'] == before + 2
+
+
+def test_concurrent_writers_wait_instead_of_failing(db):
+    errors = []
+
+    def writer(student_id):
+        try:
+            for n in range(25):
+                db.update_progress(student_id, 'Maths', topics_completed=n)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert [row['topics_completed'] for row in (db.get_student_progress(i)[0] for i in range(8))] == [24] * 8
+
+
+def test_db_stats_endpoint(client):
+    stats = client.get('/db/stats').get_json()
+    assert {'connections_opened', 'connections_reused', 'queries', 'pool_idle'} <= set(stats)
@@ -0,0 +1,165 @@
+import pytest
+
+import database
+
+
+@pytest.mark.parametrize('name', sorted(database.PLAN_CHECKS))
+def test_query_plan_uses_index(db, name):
+    sql, params = database.PLAN_CHECKS[name]
+    plan = database.explain(sql, params)
+    scans = [detail for detail in plan if detail.startswith('SCAN') and 'INDEX' not in detail]
+    assert not scans, f'{name} does a full table scan: {plan}'
+
+
+def test_check_query_plans(db):
+    assert database.check_query_plans()
+
+
+def test_migration_refuses_duplicate_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_FILE', str(tmp_path / 'old.db'))
+    monkeypatch.setattr(database, 'MIGRATIONS', [])
+    database.init_db()  # tables only, schema version 0
+    conn = database.get_db_connection()
+    conn.executemany('INSERT INTO progress (student_id, subject, topics_completed) VALUES (?, ?, ?)',
+                     [(1, 'Maths', 3), (1, 'Maths', 5), (2, 'Maths', 4)])
+    conn.commit()
+    monkeypatch.undo()
+    monkeypatch.setattr(database, 'DB_FILE', str(tmp_path / 'old.db'))
+
+    with pytest.raises(database.MigrationError, match=r"student 1 / 'Maths' \(2 rows\)"):
+        database.migrate(conn)
+    assert database.get_schema_version(conn) == 0
+    assert conn.execute('SELECT COUNT(*) FROM progress').fetchone()[0] == 3
+
+    conn.execute("DELETE FROM progress WHERE topics_completed = 3")
+    conn.commit()
+    assert database.migrate(conn) == database.MIGRATIONS[-1][0]
+    conn.close()
+    database.close_db_connections()
+
+
+def test_search_filters_are_exact_and_terms_skip_filter_columns(db):
+    db.index_documents([
+        ('material', 'a', '8', 'Maths', 'Fractions worksheet', 'halves and quarters'),
+        ('material', 'b', '8 A', 'Maths', 'Fractions revision', 'more halves'),
+        ('material', 'c', '8', 'Applied Maths', 'Fractions in practice', 'recipes'),
+        ('material', 'd', '9', 'Science', 'Lab notes', 'titration'),
+    ])
+
+    def refs(text, class_name=None, subject=None):
+        rows, _ = db.search_documents(text, class_name, subject)
+        return sorted(row['ref'] for row in rows)
+
+    assert refs('fractions') == ['a', 'b', 'c']
+    assert refs('fractions', '8') == ['a', 'c']
+    assert refs('fractions', '8', 'Maths') == ['a']
+    assert refs('fractions', subject='Maths') == ['a', 'b']
+    # Class and subject values are not searchable text
+    assert refs('science') == []
+    assert refs('maths') == []
+    assert refs('lab', '9', 'Science') == ['d']
+
+
+def test_search_pages(db):
+    db.index_documents([('material', str(i), '8', 'Maths', f'Fractions {i}', 'halves') for i in range(25)])
+    first, more = db.search_documents('fractions', '8', 'Maths', page=1, page_size=20)
+    second, more_after = db.search_documents('fractions', '8', 'Maths', page=2, page_size=20)
+    assert (len(first), more, len(second), more_after) == (20, True, 5, False)
+    assert not {r['ref'] for r in first} & {r['ref'] for r in second}
+
+
+@pytest.fixture
+def school(db):
+    """Two classes of students, a teacher, and two assignments per class"""
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO users (id, username, password, email, role, name) "
+                 "VALUES (1, 't', 'x', 't@x', 'teacher', 'Teacher')")
+    conn.executemany("INSERT INTO users (id, username, password, email, role, name, class_name) "
+                     "VALUES (?, ?, 'x', ?, 'student', ?, ?)",
+                     [(i, f's{i}', f's{i}@x', f'Student {i}', '8' if i < 15 else '9') for i in range(10, 20)])
+    conn.executemany("INSERT INTO assignments (id, teacher_id, title, subject, class_name, due_date) "
+                     "VALUES (?, 1, ?, 'Maths', ?, '2026-02-01')",
+                     [(1, 'A1', '8'), (2, 'A2', '8'), (3, 'B1', '9'), (4, 'B2', '9')])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _submitted(conn):
+    return dict(conn.execute('SELECT assignment_id, submitted FROM assignment_stats ORDER BY assignment_id'))
+
+
+def _submit(conn, *pairs):
+    conn.executemany('INSERT INTO submissions (assignment_id, student_id, submission_text) VALUES (?, ?, ?)',
+                     [(a, s, 'answer') for a, s in pairs])
+    conn.commit()
+
+
+def test_stats_follow_inserts_and_deletes(db, school):
+    _submit(school, (1, 10), (1, 10), (1, 11), (3, 15))
+    assert _submitted(school) == {1: 2, 2: 0, 3: 1, 4: 0}
+    school.execute('DELETE FROM submissions WHERE id = (SELECT MIN(id) FROM submissions)')
+    school.commit()
+    assert _submitted(school)[1] == 2  # student 10 still has a submission
+    school.execute('DELETE FROM submissions WHERE assignment_id = 1')
+    school.commit()
+    assert _submitted(school)[1] == 0
+    assert db.rebuild_assignment_stats(check_only=True) == []
+
+
+@pytest.mark.parametrize('update', [
+    'UPDATE submissions SET assignment_id = 2 WHERE assignment_id = 1 AND student_id = 11',
+    'UPDATE submissions SET assignment_id = 2 WHERE id = (SELECT MIN(id) FROM submissions)',
+    'UPDATE submissions SET assignment_id = 2 WHERE assignment_id = 1',
+    'UPDATE submissions SET student_id = 12 WHERE student_id = 10',
+    'UPDATE submissions SET student_id = 11 WHERE student_id = 10',
+    'UPDATE submissions SET assignment_id = 3, student_id = 16 WHERE student_id = 11',
+    'UPDATE submissions SET assignment_id = 4 WHERE assignment_id = 3',
+    "UPDATE submissions SET status = 'graded', submission_text = 'marked'",
+    'UPDATE submissions SET assignment_id = assignment_id, student_id = student_id',
+    'UPDATE submissions SET assignment_id = 99 WHERE student_id = 15',  # no stats row to count into
+])
+def test_stats_follow_updates(db, school, update):
+    _submit(school, (1, 10), (1, 10), (1, 11), (2, 11), (3, 15), (3, 16))
+    school.execute(update)
+    school.commit()
+    # Same as a full recount from the base tables
+    assert db.rebuild_assignment_stats(check_only=True) == []
+
+
+def test_migration_recounts_drifted_stats(db, school):
+    _submit(school, (1, 10), (1, 11))
+    school.execute('DROP TRIGGER submissions_stats_au')
+    school.execute('UPDATE submissions SET assignment_id = 2 WHERE student_id = 10')
+    school.execute('PRAGMA user_version = 4')
+    school.commit()
+    assert db.rebuild_assignment_stats(check_only=True) == [1, 2]
+
+    assert db.migrate(school) == db.MIGRATIONS[-1][0]
+    assert _submitted(school) == {1: 1, 2: 1, 3: 0, 4: 0}
+    assert db.rebuild_assignment_stats(check_only=True) == []
+
+
+def test_search_history_query_index_is_dropped(db):
+    conn = db.get_db_connection()
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(search_history)')}
+    conn.close()
+    assert 'idx_search_history_query' not in indexes
+
+
+def test_buffered_searches_are_counted_with_utc_timestamps(db, monkeypatch):
+    from datetime import datetime, timezone
+
+    monkeypatch.setattr(db, '_search_flusher', object())  # flush by hand, not from the background thread
+    before = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    for query in ('fractions', 'fractions', 'titration'):
+        db.record_search(1, query)
+    assert db.flush_searches() == 3
+    assert db.flush_searches() == 0
+    after = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    assert db.get_popular_searches() == [{'query': 'fractions', 'count': 2}, {'query': 'titration', 'count': 1}]
+    conn = db.get_db_connection()
+    stamps = [row[0] for row in conn.execute('SELECT searched_at FROM search_history')]
+    conn.close()
+    assert len(stamps) == 3 and all(before <= stamp <= after for stamp in stamps)
@@ -0,0 +1,101 @@
+import os
+import tracemalloc
+
+import pytest
+
+LARGE_FILE_SIZE = 64 * 1024 * 1024
+
+
+@pytest.fixture
+def uploads(flask_app, tmp_path, monkeypatch):
+    monkeypatch.setitem(flask_app.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_large_download_streams_in_bounded_memory(client, uploads):
+    path = uploads / '8' / 'Maths' / '2026-01-05' / 'big.pdf'
+    path.parent.mkdir(parents=True)
+    with open(path, 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(LARGE_FILE_SIZE // len(block)):
+            f.write(block)
+
+    tracemalloc.start()
+    try:
+        response = client.get('/download/8/Maths/2026-01-05/big.pdf', buffered=False)
+        assert response.status_code == 200
+        assert response.is_streamed
+        received = 0
+        for chunk in response.response:
+            received += len(chunk)
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert received == LARGE_FILE_SIZE
+    assert peak < 4 * 1024 * 1024, f'peak {peak} bytes while streaming {LARGE_FILE_SIZE} bytes'
+
+
+def test_conditional_get(client, uploads):
+    _write(uploads / '8' / 'notes.pdf', b'%PDF-1.4 hello')
+    response = client.get('/download/8/notes.pdf')
+    assert response.status_code == 200
+    etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+    assert not etag.startswith('W/')
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    assert client.get('/download/8/notes.pdf', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/download/8/notes.pdf', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/download/8/notes.pdf', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_etag_changes_when_file_is_replaced(client, uploads):
+    path = uploads / '8' / 'sheet.pdf'
+    _write(path, b'first version')
+    etag = client.get('/download/8/sheet.pdf').headers['ETag']
+    replacement = uploads / '8' / 'sheet.pdf.new'
+    _write(replacement, b'second version!')
+    os.replace(replacement, path)
+    response = client.get('/download/8/sheet.pdf', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.data == b'second version!'
+
+
+def test_range_requests(client, uploads):
+    data = bytes(range(256)) * 40
+    _write(uploads / '8' / 'data.pdf', data)
+    response = client.get('/download/8/data.pdf', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(data)}'
+    assert response.data == data[100:200]
+
+    etag = response.headers['ETag']
+    resumed = client.get('/download/8/data.pdf', headers={'Range': 'bytes=5000-', 'If-Range': etag})
+    assert resumed.status_code == 206
+    assert resumed.data == data[5000:]
+    stale = client.get('/download/8/data.pdf', headers={'Range': 'bytes=5000-', 'If-Range': '"stale"'})
+    assert stale.status_code == 200
+    assert stale.data == data
+
+    assert client.get('/download/8/data.pdf', headers={'Range': f'bytes={len(data)}-'}).status_code == 416
+
+
+def test_x_accel_mode_sends_headers_only(flask_app, client, uploads, monkeypatch):
+    monkeypatch.setitem(flask_app.app.config, 'SENDFILE_MODE', 'x-accel')
+    _write(uploads / '8' / 'Maths' / 'unit 1.pdf', b'%PDF-1.4 body')
+    response = client.get('/download/8/Maths/unit%201.pdf')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/8/Maths/unit%201.pdf'
+    assert response.data == b''
+    revalidated = client.get('/download/8/Maths/unit%201.pdf', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_missing_and_escaping_paths(client, uploads):
+    assert client.get('/download/8/missing.pdf').status_code == 404
+    assert client.get('/download/../app.py').status_code == 404
@@ -0,0 +1,100 @@
+import csv
+import io
+
+import pytest
+
+import database
+
+
+def _school(db, class_name='8th'):
+    """Two assignments in class_name, one elsewhere, and a submission to each on known days"""
+    db.register_user(f'teacher-{class_name}', 'pw', f'teacher-{class_name}@school.test', 'teacher', 'Ms Iyer')
+    db.register_user(f'asha-{class_name}', 'pw', f'asha-{class_name}@school.test', 'student', 'Asha, K.',
+                     class_name)
+    conn = db.get_db_connection()
+    try:
+        teacher_id, student_id = (row[0] for row in conn.execute(
+            'SELECT id FROM users WHERE username IN (?, ?) ORDER BY role DESC',
+            (f'teacher-{class_name}', f'asha-{class_name}')))
+    finally:
+        conn.close()
+    db.create_assignment(teacher_id, 'Essay', 'One page', 'English', class_name, '2026-02-01')
+    db.create_assignment(teacher_id, 'Fractions', 'Sheet 3', 'Maths', class_name, '2026-02-08')
+    db.create_assignment(teacher_id, 'Cells', 'Diagram', 'Science', 'other', '2026-02-08')
+    conn = db.get_db_connection()
+    try:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM assignments WHERE teacher_id = ? OR class_name = 'other' ORDER BY id", (teacher_id,))]
+        for assignment_id, day, text in zip(ids, ('2026-01-31', '2026-02-01', '2026-02-02'),
+                                            ('line one\nline "two"', 'half, quarter', 'mitochondria')):
+            conn.execute('INSERT INTO submissions (assignment_id, student_id, submission_text, submitted_at) '
+                         'VALUES (?, ?, ?, ?)', (assignment_id, student_id, text, f'{day} 09:30:00'))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_iter_export_batches_and_filters(db):
+    _school(db)
+    batches = list(db.iter_export('submissions', batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+    def texts(**filters):
+        return [row['submission_text'] for batch in db.iter_export('submissions', **filters) for row in batch]
+
+    assert texts(class_name='8th') == ['line one\nline "two"', 'half, quarter']
+    assert texts(class_name='8th', subject='Maths') == ['half, quarter']
+    # Both ends of the date range are whole days, inclusive
+    assert texts(date_from='2026-02-01', date_to='2026-02-02') == ['half, quarter', 'mitochondria']
+    assert texts(date_to='2026-01-31') == ['line one\nline "two"']
+    assert texts(class_name='9th') == []
+
+
+def test_iter_export_releases_its_connection_when_closed(db):
+    _school(db)
+    idle = db.get_db_stats()['pool_idle']
+    batches = db.iter_export('submissions', batch_size=1)
+    next(batches)
+    batches.close()  # the client went away mid-download
+    assert db.get_db_stats()['pool_idle'] == max(idle, 1)
+
+
+@pytest.mark.parametrize('filters, message', [
+    ({'date_from': '01/02/2026'}, 'date_from must be a date'),
+    ({'date_to': '2026-02-30'}, 'date_to must be a date'),
+])
+def test_export_query_rejects_bad_dates(filters, message):
+    with pytest.raises(ValueError, match=message):
+        database.export_query('submissions', **filters)
+
+
+def test_csv_export_round_trip(client):
+    _school(database, class_name='11th')
+    response = client.get('/export/submissions?class_name=11th&from=2026-01-31&to=2026-02-01')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=submissions.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert list(rows[0]) == [name for name, _ in database.export_columns('submissions')]
+    assert [(row['assignment'], row['student_name'], row['submission_text']) for row in rows] == [
+        ('Essay', 'Asha, K.', 'line one\nline "two"'), ('Fractions', 'Asha, K.', 'half, quarter')]
+
+
+def test_parquet_export_round_trip(client):
+    pq = pytest.importorskip('pyarrow.parquet')
+    _school(database, class_name='12th')
+    response = client.get('/export/progress?format=parquet')
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.column_names == [name for name, _ in database.export_columns('progress')]
+
+
+@pytest.mark.parametrize('url, status, message', [
+    ('/export/users', 404, "Unknown export 'users'"),
+    ('/export/submissions?format=xlsx', 400, 'xlsx'),
+    ('/export/submissions?from=yesterday', 400, 'date_from must be a date'),
+])
+def test_export_errors(client, url, status, message):
+    response = client.get(url)
+    assert response.status_code == status
+    assert message in response.get_json()['error']
@@ -0,0 +1,29 @@
+from learning_gap_shared import metrics
+
+
+def _sample(text, prefix):
+    return next(float(line.split()[-1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_trigger_steps_are_not_counted_as_statements(db):
+    db.create_assignment(1, 'Essay', 'Write one page', 'English', '8th', '2026-02-01')
+    trace = metrics.RequestTrace()
+    token = metrics._trace.set(trace)
+    try:
+        # Fires the submissions triggers that maintain assignment_stats
+        db.submit_assignment(1, 7, 'My essay')
+    finally:
+        metrics._trace.reset(token)
+    # Each trigger step is reported as the INSERT again; it is counted once
+    statements = [sql.split(' (')[0] for sql, _ in trace.statements]
+    assert statements == ['BEGIN', 'INSERT INTO submissions', 'COMMIT']
+    assert trace.queries == 3
+    assert trace.sql_seconds > 0  # connection checkout to close()
+
+
+def test_requests_report_their_sql_on_metrics(client):
+    assert client.get('/analytics').status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+    assert _sample(text, 'http_request_duration_seconds_count{method="GET",route="/analytics",status="200"}') >= 1
+    assert _sample(text, 'http_request_sql_queries_sum{route="/analytics"}') >= 1
+    assert _sample(text, 'http_request_sql_seconds_sum{route="/analytics"}') > 0
@@ -0,0 +1,46 @@
+import threading
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+def _shared_rows(cache):
+    return cache._conn().execute('SELECT version, COUNT(*) FROM predictions GROUP BY version').fetchall()
+
+
+def test_local_and_shared_hits(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first, second = PredictionCache(shared_path=path), PredictionCache(shared_path=path)
+    assert first.get_or_compute('v1', [3, 2, 75, 5], lambda: 'Low Risk') == 'Low Risk'
+    assert first.get('v1', [3, 2, 75, 5]) == 'Low Risk'
+    assert second.get('v1', [3.0, 2.0, 75.0, 5.0]) == 'Low Risk'  # from the shared tier
+    assert first.stats()['hits'] == 1
+    assert second.stats()['shared_hits'] == 1
+
+
+def test_lagging_worker_keeps_newer_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(prediction_cache, 'TRIM_EVERY', 1)
+    path = str(tmp_path / 'cache.db')
+    old, new = PredictionCache(shared_path=path), PredictionCache(shared_path=path)
+    old.put('v1', [1, 1, 90, 2], 'Low Risk')
+    new.put('v2', [9, 8, 40, 9], 'High Risk')   # reloaded first: v1 entries go
+    assert _shared_rows(new) == [('v2', 1)]
+
+    old.put('v1', [2, 1, 85, 2], 'Low Risk')    # still on v1: must not touch v2
+    assert dict(_shared_rows(old)) == {'v1': 1, 'v2': 1}
+    assert old.get('v2', [9, 8, 40, 9]) == 'High Risk'
+
+    new.put('v2', [8, 8, 45, 9], 'High Risk')
+    assert _shared_rows(new) == [('v2', 2)]
+
+
+def test_concurrent_writes_are_counted(tmp_path):
+    cache = PredictionCache(shared_path=str(tmp_path / 'cache.db'))
+    threads = [threading.Thread(target=lambda t=t: [cache.put('v1', [t, i, 50, 5], 'Low Risk') for i in range(200)])
+               for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A write that found the file locked is skipped and counted as a shared error
+    assert cache._writes + cache.stats()['shared_errors'] == 800
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+
+def _progress(db, student_id):
+    return [(row['subject'], row['topics_completed'], row['assessment_score'], row['materials_viewed'])
+            for row in db.get_student_progress(student_id)]
+
+
+def test_update_progress_inserts_then_updates_in_place(db):
+    db.update_progress(1, 'Maths', topics_completed=3, assessment_score=70.0)
+    assert _progress(db, 1) == [('Maths', 3, 70.0, 0)]
+
+    # Omitted fields keep their stored values
+    db.update_progress(1, 'Maths', materials_viewed=4)
+    db.update_progress(1, 'Maths', topics_completed=5)
+    assert _progress(db, 1) == [('Maths', 5, 70.0, 4)]
+
+    conn = db.get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM progress').fetchone()[0] == 1
+    conn.close()
+
+
+def test_bulk_update_accepts_dicts_and_tuples(db):
+    records = [
+        {'student_id': 1, 'subject': 'Maths', 'topics_completed': 2},
+        (1, 'Science', 4, 55.0),
+        (2, 'Maths'),
+        {'student_id': 1, 'subject': 'Maths', 'assessment_score': 81.5},  # same pair again
+    ]
+    assert db.bulk_update_progress(records) == 4
+    assert _progress(db, 1) == [('Maths', 2, 81.5, 0), ('Science', 4, 55.0, 0)]
+    assert _progress(db, 2) == [('Maths', 0, None, 0)]
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 7])
+def test_bulk_update_chunk_boundaries(db, count):
+    # A generator, consumed in chunks of 3: exact multiples, remainders and nothing at all
+    records = ((student_id, 'Maths', student_id) for student_id in range(count))
+    assert db.bulk_update_progress(records, chunk_size=3) == count
+    conn = db.get_db_connection()
+    rows = conn.execute('SELECT student_id, topics_completed FROM progress ORDER BY student_id').fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [(i, i) for i in range(count)]
+
+
+@pytest.mark.parametrize('bad, error', [
+    ({'student_id': 9}, KeyError),                         # no subject
+    ((9, None, 1), sqlite3.IntegrityError),                # NOT NULL subject
+    ((9,), ValueError),                                    # too short to unpack
+])
+def test_bulk_update_invalid_record_rolls_back_the_batch(db, bad, error):
+    db.update_progress(1, 'Maths', topics_completed=1)
+    records = [(1, 'Maths', 10), (2, 'Maths', 20), (3, 'Maths', 30), bad]
+    with pytest.raises(error):
+        db.bulk_update_progress(records, chunk_size=2)  # the first chunk was already written
+    assert _progress(db, 1) == [('Maths', 1, None, 0)]
+    assert _progress(db, 2) == []
+
+    # The connection went back to the pool clean, so the next batch applies
+    assert db.bulk_update_progress([(2, 'Maths', 20)]) == 1
+    assert _progress(db, 2) == [('Maths', 20, None, 0)]
@@ -0,0 +1,120 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import provision
+from provision import ProvisionError, clean_user, provision_users
+
+HEADER = 'username,password,email,role,name,class_name\n'
+
+
+def _provision(csv_text, **kwargs):
+    return provision_users(io.BytesIO(csv_text.encode()), **kwargs)
+
+
+def _usernames(db):
+    conn = db.get_db_connection()
+    try:
+        return [row[0] for row in conn.execute('SELECT username FROM users ORDER BY username')]
+    finally:
+        conn.close()
+
+
+def test_accounts_are_created_and_can_log_in(db):
+    summary = _provision(HEADER +
+                         'asha,secret1,asha@school.test,Student,Asha,8th\n'
+                         '\n'
+                         'mr.rao,secret2,rao@school.test,teacher,Mr Rao,\n', workers=1)
+    assert (summary['rows'], summary['created'], summary['invalid'], summary['conflicts']) == (2, 2, 0, 0)
+    assert summary['errors'] == []
+    ok, user = db.login_user('asha', 'secret1')
+    assert ok and (user['role'], user['class_name']) == ('student', '8th')
+    ok, user = db.login_user('mr.rao', 'secret2')
+    assert ok and user['class_name'] is None
+    assert db.login_user('asha', 'wrong') == (False, None)
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'password': 'p', 'email': 'a@b', 'role': 'student', 'name': 'A'}, 'username is required'),
+    ({'username': 'a', 'email': 'a@b', 'role': 'student', 'name': 'A'}, 'password is required'),
+    ({'username': 'a', 'password': 'p', 'email': 'a@b', 'role': 'admin', 'name': 'A'}, 'not teacher/student'),
+    ({'username': 'a', 'password': 'p', 'email': 'nobody', 'role': 'student', 'name': 'A'}, 'not an email'),
+])
+def test_clean_user_rejects(record, message):
+    with pytest.raises(ValueError, match=message):
+        clean_user(record)
+
+
+def test_conflicts_and_invalid_rows_are_counted_and_skipped(db):
+    assert db.register_user('taken', 'pw', 'taken@school.test', 'student', 'Taken')[0]
+    summary = _provision(HEADER +
+                         'taken,pw,new@school.test,student,Dup name,\n'         # username in the database
+                         'fresh,pw,taken@school.test,student,Dup email,\n'     # email in the database
+                         'ben,pw,ben@school.test,student,Ben,\n'
+                         'ben,pw,other@school.test,student,Ben again,\n'       # username earlier in the file
+                         'chen,pw,ben@school.test,student,Chen,\n'             # email earlier in the file
+                         'dev,pw,dev@school.test,principal,Dev,\n'             # invalid role
+                         ',pw,x@school.test,student,No name,\n'                # invalid: no username
+                         'esha,pw,esha@school.test,teacher,Esha,\n', workers=1, chunk_size=2)
+    assert (summary['rows'], summary['created'], summary['conflicts'], summary['invalid']) == (8, 2, 4, 2)
+    assert summary['errors'] == [
+        "line 2: username 'taken' already exists",
+        "line 3: email 'taken@school.test' already exists",
+        "line 5: username 'ben' appears earlier in the file",
+        "line 6: email 'ben@school.test' appears earlier in the file",
+        "line 7: role 'principal' is not teacher/student",
+        'line 8: username is required',
+    ]
+    assert _usernames(db) == ['ben', 'esha', 'taken']
+
+
+def test_row_losing_a_race_is_a_conflict(db, monkeypatch):
+    # A concurrent sign-up takes the username after the pre-check ran
+    monkeypatch.setattr(provision, '_taken', lambda conn, column, values: set())
+    assert db.register_user('race', 'pw', 'race@school.test', 'student', 'Race')[0]
+    summary = _provision(HEADER +
+                         'race,pw,race2@school.test,student,Loser,\n'
+                         'winner,pw,winner@school.test,student,Winner,\n', workers=1)
+    assert (summary['created'], summary['conflicts']) == (1, 1)
+    assert summary['errors'] == ["line 2: username 'race' or email 'race2@school.test' already exists"]
+    assert _usernames(db) == ['race', 'winner']
+
+
+def test_passwords_are_hashed_on_a_pool(db, monkeypatch):
+    pools = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, workers):
+            pools.append(workers)
+            super().__init__(workers)
+
+    monkeypatch.setattr(provision, 'ProcessPoolExecutor', RecordingPool)
+    monkeypatch.setattr(provision, 'MIN_PARALLEL', 2)
+    rows = ''.join(f'user{i},pw{i},user{i}@school.test,student,User {i},\n' for i in range(5))
+    summary = _provision(HEADER + rows, workers=2, chunk_size=3)
+    assert (summary['created'], summary['errors']) == (5, [])
+    assert pools == [2]  # started for the first chunk, reused for the second
+    assert all(db.login_user(f'user{i}', f'pw{i}')[0] for i in range(5))
+    assert summary['users_per_sec'] > 0
+    assert '5 accounts created' in provision.format_summary(summary)
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', 'empty'),
+    (b'username,password,email\nasha,pw,a@b\n', 'Missing required column.*role, name'),
+    (HEADER.encode() + b'asha,pw,a@b,student,\xff\xfe,\n', 'Could not read the file after 0 rows'),
+])
+def test_unreadable_files_raise(db, data, message):
+    with pytest.raises(ProvisionError, match=message):
+        provision_users(io.BytesIO(data), workers=1)
+    assert _usernames(db) == []
+
+
+def test_header_is_normalised_and_stream_left_open(db):
+    stream = io.BytesIO(('\ufeffUsername,Password,Email,Role,Name,Class Name,Notes\n'
+                         'gita,pw,gita@school.test,student,Gita,9th,ignored\n').encode())
+    assert provision_users(stream, workers=1)['created'] == 1
+    assert not stream.closed
+    ok, user = db.login_user('gita', 'pw')
+    assert ok and user['class_name'] == '9th'
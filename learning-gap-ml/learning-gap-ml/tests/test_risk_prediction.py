@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from learning_gap_shared.model import ModelRegistry
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def registry(flask_app, tmp_path, monkeypatch):
+    """The app's model, loaded from model.pkl in the app directory"""
+    registry = ModelRegistry(model_dir=str(tmp_path / 'models'), fallback=os.path.join(APP_DIR, 'model.pkl'))
+    registry.load()
+    monkeypatch.setattr(flask_app, 'model_registry', registry)
+    return registry
+
+
+def _json_rows(client, rows):
+    response = client.post('/risk-prediction/bulk', json={'rows': rows})
+    assert response.status_code == 200
+    assert response.headers['X-Model-Version']
+    return json.loads(response.get_data(as_text=True))
+
+
+def test_bulk_json_scores_valid_rows(client):
+    results = _json_rows(client, [[2, 1, 85, 3], {'days_absent': 30, 'missed_topics': 10,
+                                                   'avg_marks': 20, 'difficulty_score': 9}])
+    assert [r['risk_level'] for r in results] == ['Low Risk', 'High Risk']
+    assert all(abs(sum(r['probabilities'].values()) - 1) < 1e-6 for r in results)
+
+
+@pytest.mark.parametrize('row', [
+    ['nan', 1, 90, 2],
+    ['inf', 1, 90, 2],
+    [2, '-inf', 90, 2],
+    [2, 1, '1e400', 2],
+    [2, 1, -5, 2],
+    [2, 1, 'lots', 2],
+    [2, 1, 90],
+    [2, 1, None, 2],
+])
+def test_bulk_json_reports_invalid_rows(client, row):
+    results = _json_rows(client, [[2, 1, 85, 3], row])
+    assert results[0]['risk_level'] == 'Low Risk'
+    assert results[1]['risk_level'] is None
+    assert results[1]['error'] == 'invalid feature values'
+    assert 'probabilities' not in results[1]
+
+
+def test_bulk_json_echoes_non_finite_numbers_as_strings(client):
+    # Python's json accepts NaN/Infinity literals and 1e400; the response must stay standard JSON
+    body = '{"rows": [[NaN, 1, 90, 2], [Infinity, 1, 90, 2], [1e400, 1, 90, 2]]}'
+    response = client.post('/risk-prediction/bulk', data=body, content_type='application/json')
+    assert response.status_code == 200
+    results = json.loads(response.get_data(as_text=True),
+                         parse_constant=lambda name: pytest.fail(f'{name} in the response'))
+    assert [r['risk_level'] for r in results] == [None, None, None]
+    assert [r['days_absent'] for r in results] == ['nan', 'inf', 'inf']
+
+
+def test_bulk_csv_marks_invalid_rows(client):
+    upload = ('days_absent,missed_topics,avg_marks,difficulty_score,name\n'
+              '2,1,85,3,Asha\n'
+              'nan,1,90,2,Ben\n'
+              '3,2,inf,4,Chen\n'
+              '30,10,20,9,Dev\n')
+    response = client.post('/risk-prediction/bulk', data={'file': (io.BytesIO(upload.encode()), 'roster.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(r['name'], r['risk_level'], r['error']) for r in rows] == [
+        ('Asha', 'Low Risk', ''),
+        ('Ben', '', 'invalid feature values'),
+        ('Chen', '', 'invalid feature values'),
+        ('Dev', 'High Risk', ''),
+    ]
+
+
+def test_bulk_rejects_bad_requests(client):
+    assert client.post('/risk-prediction/bulk', json={'rows': 'nope'}).status_code == 400
+    missing = io.BytesIO(b'days_absent,missed_topics\n1,2\n')
+    response = client.post('/risk-prediction/bulk', data={'file': (missing, 'roster.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert b'avg_marks' in response.data
+
+
+def test_single_prediction_rejects_non_finite_values(client):
+    form = {'student_name': 'Asha', 'class_name': '8', 'days_absent': 'nan', 'missed_topics': '1',
+            'avg_marks': '90', 'difficulty_score': '2'}
+    response = client.post('/risk-prediction', data=form)
+    assert b'Please enter valid non-negative values' in response.data
@@ -0,0 +1,75 @@
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import train_model
+
+ROWS = 200000
+CHUNK = 10000
+
+
+class RecordingForest(RandomForestClassifier):
+    """Records what the largest live allocation is when a fit starts, and the rows per predict call"""
+    largest = []
+    predicted = []
+
+    def fit(self, X, y, sample_weight=None):
+        assert isinstance(X, np.memmap)
+        RecordingForest.largest.append(max(trace.size for trace in tracemalloc.take_snapshot().traces))
+        return super().fit(X, y, sample_weight)
+
+    def predict(self, X):
+        RecordingForest.predicted.append(len(X))
+        return super().predict(X)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 100, size=(ROWS, len(train_model.FEATURES)))
+    y = (X[:, 2] < 50).astype(int)
+    path = tmp_path / 'students.csv'
+    with open(path, 'w') as f:
+        f.write(','.join(train_model.FEATURES + [train_model.TARGET]) + '\n')
+        np.savetxt(f, np.column_stack([X, y]), fmt='%d', delimiter=',')
+    return str(path)
+
+
+def test_mmap_training_never_copies_the_feature_matrix(dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, 'PARAM_DISTRIBUTIONS', {'n_estimators': [2], 'max_depth': [4]})
+    monkeypatch.setattr(train_model, 'RandomForestClassifier', RecordingForest)
+    RecordingForest.largest, RecordingForest.predicted = [], []
+    matrix_bytes = ROWS * len(train_model.FEATURES) * np.dtype(np.float32).itemsize
+
+    tracemalloc.start()
+    try:
+        artifact, metadata = train_model.train(dataset, str(tmp_path / 'models'), n_iter=1, cv=2, n_jobs=1,
+                                               chunksize=CHUNK, mmap_dir=str(tmp_path))
+    finally:
+        tracemalloc.stop()
+
+    # Two folds and the holdout fit are weighted views of the memmap; the
+    # biggest thing alive is a float64 weight per row, half the matrix
+    assert len(RecordingForest.largest) == 4
+    assert max(RecordingForest.largest) < 0.75 * matrix_bytes
+    assert max(RecordingForest.predicted) <= CHUNK
+    assert not list(tmp_path.glob('features-*.f32'))
+    assert metadata['rows'] == ROWS
+    assert metadata['metrics']['holdout_accuracy'] > 0.95
+    with open(train_model.metadata_path(artifact)) as f:
+        assert json.load(f)['version'] == metadata['version']
+
+
+def test_row_mask_and_predict_rows():
+    weights = train_model.row_mask(5, np.array([1, 3]))
+    assert weights.tolist() == [0, 1, 0, 1, 0]
+
+    X = np.arange(20, dtype=np.float32).reshape(10, 2)
+    y = (X[:, 0] >= 10).astype(np.int8)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+    index = np.arange(10)
+    assert train_model.predict_rows(model, X, index, chunksize=3).tolist() == model.predict(X).tolist()
+    assert len(train_model.predict_rows(model, X, index[:0])) == 0
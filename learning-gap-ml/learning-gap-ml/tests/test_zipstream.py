@@ -0,0 +1,169 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import zipstream
+from catalog import MaterialsCatalog
+from zipstream import BundleCache, manifest, zip_chunks
+
+PDF = b'%PDF-1.4 ' + os.urandom(3000)
+TEXT = b'fractions and decimals\n' * 200
+
+
+def _write(root, relpath, data):
+    path = root.joinpath(*relpath.split('/'))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _zip(chunks):
+    return zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+
+def test_manifest_skips_missing_files_and_tracks_changes(tmp_path):
+    pdf = _write(tmp_path, 'a.pdf', PDF)
+    entries = [('8/a.pdf', str(pdf)), ('8/gone.pdf', str(tmp_path / 'gone.pdf'))]
+    files, etag = manifest(entries)
+    assert [(arcname, size) for arcname, _, size, _ in files] == [('8/a.pdf', len(PDF))]
+    assert manifest(entries)[1] == etag
+
+    replacement = _write(tmp_path, 'new.tmp', b'second version')
+    os.replace(replacement, pdf)
+    assert manifest(entries)[1] != etag
+
+
+def test_round_trip_stores_pdfs_and_deflates_text(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipstream, 'BLOCK_SIZE', 1024)
+    files, _ = manifest([('8/Maths/2026-01-05/unit.pdf', str(_write(tmp_path, 'unit.pdf', PDF))),
+                         ('8/Maths/2026-01-05/notes.txt', str(_write(tmp_path, 'notes.txt', TEXT)))])
+    chunks = list(zip_chunks(files))
+    assert len(chunks) > 3  # yielded block by block, not as one archive
+
+    archive = _zip(chunks)
+    assert archive.testzip() is None
+    assert archive.read('8/Maths/2026-01-05/unit.pdf') == PDF
+    assert archive.read('8/Maths/2026-01-05/notes.txt') == TEXT
+    pdf_info, text_info = archive.infolist()
+    assert pdf_info.compress_type == zipfile.ZIP_STORED
+    assert text_info.compress_type == zipfile.ZIP_DEFLATED
+    assert text_info.compress_size < len(TEXT)
+
+
+def test_edge_cases(tmp_path):
+    assert _zip(zip_chunks([])).namelist() == []
+
+    old = _write(tmp_path, 'old.txt', b'1970')
+    os.utime(old, (0, 0))
+    removed = _write(tmp_path, 'removed.txt', b'soon gone')
+    files, _ = manifest([('old.txt', str(old)), ('removed.txt', str(removed))])
+    removed.unlink()  # after the manifest was taken
+    archive = _zip(zip_chunks(files))
+    assert archive.namelist() == ['old.txt']
+    assert archive.getinfo('old.txt').date_time[0] == 1980  # ZIP dates start in 1980
+
+
+def test_cache_drops_least_recently_used():
+    cache = BundleCache(max_bytes=10, max_entry_bytes=6)
+    cache.put('a', 'ea', b'aaaa')
+    cache.put('b', 'eb', b'bbbb')
+    assert cache.get('a') == ('ea', b'aaaa')  # now b is the oldest
+    cache.put('c', 'ec', b'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+
+    cache.put('big', 'e', b'x' * 7)  # over max_entry_bytes: never stored
+    assert cache.get('big') is None
+    cache.put('a', 'ea2', b'aa')  # replacing an entry frees its old size
+    cache.put('d', 'ed', b'dddd')
+    assert cache.get('a') == ('ea2', b'aa') and cache.get('c') and cache.get('d')
+    cache.clear()
+    assert cache.get('a') is None
+
+
+def test_tee_caches_only_complete_small_archives():
+    cache = BundleCache(max_bytes=100, max_entry_bytes=6)
+    assert list(cache.tee('small', 'e1', [b'ab', b'cd'])) == [b'ab', b'cd']
+    assert cache.get('small') == ('e1', b'abcd')
+
+    assert list(cache.tee('large', 'e2', [b'abcd', b'efgh'])) == [b'abcd', b'efgh']
+    assert cache.get('large') is None
+
+    partial = cache.tee('partial', 'e3', iter([b'ab', b'cd']))
+    next(partial)
+    partial.close()  # the client went away mid-download
+    assert cache.get('partial') is None
+
+
+@pytest.fixture
+def bundles(flask_app, tmp_path, monkeypatch):
+    uploads = tmp_path / 'uploads'
+    _write(uploads, '8/Maths/2026-01-05/fractions.pdf', PDF)
+    _write(uploads, '8/Maths/2026-01-12/decimals.txt', TEXT)
+    _write(uploads, '8/Science/2026-01-06/cells.pdf', PDF[:100])
+    _write(uploads, '9/English/2026-01-07/poems.pdf', PDF[:200])
+    catalog = MaterialsCatalog(str(uploads)).build()
+    monkeypatch.setattr(flask_app, 'materials_catalog', catalog)
+    monkeypatch.setattr(flask_app, 'bundle_cache', BundleCache())
+    monkeypatch.setitem(flask_app.app.config, 'UPLOAD_FOLDER', str(uploads))
+    return flask_app
+
+
+@pytest.mark.parametrize('query, names', [
+    ('class_name=8&subject=Maths', ['8/Maths/2026-01-05/fractions.pdf', '8/Maths/2026-01-12/decimals.txt']),
+    ('class_name=8&subject=ALL', ['8/Maths/2026-01-05/fractions.pdf', '8/Maths/2026-01-12/decimals.txt',
+                                  '8/Science/2026-01-06/cells.pdf']),
+    ('', ['8/Maths/2026-01-05/fractions.pdf', '8/Maths/2026-01-12/decimals.txt',
+          '8/Science/2026-01-06/cells.pdf', '9/English/2026-01-07/poems.pdf']),
+    ('class_name=ALL&subject=ALL&from=2026-01-06&to=2026-01-07',
+     ['8/Science/2026-01-06/cells.pdf', '9/English/2026-01-07/poems.pdf']),
+    ('class_name=8&subject=Maths&to=2026-01-05', ['8/Maths/2026-01-05/fractions.pdf']),
+])
+def test_download_all_selections(bundles, client, query, names):
+    response = client.get(f'/download-all?{query}')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=')
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert sorted(archive.namelist()) == names
+    assert archive.testzip() is None
+
+
+@pytest.mark.parametrize('query', ['class_name=10&subject=Maths', 'class_name=8&subject=Maths&from=2026-02-01'])
+def test_empty_selection_is_404(bundles, client, query):
+    assert client.get(f'/download-all?{query}').status_code == 404
+
+
+def test_bundle_is_cached_per_catalog_version(bundles, client, tmp_path):
+    url = '/download-all?class_name=8&subject=Maths'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert 'Content-Length' not in first.headers  # streamed while it is built
+    data = first.data  # the archive is cached once the stream has been read to the end
+    key = (bundles.materials_catalog.version, '8', 'Maths', '', '')
+    assert bundles.bundle_cache.get(key) == (etag.strip('"'), data)
+
+    second = client.get(url)
+    assert second.headers['Content-Length'] == str(len(data)) and second.data == data
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # An upload starts a new catalog version, so the bundle is rebuilt with it
+    _write(tmp_path / 'uploads', '8/Maths/2026-01-19/ratios.pdf', PDF[:50])
+    bundles.materials_catalog.add_file('8', 'Maths', '2026-01-19', 'ratios.pdf')
+    third = client.get(url, headers={'If-None-Match': etag})
+    assert third.status_code == 200 and third.headers['ETag'] != etag
+    assert '8/Maths/2026-01-19/ratios.pdf' in zipfile.ZipFile(io.BytesIO(third.data)).namelist()
+
+
+def test_streamed_bundle_answers_validators(bundles, client, monkeypatch):
+    monkeypatch.setattr(bundles.bundle_cache, 'max_entry_bytes', 0)  # too big to cache: streamed every time
+    url = '/download-all?class_name=ALL&subject=ALL'
+    first = client.get(url)
+    assert 'Content-Length' not in first.headers and zipfile.ZipFile(io.BytesIO(first.data)).testzip() is None
+    etag = first.headers['ETag']
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert (response.status_code, response.data) == (304, b'')
+    assert bundles.bundle_cache.get((bundles.materials_catalog.version, 'ALL', 'ALL', '', '')) is None
+
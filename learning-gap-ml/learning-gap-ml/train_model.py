@@ -1,18 +1,227 @@
+"""Train the risk model and write a versioned artifact.
+
+The dataset is read in typed chunks (optionally spooled to a memory-mapped
+file), hyperparameters are chosen by cross-validated random search run in a
+process pool, and the final forest is fitted on all cores. Holdout and
+cross-validation splits are index arrays: each forest is fitted on the whole
+matrix with zero sample weights for the rows it must not see, so the matrix
+is never copied, and predictions are made chunksize rows at a time. Each run writes
+models/risk-model-<UTC timestamp>-<sha>.joblib (compressed) plus a .json with
+the feature order, parameters, metrics, checksum and training time, which
+model.load_model() and the app's model registry pick up automatically.
+
+    python train_model.py students.csv --n-iter 20 --cv 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+
+from learning_gap_shared.model import ARTIFACT_PREFIX, ARTIFACT_SUFFIX, FEATURES, MODEL_DIR, metadata_path
+
+TARGET = "risk_level"
+CHUNK_SIZE = 250000
+
+PARAM_DISTRIBUTIONS = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [None, 8, 16, 32],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": ["sqrt", None],
+    "class_weight": [None, "balanced"],
+}
+
+
+def load_dataset(csv_file, chunksize=CHUNK_SIZE, mmap_dir=None):
+    """Read features as float32 and labels as int8, chunksize rows at a time.
+
+    With mmap_dir, feature chunks are appended to a raw file there and the
+    result is a read-only np.memmap, so the feature matrix never has to be
+    held in memory at once (the OS pages it in as the trees need it). train()
+    only ever indexes it a chunk at a time.
+    """
+    dtype = {name: np.float32 for name in FEATURES}
+    dtype[TARGET] = np.int8
+    chunks = pd.read_csv(csv_file, usecols=FEATURES + [TARGET], dtype=dtype, chunksize=chunksize)
+
+    labels = []
+    if mmap_dir is None:
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk[FEATURES].to_numpy(np.float32))
+            labels.append(chunk[TARGET].to_numpy(np.int8))
+        X = np.concatenate(parts) if parts else np.empty((0, len(FEATURES)), np.float32)
+    else:
+        fd, raw_path = tempfile.mkstemp(dir=mmap_dir, prefix="features-", suffix=".f32")
+        rows = 0
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(np.ascontiguousarray(chunk[FEATURES].to_numpy(np.float32)).tobytes())
+                labels.append(chunk[TARGET].to_numpy(np.int8))
+                rows += len(chunk)
+        X = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(rows, len(FEATURES)))
+    y = np.concatenate(labels) if labels else np.empty(0, np.int8)
+    return X, y
+
+
+def row_mask(n_rows, index):
+    """Sample weights that keep only the rows in index (zero-weight rows are ignored by the trees)"""
+    weights = np.zeros(n_rows, np.float64)
+    weights[index] = 1.0
+    return weights
+
+
+def predict_rows(model, X, index, chunksize=CHUNK_SIZE):
+    """model.predict(X[index]), copying chunksize rows at a time"""
+    parts = [model.predict(X[index[start:start + chunksize]]) for start in range(0, len(index), chunksize)]
+    return np.concatenate(parts) if parts else np.empty(0, np.int8)
+
 
-def train(csv_file):
-    df = pd.read_csv(csv_file)
+def _fold_score(X, y, params, train_index, test_index, seed, chunksize):
+    model = RandomForestClassifier(**params, n_jobs=1, random_state=seed)
+    model.fit(X, y, sample_weight=row_mask(len(y), train_index))
+    return f1_score(y[test_index], predict_rows(model, X, test_index, chunksize), average="macro")
 
-    X = df[["days_absent","missed_topics","avg_marks","difficulty_score"]]
-    y = df["risk_level"]
 
-    model = RandomForestClassifier()
+def search_params(X, y, train_index, n_iter, cv, n_jobs, seed, chunksize=CHUNK_SIZE):
+    """Cross-validated random search over the rows in train_index.
+
+    Candidates are sampled as RandomizedSearchCV would and every
+    (candidate, fold) pair is fitted in a process pool. Each forest is
+    single-threaded so the pool's workers do not oversubscribe the cores.
+    joblib hands X to the workers as a memory map rather than a copy.
+    """
+    candidates = list(ParameterSampler(PARAM_DISTRIBUTIONS, n_iter, random_state=seed))
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    folds = [(train_index[fit], train_index[held_out])
+             for fit, held_out in folds.split(np.zeros(len(train_index)), y[train_index])]
+    with joblib.parallel_backend("loky"):
+        scores = joblib.Parallel(n_jobs=n_jobs)(
+            joblib.delayed(_fold_score)(X, y, params, fit, held_out, seed, chunksize)
+            for params in candidates for fit, held_out in folds)
+    scores = np.asarray(scores).reshape(len(candidates), len(folds)).mean(axis=1)
+    best = int(np.argmax(scores))
+    return candidates[best], float(scores[best])
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_artifact(model, metadata, model_dir=MODEL_DIR):
+    """Write a compressed, checksummed artifact and then its metadata.
+
+    The metadata file is what marks an artifact as complete, so it is
+    written (atomically) only after the model bytes are in place.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_path, compress=3)
+        checksum = file_sha256(tmp_path)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        artifact = os.path.join(model_dir, f"{ARTIFACT_PREFIX}{stamp}-{checksum[:12]}{ARTIFACT_SUFFIX}")
+        os.replace(tmp_path, artifact)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    metadata = dict(metadata, version=checksum[:12], sha256=checksum,
+                    artifact=os.path.basename(artifact), size=os.path.getsize(artifact))
+    _write_json(metadata_path(artifact), metadata)
+    return artifact, metadata
+
+
+def train(csv_file, model_dir=MODEL_DIR, n_iter=20, cv=5, test_size=0.2, n_jobs=-1,
+          seed=42, chunksize=CHUNK_SIZE, mmap_dir=None):
+    start = time.perf_counter()
+    X, y = load_dataset(csv_file, chunksize, mmap_dir)
+    loaded = time.perf_counter()
+
+    # Split row numbers, not rows: X (possibly a memmap) is never copied
+    train_index, test_index = train_test_split(
+        np.arange(len(y)), test_size=test_size, stratify=y, random_state=seed)
+    train_index.sort()
+    test_index.sort()
+    best_params, cv_score = search_params(X, y, train_index, n_iter, cv, n_jobs, seed, chunksize)
+    searched = time.perf_counter()
+
+    # Holdout metrics for the chosen parameters, then the final fit on every row
+    model = RandomForestClassifier(**best_params, n_jobs=n_jobs, random_state=seed)
+    model.fit(X, y, sample_weight=row_mask(len(y), train_index))
+    predicted = predict_rows(model, X, test_index, chunksize)
+    y_test = y[test_index]
+    metrics = {
+        "cv_f1_macro": round(cv_score, 4),
+        "holdout_accuracy": round(float(accuracy_score(y_test, predicted)), 4),
+        "holdout_f1_macro": round(float(f1_score(y_test, predicted, average="macro")), 4),
+    }
     model.fit(X, y)
+    model.n_jobs = 1  # predictions are per request/batch; avoid spawning threads at serve time
+    finished = time.perf_counter()
+
+    artifact, metadata = save_artifact(model, {
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": os.path.abspath(csv_file),
+        "rows": int(len(y)),
+        "features": FEATURES,
+        "classes": [int(c) for c in model.classes_],
+        "params": best_params,
+        "metrics": metrics,
+        "timings": {
+            "load_seconds": round(loaded - start, 3),
+            "search_seconds": round(searched - loaded, 3),
+            "fit_seconds": round(finished - searched, 3),
+            "total_seconds": round(finished - start, 3),
+        },
+        "sklearn_version": sklearn.__version__,
+    }, model_dir)
+
+    if isinstance(X, np.memmap):
+        os.remove(X.filename)
+    print(f"Model trained successfully! {artifact} (version {metadata['version']})")
+    print(f"  {metadata['rows']} rows, params {best_params}")
+    print(f"  metrics {metrics}, {metadata['timings']['total_seconds']}s total")
+    return artifact, metadata
 
-    joblib.dump(model, "model.pkl")
-    print("Model trained successfully!")
 
 if __name__ == "__main__":
-    train("students.csv")  # your dataset file
+    parser = argparse.ArgumentParser(description="Train the student risk model")
+    parser.add_argument("csv_file", nargs="?", default="students.csv")  # your dataset file
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--n-iter", type=int, default=20, help="hyperparameter candidates to try")
+    parser.add_argument("--cv", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="processes/threads (-1 = all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--mmap-dir", help="spool features to a memory-mapped file in this directory")
+    args = parser.parse_args()
+
+    train(args.csv_file, args.model_dir, args.n_iter, args.cv, args.test_size, args.n_jobs,
+          args.seed, args.chunksize, args.mmap_dir)
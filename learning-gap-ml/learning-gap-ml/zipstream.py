@@ -0,0 +1,141 @@
+"""ZIP archives of uploaded materials, streamed as they are built.
+
+zip_chunks() writes entries with zipfile onto a write-only sink and yields
+the bytes as they are produced. zipfile sees an unseekable stream and
+writes data descriptors instead of seeking back. Nothing is staged on disk,
+and memory holds one block at a time. PDFs and other already-compressed
+types are stored, not deflated again.
+
+BundleCache keeps finished archives in memory, up to a byte budget, so a
+popular bundle is built once per catalog version rather than once per
+download.
+"""
+import hashlib
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+
+BLOCK_SIZE = 1024 * 1024
+# Compressed formats: deflating them again costs CPU and saves nothing
+STORED_EXTENSIONS = {'pdf', 'docx', 'xlsx', 'pptx', 'zip', 'png', 'jpg', 'jpeg', 'gif'}
+CACHE_MAX_BYTES = 128 * 1024 * 1024        # all cached bundles, per process
+CACHE_MAX_ENTRY_BYTES = 32 * 1024 * 1024   # larger bundles are streamed every time
+
+
+class _Sink:
+    """Write-only file object holding zipfile's output until drained"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def manifest(entries):
+    """Stat (arcname, path) pairs; returns ([(arcname, path, size, mtime)], etag).
+
+    Files removed since they were listed are left out. The ETag changes
+    whenever a file is added, removed or replaced.
+    """
+    files = []
+    digest = hashlib.sha1()
+    for arcname, path in entries:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files.append((arcname, path, st.st_size, st.st_mtime))
+        digest.update(f'{arcname}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode('utf-8'))
+    return files, digest.hexdigest()[:32]
+
+
+def zip_chunks(files):
+    """Yield a ZIP of manifest() files piece by piece"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for arcname, path, size, mtime in files:
+            try:
+                f = open(path, 'rb')
+            except OSError:
+                continue  # removed after the manifest was taken
+            with f:
+                info = zipfile.ZipInfo(arcname, time.localtime(max(mtime, 315532800))[:6])  # ZIP dates start in 1980
+                extension = arcname.rsplit('.', 1)[-1].lower() if '.' in arcname else ''
+                info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                info.file_size = size  # lets zipfile pick ZIP64 up front for files over 4 GB
+                with archive.open(info, 'w') as out:
+                    while True:
+                        block = f.read(BLOCK_SIZE)
+                        if not block:
+                            break
+                        out.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+class BundleCache:
+    """Finished archives by key, least recently used dropped first"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()  # key -> (etag, data)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(etag, data) of a cached archive, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, data):
+        if len(data) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (etag, data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self._size -= len(dropped)
+
+    def tee(self, key, etag, chunks):
+        """Pass chunks through, caching the whole archive if it completes and is small enough"""
+        parts, size = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, etag, b''.join(parts))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
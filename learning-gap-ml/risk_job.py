@@ -0,0 +1,132 @@
+"""Batch job that recomputes Student.risk_level with the risk model.
+
+The model was trained on students.csv in the portal app: days absent,
+missed topics, average marks (0-100) and a 1-10 difficulty score per
+student. The Student table's own attendance flag and progress are not on
+that scale, so they are not substituted. The four features are stored as
+nullable Student columns filled by roster imports, and only students with
+all four are scored. Other students keep whatever risk_level they have.
+
+Each student remembers the features and model version its risk_level came
+from (risk_inputs). The query only returns students where that differs, so
+a run rescores just the students whose inputs changed, or everyone after a
+new model is trained. Manual risk_level edits stand until the inputs change.
+
+Usage (run from the app directory, e.g. from cron):
+
+    python risk_job.py                  # one run
+    python risk_job.py --every 15       # rerun every 15 minutes
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import func, or_, select
+
+from app import app, db, Student
+from learning_gap_shared.model import FEATURES, MODEL_FILE, ModelRegistry, predict_risk_batch
+
+CHUNK_SIZE = 5000
+# SQLite allows 32766 bound variables per statement (3.32+); each row binds 3
+MAX_ROWS_PER_UPDATE = 32766 // 3
+
+# Artifacts are trained and stored by the portal app next door
+ML_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'learning-gap-ml')
+model_registry = ModelRegistry(model_dir=os.path.join(ML_APP_DIR, 'models'),
+                               fallback=os.path.join(ML_APP_DIR, MODEL_FILE))
+
+
+def feature_columns():
+    """Student columns holding the model features, in FEATURES order"""
+    return [Student.__table__.c[name] for name in FEATURES]
+
+
+def changed_students_query(version, after_id, limit):
+    """Next chunk of scoreable students whose features or model version differ from risk_inputs"""
+    features = feature_columns()
+    inputs_key = features[0].concat(',')
+    for feature in features[1:]:
+        inputs_key = inputs_key.concat(feature).concat(',')
+    inputs_key = inputs_key.concat(version)
+    return (select(Student.id, inputs_key.label('inputs'), *[f.label(f'f{i}') for i, f in enumerate(features)])
+            .where(Student.id > after_id, *[f.is_not(None) for f in features],
+                   Student.risk_inputs.is_distinct_from(inputs_key))
+            .order_by(Student.id)
+            .limit(limit))
+
+
+def unscored_count():
+    """Students missing one or more features, whom the job leaves alone"""
+    return db.session.scalar(select(func.count()).select_from(Student)
+                             .where(or_(*[f.is_(None) for f in feature_columns()])))
+
+
+def write_risk_levels(rows):
+    """UPDATE ... FROM (VALUES ...) for a chunk of (id, risk_level, risk_inputs).
+
+    Written as driver SQL: compiling a 5000-row VALUES construct through the
+    expression language costs more than executing the update itself. Chunks
+    larger than MAX_ROWS_PER_UPDATE are written in several statements.
+    """
+    table = Student.__tablename__
+    connection = db.session.connection()
+    for start in range(0, len(rows), MAX_ROWS_PER_UPDATE):
+        batch = rows[start:start + MAX_ROWS_PER_UPDATE]
+        sql = (f'WITH scored(id, risk_level, risk_inputs) AS (VALUES {", ".join(["(?, ?, ?)"] * len(batch))}) '
+               f'UPDATE {table} SET risk_level = scored.risk_level, risk_inputs = scored.risk_inputs '
+               f'FROM scored WHERE {table}.id = scored.id')
+        connection.exec_driver_sql(sql, tuple(value for row in batch for value in row))
+
+
+def run(chunk_size=CHUNK_SIZE):
+    """Rescore every student whose inputs changed; returns a summary dict"""
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be at least 1, not {chunk_size}')
+    start = time.perf_counter()
+    loaded = model_registry.current()
+    summary = {'model_version': loaded.version, 'scored': 0, 'levels': {}, 'unscored': unscored_count()}
+
+    after_id = 0
+    while True:
+        rows = db.session.execute(changed_students_query(loaded.version, after_id, chunk_size)).all()
+        if not rows:
+            break
+        labels, _ = predict_risk_batch(loaded.engine, [[r.f0, r.f1, r.f2, r.f3] for r in rows])
+        levels = [label.split()[0] for label in labels]  # 'High Risk' -> 'High'
+        write_risk_levels([(r.id, level, r.inputs) for r, level in zip(rows, levels)])
+        db.session.commit()
+
+        summary['scored'] += len(rows)
+        for level in levels:
+            summary['levels'][level] = summary['levels'].get(level, 0) + 1
+        after_id = rows[-1].id
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def format_summary(summary):
+    levels = ', '.join(f'{level} {n}' for level, n in sorted(summary['levels'].items())) or 'no changes'
+    return (f"rescored {summary['scored']} students with model {summary['model_version']} "
+            f"in {summary['seconds']:.2f}s ({levels}); {summary['unscored']} without all features skipped")
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {value}')
+    return value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute student risk levels with the risk model')
+    parser.add_argument('--chunk-size', type=positive_int, default=CHUNK_SIZE)
+    parser.add_argument('--every', type=float, metavar='MINUTES', help='keep running on this interval')
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            print(f'[OK] {format_summary(run(args.chunk_size))}', flush=True)
+            if not args.every:
+                break
+            time.sleep(args.every * 60)
@@ -0,0 +1,283 @@
+"""Streaming roster import for the Student table.
+
+A roster is a CSV (or XLSX, with openpyxl installed) with one student per
+row. Rows are read one at a time, validated, and upserted on roll_number in
+chunks: each chunk is one executemany INSERT ... ON CONFLICT DO UPDATE in its
+own transaction. Existing students not in the file are left alone, and a
+column missing from the file (or a blank optional cell) keeps the stored value.
+
+The optional days_absent, missed_topics, avg_marks and difficulty_score
+columns are the risk model's features, on the scale of its training data
+(see risk_job.py). Students without all four are not scored.
+
+Usage from the command line (run from the app directory):
+
+    python roster.py roster.csv --chunk-size 5000
+"""
+import csv
+import io
+import math
+import time
+
+from sqlalchemy import bindparam, func
+from sqlalchemy.dialects.sqlite import insert
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+
+# Header spellings accepted for each Student column
+HEADER_ALIASES = {
+    'name': 'name',
+    'student_name': 'name',
+    'roll_number': 'roll_number',
+    'roll_no': 'roll_number',
+    'roll': 'roll_number',
+    'student_class': 'student_class',
+    'class': 'student_class',
+    'section': 'section',
+    'attendance': 'attendance',
+    'progress': 'progress',
+    'risk_level': 'risk_level',
+    'risk': 'risk_level',
+    'days_absent': 'days_absent',
+    'missed_topics': 'missed_topics',
+    'avg_marks': 'avg_marks',
+    'average_marks': 'avg_marks',
+    'difficulty_score': 'difficulty_score',
+    'difficulty': 'difficulty_score',
+}
+REQUIRED = ('name', 'roll_number', 'student_class')
+
+# Used for new students when an optional cell is blank (matches the model defaults)
+DEFAULTS = {'section': None, 'attendance': 'Absent', 'progress': 0, 'risk_level': 'Low'}
+
+# Risk model features: column -> (type, minimum, maximum or None); blank keeps the stored value
+FEATURES = {
+    'days_absent': (int, 0, None),
+    'missed_topics': (int, 0, None),
+    'avg_marks': (float, 0, 100),
+    'difficulty_score': (int, 1, 10),
+}
+
+ATTENDANCE = {'present': 'Present', 'absent': 'Absent'}
+RISK_LEVELS = {'low': 'Low', 'medium': 'Medium', 'high': 'High'}
+
+
+class RosterError(ValueError):
+    """The file as a whole cannot be imported (bad format or header)"""
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheets store 801 as 801.0
+    return str(value).strip()
+
+
+def _normalize_header(header):
+    columns = []
+    for cell in header:
+        key = _cell_text(cell).lower().replace(' ', '_').replace('.', '')
+        columns.append(HEADER_ALIASES.get(key))
+    missing = [c for c in REQUIRED if c not in columns]
+    if missing:
+        raise RosterError(f'Missing required column(s): {", ".join(missing)}')
+    return columns
+
+
+def _iter_records(rows):
+    """Yield (line_number, {column: text}) from raw rows, the first being the header"""
+    rows = iter(rows)
+    try:
+        columns = _normalize_header(next(rows))
+    except StopIteration:
+        raise RosterError('The file is empty')
+    for line, row in enumerate(rows, start=2):
+        if not any(_cell_text(cell) for cell in row):
+            continue
+        record = {}
+        for column, cell in zip(columns, row):
+            if column:
+                record[column] = _cell_text(cell)
+        yield line, record
+
+
+def iter_csv(stream):
+    """Rows of a binary CSV stream, decoded incrementally"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()  # leave the caller's stream open
+
+
+def iter_xlsx(stream):
+    """Rows of the first sheet of an XLSX workbook, read without loading it all"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RosterError('XLSX rosters need openpyxl (pip install openpyxl); upload a CSV instead')
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_roster(stream, filename):
+    """Yield (line_number, record) pairs from a CSV or XLSX upload"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'xlsx':
+        return _iter_records(iter_xlsx(stream))
+    if extension == 'csv':
+        return _iter_records(iter_csv(stream))
+    raise RosterError('Roster must be a .csv or .xlsx file')
+
+
+def clean_record(record):
+    """Validate one roster record; returns Student values or raises ValueError"""
+    name = record.get('name', '')
+    roll_number = record.get('roll_number', '')
+    if not name:
+        raise ValueError('name is required')
+    if len(name) > 100:
+        raise ValueError('name is longer than 100 characters')
+    if not roll_number:
+        raise ValueError('roll_number is required')
+    if len(roll_number) > 20:
+        raise ValueError('roll_number is longer than 20 characters')
+    try:
+        student_class = int(record.get('student_class', ''))
+    except ValueError:
+        raise ValueError(f'class {record.get("student_class")!r} is not a number')
+
+    values = {'name': name, 'roll_number': roll_number, 'student_class': student_class,
+              'section': None, 'attendance': None, 'progress': None, 'risk_level': None}
+
+    if record.get('section'):
+        if len(record['section']) > 10:
+            raise ValueError('section is longer than 10 characters')
+        values['section'] = record['section']
+    if record.get('attendance'):
+        values['attendance'] = ATTENDANCE.get(record['attendance'].lower())
+        if values['attendance'] is None:
+            raise ValueError(f'attendance {record["attendance"]!r} is not Present/Absent')
+    if record.get('progress'):
+        try:
+            progress = int(float(record['progress']))
+        except (ValueError, OverflowError):  # 'nan' and 'abc'; 'inf' and 1e400
+            raise ValueError(f'progress {record["progress"]!r} is not a number')
+        if not 0 <= progress <= 100:
+            raise ValueError(f'progress {progress} is outside 0-100')
+        values['progress'] = progress
+    if record.get('risk_level'):
+        values['risk_level'] = RISK_LEVELS.get(record['risk_level'].lower())
+        if values['risk_level'] is None:
+            raise ValueError(f'risk_level {record["risk_level"]!r} is not Low/Medium/High')
+    for column, (kind, low, high) in FEATURES.items():
+        values[column] = None
+        if record.get(column):
+            try:
+                value = float(record[column])
+            except ValueError:
+                raise ValueError(f'{column} {record[column]!r} is not a number')
+            # nan passes both range comparisons below, and inf is never a real value
+            if not math.isfinite(value):
+                raise ValueError(f'{column} {record[column]!r} is not a number')
+            if kind is int:
+                if not value.is_integer():
+                    raise ValueError(f'{column} {record[column]!r} is not a whole number')
+                value = int(value)
+            if value < low or (high is not None and value > high):
+                raise ValueError(f'{column} {value} is outside {low}-{high if high is not None else "..."}')
+            values[column] = value
+    return values
+
+
+def upsert_statement(table):
+    """INSERT ... ON CONFLICT(roll_number) DO UPDATE, bound per row by executemany.
+
+    Parameters are named p_<column>. Blank optional values (None) fall back to
+    DEFAULTS for new students and keep the stored value for existing ones.
+    """
+    values = {'name': bindparam('p_name'), 'roll_number': bindparam('p_roll_number'),
+              'student_class': bindparam('p_student_class')}
+    for column, default in DEFAULTS.items():
+        values[column] = func.coalesce(bindparam(f'p_{column}'), default)
+    for column in FEATURES:
+        values[column] = bindparam(f'p_{column}')
+    stmt = insert(table).values(values)
+    updates = {'name': stmt.excluded.name, 'student_class': stmt.excluded.student_class}
+    for column in (*DEFAULTS, *FEATURES):
+        updates[column] = func.coalesce(bindparam(f'p_{column}'), table.c[column])
+    return stmt.on_conflict_do_update(index_elements=[table.c.roll_number], set_=updates)
+
+
+def import_roster(session, table, stream, filename, chunk_size=CHUNK_SIZE):
+    """Stream a roster file into table, upserting on roll_number.
+
+    Each chunk of valid rows is written with one executemany and committed,
+    so memory stays bounded by chunk_size whatever the file size. Invalid
+    rows are skipped and reported. Returns a summary dict.
+    """
+    stmt = upsert_statement(table)
+    summary = {'rows': 0, 'imported': 0, 'invalid': 0, 'errors': []}
+    start = time.perf_counter()
+
+    def flush(chunk):
+        session.execute(stmt, chunk)
+        session.commit()
+        summary['imported'] += len(chunk)
+
+    chunk = []
+    try:
+        for line, record in iter_roster(stream, filename):
+            summary['rows'] += 1
+            try:
+                values = clean_record(record)
+            except ValueError as e:
+                summary['invalid'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append(f'line {line}: {e}')
+                continue
+            chunk.append({f'p_{k}': v for k, v in values.items()})
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    except (csv.Error, UnicodeDecodeError) as e:
+        session.rollback()
+        raise RosterError(f'Could not read roster after {summary["rows"]} rows: {e}')
+    except Exception:
+        session.rollback()
+        raise
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['rows_per_sec'] = summary['rows'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def format_summary(summary):
+    return (f"{summary['imported']} students imported, {summary['invalid']} invalid rows skipped "
+            f"({summary['rows']} rows in {summary['seconds']:.2f}s, "
+            f"{summary['rows_per_sec']:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import a student roster (CSV or XLSX)')
+    parser.add_argument('roster')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from app import app, db, Student
+
+    with app.app_context():
+        with open(args.roster, 'rb') as f:
+            summary = import_roster(db.session, Student.__table__, f, args.roster, args.chunk_size)
+    for error in summary['errors']:
+        print(f'[SKIP] {error}')
+    print(f'[OK] {format_summary(summary)}')
@@ -0,0 +1,6 @@
+"""Code shared by the students app and the learning gap portal.
+
+Both apps install this package (pip install -e shared from the repository's
+learning-gap-ml directory) and import its modules by name, for example
+``from learning_gap_shared import metrics``.
+"""
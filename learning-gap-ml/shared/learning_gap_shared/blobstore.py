@@ -0,0 +1,263 @@
+"""Content-addressed storage for uploaded files.
+
+Each distinct file is stored once under <root>/<sha256[:2]>/<sha256>. The
+class/subject/date entries under uploads/ are hard links to that blob, so
+existing download and listing code keeps working while duplicates cost no
+extra disk. The filesystem link count is the reference count: a blob with
+st_nlink == 1 has no references left and can be deleted.
+
+Every link shares one inode, so writing through any of them would change the
+file everywhere it appears. Blobs are made read-only (0444) so such a write
+fails instead. Code that rewrites a file which may be a link must go through
+BlobStore.save() or write_file(), both of which replace the path with a new
+file. Files that are edited or rewritten in place by design (assignment
+submissions, notes.txt) are never adopted.
+
+Usage from the command line (run from the app directory):
+
+    python -m learning_gap_shared.blobstore adopt uploads   # turn existing duplicates into links
+    python -m learning_gap_shared.blobstore gc              # delete unreferenced blobs
+"""
+import fnmatch
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+
+from . import metrics
+
+BLOB_FOLDER = 'blobs'
+CHUNK_SIZE = 1024 * 1024
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH  # 0444
+# Left alone by adopt(): student submission folders and files rewritten by the apps
+ADOPT_SKIP_DIRS = ('class_*_submissions',)
+ADOPT_SKIP_FILES = ('notes.txt',)
+
+
+def _seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def hash_stream(stream):
+    """sha256 hex digest of a stream, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hash_stream(f)
+
+
+def write_file(path, stream):
+    """Write a stream to path as a new file, never through an existing one.
+
+    The bytes go to a temp file beside path that then replaces it, so a path
+    that is a link to a blob is detached rather than overwritten.
+    """
+    dest_dir = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=dest_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(stream, out, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def adoptable(path):
+    """False for files adopt() must leave as plain files (see ADOPT_SKIP_*)"""
+    name = os.path.basename(path)
+    if any(fnmatch.fnmatch(name, pattern) for pattern in ADOPT_SKIP_FILES):
+        return False
+    parts = os.path.normpath(os.path.dirname(path)).split(os.sep)
+    return not any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in ADOPT_SKIP_DIRS)
+
+
+class BlobStore:
+    def __init__(self, root=BLOB_FOLDER):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def refcount(self, digest):
+        """Number of uploads/ entries referring to a blob"""
+        try:
+            return os.stat(self.blob_path(digest)).st_nlink - 1
+        except OSError:
+            return 0
+
+    def _write_temp(self, stream, hasher=None):
+        """Copy a stream into a temp file, optionally hashing it on the way"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                if hasher is not None:
+                    hasher.update(chunk)
+                out.write(chunk)
+        return tmp_path
+
+    def _seal(self, blob):
+        """Make a blob (and so every link to it) read-only"""
+        if stat.S_IMODE(os.stat(blob).st_mode) != READ_ONLY:
+            os.chmod(blob, READ_ONLY)
+
+    def _publish(self, tmp_path, digest):
+        """Move a temp file into place unless the blob already exists"""
+        final = self.blob_path(digest)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.chmod(tmp_path, READ_ONLY)
+        try:
+            # link() fails if the blob exists, so concurrent writers never
+            # replace an inode that references already point to
+            os.link(tmp_path, final)
+        except FileExistsError:
+            pass
+        except OSError:
+            if not os.path.exists(final):
+                shutil.copyfile(tmp_path, final)
+        os.remove(tmp_path)
+
+    def put_stream(self, stream):
+        """Store a stream's bytes once; returns the sha256 digest.
+
+        Seekable streams (Werkzeug spools uploads to memory or a temp file)
+        are hashed first, so a duplicate is never written again. Other
+        streams are hashed while being written to a temp file.
+        """
+        if _seekable(stream):
+            start = stream.tell()
+            digest = hash_stream(stream)
+            if self.exists(digest):
+                return digest
+            stream.seek(start)
+            self._publish(self._write_temp(stream), digest)
+            return digest
+
+        hasher = hashlib.sha256()
+        tmp_path = self._write_temp(stream, hasher)
+        digest = hasher.hexdigest()
+        if self.exists(digest):
+            os.remove(tmp_path)
+        else:
+            self._publish(tmp_path, digest)
+        return digest
+
+    def link(self, digest, dest_path):
+        """Make dest_path a reference to a blob, replacing any existing file"""
+        blob = self.blob_path(digest)
+        self._seal(blob)  # blobs stored before blobs were made read-only
+        dest_dir = os.path.dirname(dest_path) or '.'
+        os.makedirs(dest_dir, exist_ok=True)
+
+        old_digest = None
+        if os.path.exists(dest_path):
+            st, blob_st = os.stat(dest_path), os.stat(blob)
+            if (st.st_dev, st.st_ino) == (blob_st.st_dev, blob_st.st_ino):
+                return  # already refers to this blob
+            if st.st_nlink == 2:
+                # Replacing the last reference to another blob
+                old_digest = hash_file(dest_path)
+
+        tmp_link = os.path.join(dest_dir, f'.{os.path.basename(dest_path)}.{os.getpid()}.tmp')
+        try:
+            os.link(blob, tmp_link)
+        except OSError:
+            # No hard links here (e.g. FAT or another volume): fall back to a copy
+            shutil.copyfile(blob, tmp_link)
+        os.replace(tmp_link, dest_path)
+        if old_digest:
+            self._drop_if_unreferenced(old_digest)
+
+    def _drop_if_unreferenced(self, digest):
+        blob = self.blob_path(digest)
+        try:
+            if os.stat(blob).st_nlink == 1:
+                os.remove(blob)
+        except OSError:
+            pass
+
+    def save(self, stream, dest_path):
+        """Store an upload and reference it at dest_path; returns the digest"""
+        digest = self.put_stream(stream)
+        self.link(digest, dest_path)
+        return digest
+
+    def release(self, path):
+        """Delete a reference, and its blob once no references remain"""
+        st = os.stat(path)
+        if st.st_nlink == 2:
+            # Last reference: find the blob (one read, only on final delete)
+            digest = hash_file(path)
+            os.remove(path)
+            self._drop_if_unreferenced(digest)
+        else:
+            os.remove(path)
+
+    def adopt(self, path):
+        """Turn an existing plain file into a reference to a blob.
+
+        Returns the digest, or None if path is already a reference or is one
+        of the files that must stay plain (see adoptable()).
+        """
+        if not adoptable(path) or os.stat(path).st_nlink > 1:
+            return None
+        with open(path, 'rb') as f:
+            digest = self.put_stream(f)
+        blob = self.blob_path(digest)
+        self._seal(blob)
+        tmp_link = path + f'.{os.getpid()}.tmp'
+        os.link(blob, tmp_link)
+        os.replace(tmp_link, path)
+        return digest
+
+    def gc(self):
+        """Delete blobs that no uploads/ entry refers to; returns the count"""
+        removed = 0
+        with metrics.timer('blobstore_gc'):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                if os.path.abspath(dirpath) == os.path.abspath(self.tmp_dir):
+                    continue
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if os.stat(path).st_nlink == 1:
+                        os.remove(path)
+                        removed += 1
+        return removed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Content-addressed upload storage')
+    parser.add_argument('--root', default=BLOB_FOLDER, help='blob directory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    adopt = sub.add_parser('adopt', help='deduplicate an existing uploads tree')
+    adopt.add_argument('uploads')
+    sub.add_parser('gc', help='remove unreferenced blobs')
+    args = parser.parse_args()
+
+    store = BlobStore(args.root)
+    if args.command == 'adopt':
+        adopted = 0
+        for dirpath, dirnames, filenames in os.walk(args.uploads):
+            for name in filenames:
+                if store.adopt(os.path.join(dirpath, name)):
+                    adopted += 1
+        print(f'Adopted {adopted} files into {args.root}')
+    elif args.command == 'gc':
+        print(f'Removed {store.gc()} unreferenced blobs')
@@ -0,0 +1,73 @@
+"""Cacheable downloads of uploaded materials.
+
+send_material() answers a download with a strong ETag and Last-Modified, so
+repeat requests get a 304. Range requests get a 206, or a 416 if the range
+is past the end of the file. The bytes are streamed from disk in blocks.
+
+A front proxy can send the bytes instead of a Python worker. init_app()
+reads SENDFILE_MODE from the environment:
+
+* 'x-sendfile' (Apache, lighttpd): Flask sends only the X-Sendfile header.
+* 'x-accel' (nginx): the response carries X-Accel-Redirect to
+  X_ACCEL_PREFIX plus the file's path. nginx must map that prefix to the
+  uploads folder as an internal location. Validators are still answered here.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Response, current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+DOWNLOAD_MAX_AGE = 3600
+X_ACCEL_PREFIX = '/protected-uploads/'
+
+
+def init_app(app):
+    """Set the SENDFILE_MODE, X_ACCEL_PREFIX and USE_X_SENDFILE config for send_material()"""
+    app.config.setdefault('SENDFILE_MODE', os.environ.get('SENDFILE_MODE'))
+    app.config.setdefault('X_ACCEL_PREFIX', X_ACCEL_PREFIX)
+    app.config['USE_X_SENDFILE'] = app.config['SENDFILE_MODE'] == 'x-sendfile'
+
+
+def file_etag(st):
+    """Strong validator for a stat result.
+
+    Uploads are immutable hard links to blobs, and a replaced file is a new
+    inode, so inode, size and mtime identify the bytes.
+    """
+    return f'{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}'
+
+
+def send_material(root, filepath, max_age=DOWNLOAD_MAX_AGE):
+    """Send root/filepath as an attachment, with validators and byte ranges.
+
+    A relative root is taken from the working directory, where the apps save
+    their uploads. Raises NotFound for a missing file or a path that escapes
+    root. An unsatisfiable range raises RequestedRangeNotSatisfiable (416).
+    """
+    path = safe_join(root, filepath)
+    if path is None:
+        raise NotFound()
+    path = os.path.abspath(path)
+    if not os.path.isfile(path):
+        raise NotFound()
+    st = os.stat(path)
+    etag = file_etag(st)
+
+    if current_app.config.get('SENDFILE_MODE') == 'x-accel':
+        # nginx serves the bytes (including ranges); we only answer validators
+        response = Response(mimetype=mimetypes.guess_type(filepath)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = current_app.config['X_ACCEL_PREFIX'] + quote(filepath)
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(os.path.basename(filepath))}"
+        response.set_etag(etag)
+        response.last_modified = st.st_mtime
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+    # send_file streams from disk in blocks and answers If-None-Match/If-Modified-Since
+    # with 304 and Range with 206; with USE_X_SENDFILE it sends only the header
+    return send_file(path, as_attachment=True, conditional=True, etag=etag,
+                     last_modified=st.st_mtime, max_age=max_age)
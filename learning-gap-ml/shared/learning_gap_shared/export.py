@@ -0,0 +1,147 @@
+"""Streaming CSV, Parquet and Arrow writers for table exports.
+
+Each writer takes columns as (name, type) pairs and an iterable of row
+batches, where type is 'int', 'float' or 'text'. It yields the encoded
+output batch by batch, so an export can go straight into a Flask Response
+or a file. Memory stays bounded by one batch whatever the total row count.
+Parquet gets one row group per batch.
+
+Parquet and Arrow need pyarrow (the export extra, or pip install pyarrow).
+CSV works without it.
+"""
+import csv
+import io
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+}
+
+
+class ExportError(ValueError):
+    """The export cannot be produced as asked (unknown format or missing pyarrow)"""
+
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportError('Parquet and Arrow exports need pyarrow (pip install pyarrow); use CSV instead')
+    return pyarrow
+
+
+class _Sink:
+    """Write-only file object collecting what the Arrow writers produce until drained"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _record_batch(pa, schema, columns, batch):
+    arrays = []
+    for i, (name, kind) in enumerate(columns):
+        values = [row[i] for row in batch]
+        if kind == 'text':
+            # SQLite columns are loosely typed; a class stored as 7 is still text here
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _arrow_chunks(columns, batches, open_writer):
+    pa = _pyarrow()
+    types = {'int': pa.int64(), 'float': pa.float64(), 'text': pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Sink()
+    writer = open_writer(pa, pa.PythonFile(sink, mode='w'), schema)
+    try:
+        for batch in batches:
+            if batch:
+                writer.write_batch(_record_batch(pa, schema, columns, batch))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _parquet_writer(pa, sink, schema):
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(sink, schema, compression='zstd')
+
+
+def _ipc_writer(pa, sink, schema):
+    return pa.ipc.new_stream(sink, schema)
+
+
+def stream_export(columns, batches, output_format):
+    """Encoded chunks of the export in output_format (a FORMATS key)"""
+    if output_format == 'csv':
+        return csv_chunks(columns, batches)
+    if output_format == 'parquet':
+        return _arrow_chunks(columns, batches, _parquet_writer)
+    if output_format == 'arrow':
+        return _arrow_chunks(columns, batches, _ipc_writer)
+    raise ExportError(f'Unknown export format {output_format!r} (use {", ".join(FORMATS)})')
+
+
+def check_format(output_format):
+    """Fail before any rows are read if output_format cannot be produced here"""
+    if output_format not in FORMATS:
+        raise ExportError(f'Unknown export format {output_format!r} (use {", ".join(FORMATS)})')
+    if output_format != 'csv':
+        _pyarrow()
+
+
+def write_export(path, columns, batches, output_format):
+    """Write an export to path; returns the number of rows written"""
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    mode, encoding = ('w', 'utf-8') if output_format == 'csv' else ('wb', None)
+    with open(path, mode, encoding=encoding, newline='' if encoding else None) as f:
+        for chunk in stream_export(columns, counted(batches), output_format):
+            f.write(chunk)
+    return rows
@@ -0,0 +1,189 @@
+"""Flattened, NumPy-only inference for a fitted RandomForestClassifier.
+
+compile_forest() copies every tree of the forest into one set of flat node
+arrays. Leaves point back at themselves, so walking all trees for all rows
+is a fixed number of vectorized steps (one per level of the deepest tree)
+with no Python loop over rows or trees and none of scikit-learn's per-call
+validation and thread dispatch. Leaf values are stored already normalized
+and summed in tree order, so probabilities match predict_proba exactly.
+
+Usage from the command line (run from the app directory):
+
+    python -m learning_gap_shared.forest export models/risk-model-....joblib   # writes .forest.npz
+    python -m learning_gap_shared.forest check models/risk-model-....joblib    # parity with sklearn
+"""
+import numpy as np
+
+# Rows walked together; bounds the (trees x rows) node-index scratch array
+BLOCK_SIZE = 1024
+
+
+class CompiledForest:
+    """A forest as flat arrays, with predict/predict_proba like the original.
+
+    children holds each node's (left, right) pair flattened, so the next node
+    of a row is children[2 * node + (x[feature[node]] > threshold[node])].
+    Indices are int32 and every lookup is a 1-d take(), the cheapest gather
+    NumPy has.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _apply(self, X):
+        """Leaf index of each row in each tree, shape (n_trees, n_rows)"""
+        flat = X.ravel()
+        row_offsets = np.arange(len(X), dtype=np.int32) * X.shape[1]
+        # Every row starts at the roots, so the first split is a plain column compare
+        go_right = X.T.take(self.feature.take(self.roots), axis=0) > self.threshold.take(self.roots)[:, None]
+        nodes = self.children.take(2 * self.roots[:, None] + go_right)
+        for _ in range(self.depth - 1):
+            go_right = flat.take(self.feature.take(nodes) + row_offsets) > self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X):
+        # scikit-learn compares float32 features against float64 thresholds
+        with np.errstate(over="ignore"):
+            X = np.ascontiguousarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        # A NaN compares False and would silently take the left child, where
+        # scikit-learn rejects the row or routes it its own way; refuse instead
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN, infinity or a value too large for dtype('float32')")
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            # Summing over the leading (tree) axis adds trees in order, like sklearn
+            proba[start:start + len(block)] = self.value.take(self._apply(block), axis=0).sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, children=self.children,
+                 value=self.value, roots=self.roots, depth=self.depth, classes=self.classes_,
+                 n_features=self.n_features_in_)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["feature"], data["threshold"], data["children"], data["value"],
+                       data["roots"], data["depth"], data["classes"], data["n_features"])
+
+
+def compile_forest(model):
+    """Flatten a fitted RandomForestClassifier into a CompiledForest"""
+    trees = [est.tree_ for est in model.estimators_]
+    sizes = [tree.node_count for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+
+    feature, threshold, children, value = [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        ids = np.arange(tree.node_count)
+        leaf = tree.children_left < 0
+        left = np.where(leaf, ids, tree.children_left) + offset
+        right = np.where(leaf, ids, tree.children_right) + offset
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        children.append(np.stack([left, right], axis=1).ravel())
+        # Per-tree probabilities, normalized the way DecisionTreeClassifier does
+        counts = tree.value[:, 0, :len(model.classes_)].astype(np.float64)
+        normalizer = counts.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1.0
+        value.append(counts / normalizer)
+
+    return CompiledForest(
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        children=np.concatenate(children).astype(np.int32),
+        value=np.concatenate(value),
+        roots=offsets.astype(np.int32),
+        depth=max(tree.max_depth for tree in trees),
+        classes=np.asarray(model.classes_),
+        n_features=model.n_features_in_,
+    )
+
+
+def check_parity(model, engine, X):
+    """Raise RuntimeError unless engine and model agree on every row of X"""
+    X = np.asarray(X, dtype=np.float32)
+    expected, actual = model.predict_proba(X), engine.predict_proba(X)
+    if not np.allclose(expected, actual, rtol=0, atol=1e-12):
+        worst = float(np.abs(expected - actual).max())
+        raise RuntimeError(f"compiled forest probabilities differ from predict_proba (max {worst:g})")
+    mismatched = np.flatnonzero(model.predict(X) != engine.predict(X))
+    if len(mismatched):
+        raise RuntimeError(f"compiled forest predictions differ on {len(mismatched)} of {len(X)} rows, "
+                           f"first at row {mismatched[0]}")
+
+
+def sample_inputs(model, rows=1000, seed=0):
+    """Random rows covering each feature's split thresholds, plus the thresholds themselves"""
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    splits = [[] for _ in range(n_features)]
+    for est in model.estimators_:
+        tree = est.tree_
+        internal = tree.children_left >= 0
+        for f, t in zip(tree.feature[internal], tree.threshold[internal]):
+            splits[f].append(t)
+    columns = []
+    for values in splits:
+        low, high = (min(values) - 1, max(values) + 1) if values else (0, 1)
+        column = rng.uniform(low, high, rows)
+        exact = np.asarray(values or [low], dtype=np.float32)
+        # Rows exactly on a threshold exercise the <= comparison
+        column[:min(rows // 4, len(exact))] = rng.choice(exact, min(rows // 4, len(exact)))
+        columns.append(column)
+    return np.column_stack(columns).astype(np.float32)
+
+
+def compile_checked(model):
+    """compile_forest() plus a parity check; returns None if the model can't be compiled"""
+    if not hasattr(model, "estimators_") or not hasattr(model, "predict_proba"):
+        return None
+    try:
+        engine = compile_forest(model)
+        check_parity(model, engine, sample_inputs(model, rows=256))
+    except (AttributeError, RuntimeError, ValueError):
+        return None
+    return engine
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Compile a risk forest to flat NumPy arrays")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="write the compiled forest as .npz")
+    p.add_argument("model")
+    p.add_argument("output", nargs="?")
+    p = sub.add_parser("check", help="compare the compiled forest with model.predict")
+    p.add_argument("model")
+    p.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    engine = compile_forest(model)
+    if args.command == "export":
+        output = args.output or args.model.rsplit(".", 1)[0] + ".forest.npz"
+        engine.save(output)
+        print(f"Wrote {output}: {engine.n_trees} trees, {len(engine.feature)} nodes, depth {engine.depth}")
+    elif args.command == "check":
+        check_parity(model, engine, sample_inputs(model, args.rows))
+        print(f"OK: {args.rows} rows match model.predict and predict_proba")
@@ -0,0 +1,251 @@
+"""Background jobs for work that should not hold up a request.
+
+A job is a row in a small SQLite file (jobs.db by default), so queued work
+survives a crash or restart. A dispatcher thread claims jobs oldest first
+and runs them on a thread pool. Handlers are registered by name, take the
+job's JSON arguments as keywords and return a JSON-serializable result that
+callers can poll with get().
+
+A claim is a lease. If a process dies mid-job, the job is picked up again
+once its lease expires, up to max_attempts times in total. A failing
+handler is retried the same way. Handlers should therefore be safe to run
+twice. Several processes can share one jobs file, and each claims work
+independently. A queue only claims the kinds it has handlers for, so a job
+is never taken by a process that cannot run it.
+
+Usage from the command line (run from the app directory):
+
+    python -m learning_gap_shared.jobs list       # recent jobs and counts by status
+    python -m learning_gap_shared.jobs retry 42   # queue a failed job again
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+
+JOBS_FILE = 'jobs.db'
+WORKERS = 2
+LEASE_SECONDS = 600        # a running job not finished by then is assumed lost
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0        # seconds between checks for jobs queued by other processes
+KEEP_SECONDS = 7 * 86400   # finished jobs are pruned after this long
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+"""
+
+# Oldest queued job of a kind this queue handles (:kinds is a JSON list), or
+# a running one whose lease ran out (its process died)
+CLAIM_SQL = '''UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                   started_at = :now, lease_expires = :lease, error = NULL
+               WHERE id = (SELECT id FROM jobs
+                           WHERE (status = 'queued'
+                                  OR (status = 'running' AND lease_expires < :now AND attempts < :max_attempts))
+                             AND kind IN (SELECT value FROM json_each(:kinds))
+                           ORDER BY id LIMIT 1)
+               RETURNING id, kind, args, attempts'''
+
+ABANDON_SQL = '''UPDATE jobs SET status = 'failed', finished_at = :now, lease_expires = NULL,
+                     error = 'lease expired after the last attempt (worker died?)'
+                 WHERE status = 'running' AND lease_expires < :now AND attempts >= :max_attempts
+                   AND kind IN (SELECT value FROM json_each(:kinds))'''
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_FILE, workers=WORKERS, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.handlers = {}
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._started_pid = None
+        self._slots = None
+        self._executor = None
+        self._conns = threading.local()
+
+    def handler(self, kind):
+        """Decorator registering fn as the handler for jobs of this kind"""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def _conn(self):
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None or getattr(self._conns, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conns.conn, self._conns.pid = conn, os.getpid()
+        return conn
+
+    # ---- producing and polling -------------------------------------------
+
+    def enqueue(self, kind, **args):
+        """Queue a job and return its id; starts the workers if needed"""
+        if kind not in self.handlers:
+            raise ValueError(f'No handler registered for job kind {kind!r}')
+        job_id = self._conn().execute(
+            'INSERT INTO jobs (kind, args, created_at) VALUES (?, ?, ?)',
+            (kind, json.dumps(args), time.time())).lastrowid
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id):
+        """A job as a dict (args and result decoded), or None"""
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['args'] = json.loads(job['args'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        job.pop('lease_expires')
+        return job
+
+    def recent(self, limit=20):
+        rows = self._conn().execute('SELECT id FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self.get(row['id']) for row in rows]
+
+    def stats(self):
+        counts = dict(self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in STATUSES}
+
+    def retry(self, job_id):
+        """Queue a failed job again with a fresh set of attempts"""
+        updated = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, finished_at = NULL WHERE id = ? AND status = 'failed'",
+            (job_id,)).rowcount
+        self._wake.set()
+        return bool(updated)
+
+    def prune(self, keep_seconds=KEEP_SECONDS):
+        return self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - keep_seconds,)).rowcount
+
+    # ---- running ---------------------------------------------------------
+
+    def start(self):
+        """Start the dispatcher and pool in this process (again after a fork)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._slots = threading.Semaphore(self.workers)
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='job-worker')
+            threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True).start()
+            self._started_pid = os.getpid()
+        try:
+            self.prune()
+        except sqlite3.Error:
+            pass
+
+    def _claim(self):
+        now = time.time()
+        params = {'now': now, 'lease': now + self.lease_seconds, 'max_attempts': self.max_attempts,
+                  'kinds': json.dumps(sorted(self.handlers))}
+        conn = self._conn()
+        conn.execute(ABANDON_SQL, params)
+        row = conn.execute(CLAIM_SQL, params).fetchone()
+        return dict(row) if row else None
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            try:
+                job = self._claim()
+            except sqlite3.Error:
+                job = None  # locked by another process; try again shortly
+            if job is None:
+                self._slots.release()
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._executor.submit(self._run, job)
+
+    def _finish(self, job, status, result=None, error=None):
+        # attempts guards against a job that was re-claimed after its lease expired
+        self._conn().execute(
+            '''UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires = NULL
+               WHERE id = ? AND attempts = ?''',
+            (status, result, error, time.time(), job['id'], job['attempts']))
+
+    def _run(self, job):
+        try:
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                raise LookupError(f'No handler registered for job kind {job["kind"]!r}')
+            with metrics.timer(f'job_{job["kind"]}'):
+                result = handler(**json.loads(job['args']))
+            self._finish(job, 'done', result=json.dumps(result))
+        except Exception as e:
+            error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            status = 'queued' if job['attempts'] < self.max_attempts else 'failed'
+            try:
+                self._finish(job, status, error=error)
+            except sqlite3.Error:
+                pass  # the lease will expire and the job will be retried
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def run_pending(self):
+        """Run queued jobs in the calling thread until none are left; returns how many ran"""
+        ran = 0
+        self._slots = self._slots or threading.Semaphore(self.workers)
+        while True:
+            job = self._claim()
+            if job is None:
+                return ran
+            self._slots.acquire()
+            self._run(job)
+            ran += 1
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the background job queue')
+    parser.add_argument('--path', default=JOBS_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('list', help='recent jobs and counts by status')
+    p.add_argument('--limit', type=int, default=20)
+    p = sub.add_parser('retry', help='queue a failed job again')
+    p.add_argument('job_id', type=int)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.path)
+    if args.command == 'list':
+        print(', '.join(f'{status} {n}' for status, n in queue.stats().items()))
+        for job in queue.recent(args.limit):
+            detail = job['error'] if job['status'] == 'failed' else json.dumps(job['result'] or job['args'])
+            print(f"{job['id']:>6}  {job['kind']:<20} {job['status']:<8} attempts {job['attempts']}  {detail}")
+    elif args.command == 'retry':
+        if not queue.retry(args.job_id):
+            raise SystemExit(f'Job {args.job_id} is not a failed job')
+        print(f'Job {args.job_id} queued again')
@@ -0,0 +1,202 @@
+"""Request, SQL, model and filesystem timings in Prometheus text format.
+
+init_app(app) times every request by route and serves /metrics. SQL is
+attributed to the request that ran it. database.py passes each statement
+to record_query() from the sqlite3 trace callback. SQLAlchemy apps call
+it from engine events. Other code wraps work in timer('name').
+
+Set SLOW_REQUEST_MS to log each slower request with the SQL it ran.
+
+Numbers are per process. Behind several workers, each worker reports its
+own counts.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+MAX_LOGGED_QUERIES = 50   # statements kept per request for the slow-request log
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f'{self.name}{_labels(self.labelnames, key)} {value}' for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {series[-1]}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram('http_request_sql_queries', 'SQL statements per request',
+                            ('route',), QUERY_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('http_request_sql_seconds', 'Time spent in SQL per request', ('route',))
+SQL_QUERIES = Counter('sql_queries_total', 'SQL statements executed, inside requests or not')
+OPERATION_SECONDS = Histogram('operation_duration_seconds',
+                              'Timed operations (model inference, filesystem walks, ...)', ('operation',))
+METRICS = [REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS, SQL_QUERIES, OPERATION_SECONDS]
+
+
+class RequestTrace:
+    """SQL issued while handling one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        if seconds is not None:
+            self.sql_seconds += seconds
+        if len(self.statements) < MAX_LOGGED_QUERIES:
+            self.statements.append((statement, seconds))
+
+
+_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+def record_query(statement, seconds=None):
+    """Count a SQL statement against the current request (if any)"""
+    SQL_QUERIES.inc()
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(' '.join(statement.split()), seconds)
+
+
+def record_sql_time(seconds):
+    """Add SQL time not tied to one statement (e.g. a connection held by a query helper)"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.sql_seconds += seconds
+
+
+@contextmanager
+def timer(operation):
+    """Observe the duration of the with-block as operation_duration_seconds{operation=...}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_SECONDS.observe(time.perf_counter() - start, operation=operation)
+
+
+def _format_ms(seconds):
+    return '       -  ' if seconds is None else f'{seconds * 1000:8.2f}ms'
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Time each request by route and serve /metrics.
+
+    With app.config['SLOW_REQUEST_MS'] set, slower requests are logged with
+    their SQL statements.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request():
+        g._metrics_start = time.perf_counter()
+        g._metrics_token = _trace.set(RequestTrace())
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop('_metrics_start', None)
+        token = g.pop('_metrics_token', None)
+        if start is None or token is None:
+            return response
+        seconds = time.perf_counter() - start
+        trace = _trace.get()
+        _trace.reset(token)
+
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        REQUEST_SECONDS.observe(seconds, method=request.method, route=route, status=response.status_code)
+        REQUEST_QUERIES.observe(trace.queries, route=route)
+        REQUEST_SQL_SECONDS.observe(trace.sql_seconds, route=route)
+
+        slow_ms = app.config.get('SLOW_REQUEST_MS')
+        if slow_ms and seconds * 1000 >= float(slow_ms):
+            lines = [f'Slow request {request.method} {request.full_path.rstrip("?")} -> {response.status_code}: '
+                     f'{seconds * 1000:.1f}ms, {trace.queries} queries ({trace.sql_seconds * 1000:.1f}ms SQL)']
+            lines += [f'    {_format_ms(s)} {sql[:300]}' for sql, s in trace.statements]
+            app.logger.warning('\n'.join(lines))
+        return response
+
+    @app.teardown_request
+    def _drop_trace(exc):
+        # after_request is skipped when a request fails before producing a response
+        token = g.pop('_metrics_token', None)
+        if token is not None:
+            _trace.reset(token)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,276 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import joblib
+import numpy as np
+
+from . import metrics
+from .forest import compile_checked
+
+# Trained artifacts (see the portal's train_model.py); MODEL_FILE is used until one exists
+MODEL_DIR = "models"
+MODEL_FILE = "model.pkl"
+ARTIFACT_PREFIX = "risk-model-"
+ARTIFACT_SUFFIX = ".joblib"
+
+# Feature order the model was trained on
+FEATURES = ["days_absent", "missed_topics", "avg_marks", "difficulty_score"]
+
+RISK_LABELS = {
+    0: "Low Risk",
+    1: "Medium Risk",
+    2: "High Risk"
+}
+
+# Rows scored per vectorized predict_proba call in bulk scoring
+BATCH_SIZE = 4096
+
+# A loaded model together with the version string that identifies it. engine is
+# the model compiled to flat arrays (forest.py), or the model itself if it can't be.
+LoadedModel = namedtuple("LoadedModel", ["version", "model", "loaded_at", "signature", "metadata", "engine"])
+
+
+class ArtifactError(ValueError):
+    """A model artifact does not match its metadata (corrupt or incompatible)"""
+
+
+def metadata_path(artifact):
+    """Metadata JSON written next to an artifact"""
+    return artifact[:-len(ARTIFACT_SUFFIX)] + ".json"
+
+
+def iter_artifacts(model_dir=MODEL_DIR):
+    """Artifacts that have their metadata file, newest first.
+
+    train_model.py writes the metadata last, so an artifact without it is
+    still being written (or was abandoned) and is never offered.
+    """
+    try:
+        names = set(os.listdir(model_dir))
+    except OSError:
+        return
+    artifacts = [n for n in names if n.startswith(ARTIFACT_PREFIX) and n.endswith(ARTIFACT_SUFFIX)]
+    for name in sorted(artifacts, reverse=True):  # names embed a UTC timestamp
+        if name[:-len(ARTIFACT_SUFFIX)] + ".json" in names:
+            yield os.path.join(model_dir, name)
+
+
+def load_model(path=None, model_dir=MODEL_DIR):
+    """Load a model file, or by default the newest artifact that verifies"""
+    if path:
+        return _load_versioned(path).model
+    for artifact in iter_artifacts(model_dir):
+        try:
+            return _load_versioned(artifact).model
+        except ArtifactError:
+            continue
+    return _load_versioned(MODEL_FILE).model
+
+
+def _file_signature(path):
+    """Cheap change-detection key for a model file (path + mtime + size)"""
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _read_metadata(path):
+    if not path.endswith(ARTIFACT_SUFFIX):
+        return None
+    try:
+        with open(metadata_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"{path}: unreadable metadata ({e})")
+
+
+def _load_versioned(path):
+    """Read a model file once, hash its bytes and unpickle it.
+
+    Artifacts are checked against their metadata: the sha256 must match and
+    the feature order must be the one this module scores with.
+    """
+    signature = _file_signature(path)
+    metadata = _read_metadata(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if metadata is not None:
+        if metadata.get("sha256") != digest:
+            raise ArtifactError(f"{path}: checksum does not match metadata")
+        if metadata.get("features") != FEATURES:
+            raise ArtifactError(f"{path}: trained on features {metadata.get('features')}")
+    with metrics.timer("model_load"):
+        model = joblib.load(io.BytesIO(raw))
+        engine = compile_checked(model) or model
+    return LoadedModel(digest[:12], model, time.time(), signature, metadata or {}, engine)
+
+
+class ModelRegistry:
+    """Process-wide holder of the active risk model.
+
+    The model is unpickled once and then served from memory. Unless a fixed
+    path is given, the active file is the newest artifact in model_dir that
+    verifies (else fallback, MODEL_FILE by default). When that changes (a new artifact,
+    or the file's mtime/size), the new version is loaded on a background
+    thread and swapped in with a single reference assignment, so requests
+    never wait on disk I/O. The previously active version is kept for rollback.
+    """
+
+    def __init__(self, path=None, model_dir=MODEL_DIR, fallback=MODEL_FILE, check_interval=2.0):
+        self.path = path
+        self.model_dir = model_dir
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._active = None
+        self._previous = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._pinned_signature = None
+        self._rejected = set()  # signatures of artifacts that failed verification
+
+    def _candidate(self):
+        """Path of the file that should be active"""
+        if self.path:
+            return self.path
+        for artifact in iter_artifacts(self.model_dir):
+            try:
+                if _file_signature(artifact) not in self._rejected:
+                    return artifact
+            except OSError:
+                continue
+        return self.fallback
+
+    def _load_candidate(self):
+        while True:
+            path = self._candidate()
+            try:
+                return _load_versioned(path)
+            except ArtifactError:
+                if path == self.path:
+                    raise
+                self._rejected.add(_file_signature(path))
+
+    def load(self):
+        """Synchronously load the model file and make it active"""
+        with self._reload_lock:
+            self._swap(self._load_candidate())
+        return self._active
+
+    def _swap(self, loaded):
+        if self._active is not None and self._active.version == loaded.version:
+            # Same bytes touched on disk: keep the warm instance
+            self._active = self._active._replace(signature=loaded.signature)
+            return
+        self._previous = self._active
+        self._active = loaded
+        self._pinned_signature = None
+
+    def _reload_in_background(self):
+        if not self._reload_lock.acquire(blocking=False):
+            return  # a reload is already in flight
+
+        def worker():
+            try:
+                self._swap(self._load_candidate())
+            except Exception:
+                # Half-written or corrupt file: keep serving the current model
+                pass
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=worker, name="model-reload", daemon=True).start()
+
+    def _check_for_update(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            signature = _file_signature(self._candidate())
+        except OSError:
+            return
+        if signature != self._active.signature and signature != self._pinned_signature:
+            self._reload_in_background()
+
+    def current(self):
+        """Return the active LoadedModel, loading it on first use"""
+        if self._active is None:
+            return self.load()
+        self._check_for_update()
+        return self._active
+
+    def rollback(self):
+        """Reactivate the previous model version; returns it, or None"""
+        with self._reload_lock:
+            if self._previous is None:
+                return None
+            self._active, self._previous = self._previous, self._active
+            # Do not immediately reload the file we just rolled away from
+            try:
+                self._pinned_signature = _file_signature(self._candidate())
+            except OSError:
+                self._pinned_signature = None
+            return self._active
+
+    def info(self):
+        """Summary of the active and previous versions"""
+        active, previous = self._active, self._previous
+        return {
+            "path": active.signature[0] if active else self.path,
+            "active": active.version if active else None,
+            "loaded_at": active.loaded_at if active else None,
+            "trained_at": active.metadata.get("trained_at") if active else None,
+            "metrics": active.metadata.get("metrics") if active else None,
+            "engine": type(active.engine).__name__ if active else None,
+            "previous": previous.version if previous else None,
+        }
+
+
+registry = ModelRegistry()
+
+
+def predict_risk(model, data):
+    """Label for one feature row; model may be a CompiledForest (microseconds) or an estimator"""
+    input_data = np.array([data])
+    with metrics.timer("model_predict"):
+        prediction = model.predict(input_data)[0]
+
+    return RISK_LABELS[prediction]
+
+
+def probability_columns(model):
+    """Column names for predict_proba output, e.g. p_low_risk"""
+    return ["p_" + RISK_LABELS[c].lower().replace(" ", "_") for c in model.classes_]
+
+
+def predict_risk_batch(model, rows):
+    """Score many feature rows with a single predict_proba call.
+
+    Returns (labels, probabilities) where probabilities has one column per
+    entry of model.classes_. The label is the argmax class, which is exactly
+    what RandomForestClassifier.predict computes.
+    """
+    X = np.asarray(rows, dtype=float).reshape(-1, len(FEATURES))
+    if len(X) == 0:
+        return [], np.empty((0, len(model.classes_)))
+    with metrics.timer("model_predict_batch"):
+        proba = model.predict_proba(X)
+    classes = model.classes_.take(proba.argmax(axis=1))
+    return [RISK_LABELS[c] for c in classes], proba
+
+
+def iter_batches(iterable, size=BATCH_SIZE):
+    """Yield lists of at most size items from any iterable"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,99 @@
+"""Plain text and other facts from uploaded materials.
+
+TXT files are read directly and DOCX text is pulled out of the document
+XML. PDF text needs pypdf (the pdf extra); without it, PDFs are indexed
+by title only. Text is capped at MAX_CHARS per document.
+
+page_count() and make_thumbnail() run in background jobs after an upload.
+Thumbnails need Pillow (the thumbnails extra) and are skipped without it.
+"""
+import html
+import os
+import re
+import zipfile
+
+MAX_CHARS = 200000
+
+_DOCX_PARAGRAPH = re.compile(r'</w:p>')
+_XML_TAG = re.compile(r'<[^>]+>')
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+THUMBNAIL_SIZE = (200, 200)
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+
+def _read_txt(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read(MAX_CHARS)
+
+
+def _read_docx(path):
+    with zipfile.ZipFile(path) as z:
+        xml = z.read('word/document.xml').decode('utf-8', errors='replace')
+    return html.unescape(_XML_TAG.sub('', _DOCX_PARAGRAPH.sub('\n', xml)))[:MAX_CHARS]
+
+
+def _read_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ''
+    parts, size = [], 0
+    for page in PdfReader(path).pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        size += len(text)
+        if size >= MAX_CHARS:
+            break
+    return '\n'.join(parts)[:MAX_CHARS]
+
+
+READERS = {'txt': _read_txt, 'docx': _read_docx, 'pdf': _read_pdf}
+
+
+def extract_text(path):
+    """Searchable text of a file, or '' if the type is unsupported or unreadable"""
+    reader = READERS.get(_extension(path))
+    if reader is None:
+        return ''
+    try:
+        return reader(path)
+    except Exception:
+        # A damaged upload should still be indexed by its title
+        return ''
+
+
+def _extension(path):
+    return os.path.splitext(path)[1][1:].lower()
+
+
+def page_count(path):
+    """Pages in a PDF, or None for other types and unreadable files"""
+    if _extension(path) != 'pdf':
+        return None
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(path).pages)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    # Without pypdf, count page objects. Exact for ordinary PDFs; pages kept
+    # in compressed object streams are not seen.
+    with open(path, 'rb') as f:
+        return len(_PDF_PAGE.findall(f.read())) or None
+
+
+def make_thumbnail(path, dest):
+    """Write a PNG thumbnail of an image upload to dest; returns dest, or None if skipped"""
+    if _extension(path) not in IMAGE_EXTENSIONS:
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.save(dest, 'PNG')
+    return dest
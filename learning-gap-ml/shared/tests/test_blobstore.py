@@ -0,0 +1,57 @@
+import io
+import os
+import stat
+
+from learning_gap_shared.blobstore import BlobStore, READ_ONLY, adoptable, write_file
+
+
+def _store(tmp_path):
+    return BlobStore(str(tmp_path / 'blobs'))
+
+
+def test_save_links_read_only_blob(tmp_path):
+    store = _store(tmp_path)
+    a, b = tmp_path / 'uploads' / 'a.pdf', tmp_path / 'uploads' / 'b.pdf'
+    digest = store.save(io.BytesIO(b'same bytes'), str(a))
+    assert store.save(io.BytesIO(b'same bytes'), str(b)) == digest
+    assert store.refcount(digest) == 2
+    assert stat.S_IMODE(os.stat(store.blob_path(digest)).st_mode) == READ_ONLY
+
+
+def test_link_seals_existing_writable_blob(tmp_path):
+    store = _store(tmp_path)
+    digest = store.put_stream(io.BytesIO(b'old blob'))
+    os.chmod(store.blob_path(digest), 0o644)  # stored before blobs were sealed
+    store.link(digest, str(tmp_path / 'uploads' / 'a.txt'))
+    assert stat.S_IMODE(os.stat(store.blob_path(digest)).st_mode) == READ_ONLY
+
+
+def test_write_file_detaches_link(tmp_path):
+    store = _store(tmp_path)
+    a, b = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    digest = store.save(io.BytesIO(b'shared'), str(a))
+    store.save(io.BytesIO(b'shared'), str(b))
+    write_file(str(a), io.BytesIO(b'edited'))
+    assert a.read_bytes() == b'edited'
+    assert b.read_bytes() == b'shared'
+    assert open(store.blob_path(digest), 'rb').read() == b'shared'
+    assert store.refcount(digest) == 1
+
+
+def test_adopt_skips_submissions_and_notes(tmp_path):
+    store = _store(tmp_path)
+    paths = {
+        'material': tmp_path / 'uploads' / '8' / 'Maths' / 'sheet.pdf',
+        'notes': tmp_path / 'uploads' / '8' / 'Maths' / 'notes.txt',
+        'submission': tmp_path / 'uploads' / 'class_8_submissions' / 'essay.pdf',
+    }
+    for path in paths.values():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'content')
+    assert not adoptable(str(paths['notes']))
+    assert not adoptable(str(paths['submission']))
+    assert store.adopt(str(paths['material']))
+    assert store.adopt(str(paths['notes'])) is None
+    assert store.adopt(str(paths['submission'])) is None
+    assert os.stat(paths['notes']).st_nlink == 1
+    assert os.stat(paths['submission']).st_nlink == 1
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+from flask import Flask
+
+from learning_gap_shared.downloads import DOWNLOAD_MAX_AGE, init_app, send_material
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    path = tmp_path / 'uploads' / '8' / 'Maths'
+    path.mkdir(parents=True)
+    (path / 'unit 1.pdf').write_bytes(DATA)
+    return tmp_path / 'uploads'
+
+
+@pytest.fixture
+def app(uploads, monkeypatch):
+    monkeypatch.delenv('SENDFILE_MODE', raising=False)
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route('/download/<path:filepath>')
+    def download(filepath):
+        return send_material(str(uploads), filepath)
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+URL = '/download/8/Maths/unit%201.pdf'
+
+
+def test_full_download_has_validators(client):
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert not response.headers['ETag'].startswith('W/')
+    assert response.headers['Last-Modified']
+    assert response.cache_control.max_age == DOWNLOAD_MAX_AGE
+    assert response.headers['Content-Disposition'].startswith('attachment')
+
+
+def test_not_modified(client):
+    first = client.get(URL)
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    for headers in ({'If-None-Match': etag}, {'If-Modified-Since': last_modified}):
+        response = client.get(URL, headers=headers)
+        assert response.status_code == 304
+        assert response.data == b''
+    assert client.get(URL, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_partial_content(client):
+    response = client.get(URL, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(DATA)}'
+    assert response.data == DATA[100:200]
+
+    etag = response.headers['ETag']
+    resumed = client.get(URL, headers={'Range': 'bytes=5000-', 'If-Range': etag})
+    assert (resumed.status_code, resumed.data) == (206, DATA[5000:])
+    stale = client.get(URL, headers={'Range': 'bytes=5000-', 'If-Range': '"stale"'})
+    assert (stale.status_code, stale.data) == (200, DATA)
+    assert client.get(URL, headers={'Range': f'bytes={len(DATA)}-'}).status_code == 416
+
+
+def test_replaced_file_gets_a_new_etag(client, uploads):
+    etag = client.get(URL).headers['ETag']
+    replacement = uploads / '8' / 'Maths' / 'new.tmp'
+    replacement.write_bytes(b'second version')
+    os.replace(replacement, uploads / '8' / 'Maths' / 'unit 1.pdf')
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert (response.status_code, response.data) == (200, b'second version')
+
+
+def test_missing_and_escaping_paths(client):
+    assert client.get('/download/8/Maths/missing.pdf').status_code == 404
+    assert client.get('/download/8/Maths').status_code == 404  # a directory
+    assert client.get('/download/../uploads/8/Maths/unit%201.pdf').status_code == 404
+
+
+def test_x_accel_sends_headers_and_answers_validators(app, client):
+    app.config['SENDFILE_MODE'] = 'x-accel'
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/8/Maths/unit%201.pdf'
+    assert response.headers['Content-Type'] == 'application/pdf'
+    assert response.data == b''
+    assert client.get(URL, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_x_sendfile_mode_from_environment(monkeypatch, uploads):
+    monkeypatch.setenv('SENDFILE_MODE', 'x-sendfile')
+    app = Flask(__name__)
+    init_app(app)
+    assert app.config['USE_X_SENDFILE'] is True
+
+    @app.route('/download/<path:filepath>')
+    def download(filepath):
+        return send_material(str(uploads), filepath)
+
+    response = app.test_client().get(URL)
+    assert response.status_code == 200
+    assert response.headers['X-Sendfile'].endswith(os.path.join('8', 'Maths', 'unit 1.pdf'))
+    assert response.data == b''
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+
+from learning_gap_shared.export import ExportError, check_format, stream_export
+
+COLUMNS = [('id', 'int'), ('score', 'float'), ('class_name', 'text')]
+BATCHES = [[(1, 0.5, '8'), (2, None, 'bca')], [(3, 1.0, 9)]]
+
+
+def test_csv_streams_batch_by_batch():
+    chunks = list(stream_export(COLUMNS, iter(BATCHES), 'csv'))
+    assert ''.join(chunks).splitlines() == ['id,score,class_name', '1,0.5,8', '2,,bca', '3,1.0,9']
+    assert len(chunks) == len(BATCHES) + 1
+
+
+def test_unknown_format():
+    with pytest.raises(ExportError):
+        check_format('xlsx')
+
+
+def test_parquet_round_trip():
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = b''.join(stream_export(COLUMNS, iter(BATCHES), 'parquet'))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 3
+    assert table.column('class_name').to_pylist() == ['8', 'bca', '9']
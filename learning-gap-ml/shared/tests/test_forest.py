@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from learning_gap_shared.forest import BLOCK_SIZE, CompiledForest, compile_forest, sample_inputs
+
+
+def _training_data(n_classes, rows=600, seed=0):
+    """Four features on the risk data's scale, labels from a noisy score"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(0, 13, rows), rng.integers(0, 11, rows),
+                         rng.uniform(40, 100, rows), rng.integers(1, 11, rows)]).astype(float)
+    score = X[:, 0] + X[:, 1] - X[:, 2] / 10 + X[:, 3] / 2 + rng.normal(0, 2, rows)
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+@pytest.fixture(scope='module', params=[
+    {'n_classes': 3, 'n_estimators': 50},
+    {'n_classes': 3, 'n_estimators': 20, 'max_depth': 3, 'bootstrap': False},
+    {'n_classes': 2, 'n_estimators': 30, 'min_samples_leaf': 5, 'max_features': None},
+    {'n_classes': 3, 'n_estimators': 1, 'max_depth': 1},
+], ids=['default', 'shallow', 'binary', 'stump'])
+def fitted(request):
+    params = dict(request.param)
+    X, y = _training_data(params.pop('n_classes'))
+    model = RandomForestClassifier(random_state=0, **params).fit(X, y)
+    return model, compile_forest(model)
+
+
+def _assert_parity(model, engine, X):
+    X = np.asarray(X, dtype=np.float32)
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(engine.predict(X), model.predict(X))
+
+
+def test_parity_on_sampled_inputs(fitted):
+    model, engine = fitted
+    # Spans several BLOCK_SIZE blocks, with a partial one at the end
+    _assert_parity(model, engine, sample_inputs(model, rows=3 * BLOCK_SIZE + 17, seed=1))
+
+
+def test_parity_on_thresholds_and_neighbours(fitted):
+    model, engine = fitted
+    rows = []
+    for tree in (est.tree_ for est in model.estimators_):
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue  # leaf
+            for value in (threshold, np.nextafter(np.float32(threshold), np.float32(-np.inf)),
+                          np.nextafter(np.float32(threshold), np.float32(np.inf))):
+                row = np.full(model.n_features_in_, 0, dtype=np.float32)
+                row[feature] = value
+                rows.append(row)
+    if not rows:
+        pytest.skip('forest has no splits')
+    _assert_parity(model, engine, rows)
+
+
+def test_parity_on_edge_cases(fitted):
+    model, engine = fitted
+    big = 1e30  # far outside any threshold, still finite after sklearn's checks
+    edge = [
+        [0, 0, 0, 0],
+        [-1, -1, -1, -1],
+        [big, big, big, big],
+        [-big, -big, -big, -big],
+        [12, 10, 45, 10],
+        [0, 0, 100, 1],
+    ]
+    _assert_parity(model, engine, edge)
+    _assert_parity(model, engine, edge[:1])  # a single row
+
+
+@pytest.mark.parametrize('value', [np.nan, np.inf, -np.inf, 1e39], ids=['nan', 'inf', '-inf', 'float32-overflow'])
+def test_non_finite_input_is_rejected(fitted, value):
+    model, engine = fitted
+    rows = np.array([[3, 2, 75, 5], [value, 2, 75, 5]])
+    with pytest.raises(ValueError):
+        engine.predict_proba(rows)
+    with pytest.raises(ValueError):
+        engine.predict(rows)
+    if not np.isnan(value):
+        # scikit-learn refuses these too; NaN it routes by its own missing-value rule
+        with pytest.raises(ValueError), np.errstate(over='ignore'):
+            model.predict_proba(rows)
+    # The finite row on its own still matches
+    _assert_parity(model, engine, rows[:1])
+
+
+def test_predict_accepts_python_lists(fitted):
+    model, engine = fitted
+    rows = [[3, 2, 75, 5], [9, 7, 50, 8]]
+    np.testing.assert_array_equal(engine.predict(rows), model.predict(np.asarray(rows, dtype=np.float32)))
+
+
+def test_save_and_load(fitted, tmp_path):
+    model, engine = fitted
+    path = tmp_path / 'forest.npz'
+    engine.save(path)
+    loaded = CompiledForest.load(path)
+    X = sample_inputs(model, rows=500, seed=2)
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+    np.testing.assert_array_equal(loaded.classes_, model.classes_)
@@ -0,0 +1,51 @@
+from learning_gap_shared.jobs import JobQueue
+
+
+def _queue(path, *kinds):
+    queue = JobQueue(str(path))
+    for kind in kinds:
+        queue.handler(kind)(lambda **args: args)
+    return queue
+
+
+def test_run_pending_runs_own_jobs(tmp_path):
+    queue = _queue(tmp_path / 'jobs.db', 'echo')
+    job_id = queue._conn().execute(
+        "INSERT INTO jobs (kind, args, created_at) VALUES ('echo', '{\"n\": 1}', 0)").lastrowid
+    assert queue.run_pending() == 1
+    job = queue.get(job_id)
+    assert (job['status'], job['result'], job['attempts']) == ('done', {'n': 1}, 1)
+
+
+def test_queue_leaves_other_kinds_alone(tmp_path):
+    path = tmp_path / 'jobs.db'
+    students, portal = _queue(path, 'inspect_upload'), _queue(path, 'process_material')
+    theirs = students._conn().execute(
+        "INSERT INTO jobs (kind, args, created_at) VALUES ('inspect_upload', '{}', 0)").lastrowid
+    ours = portal._conn().execute(
+        "INSERT INTO jobs (kind, args, created_at) VALUES ('process_material', '{}', 0)").lastrowid
+
+    assert portal.run_pending() == 1
+    assert portal.get(ours)['status'] == 'done'
+    job = portal.get(theirs)
+    assert (job['status'], job['attempts']) == ('queued', 0)
+
+    assert students.run_pending() == 1
+    assert students.get(theirs)['status'] == 'done'
+
+
+def test_queue_without_handlers_claims_nothing(tmp_path):
+    path = tmp_path / 'jobs.db'
+    _queue(path, 'echo')._conn().execute(
+        "INSERT INTO jobs (kind, args, created_at) VALUES ('echo', '{}', 0)")
+    assert _queue(path).run_pending() == 0
+
+
+def test_expired_lease_of_other_kind_is_not_abandoned(tmp_path):
+    path = tmp_path / 'jobs.db'
+    owner = _queue(path, 'echo')
+    job_id = owner._conn().execute(
+        "INSERT INTO jobs (kind, args, status, attempts, created_at, lease_expires) "
+        "VALUES ('echo', '{}', 'running', 3, 0, 1)").lastrowid
+    _queue(path, 'other').run_pending()
+    assert owner.get(job_id)['status'] == 'running'
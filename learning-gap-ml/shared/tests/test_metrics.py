@@ -0,0 +1,130 @@
+import logging
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from learning_gap_shared import metrics
+
+
+def _sample(name, **labels):
+    """Value of one rendered sample, or None if it is not there"""
+    label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    prefix = f'{name}{{{label_text}}} ' if labels else f'{name} '
+    for line in metrics.render().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('test_seconds', 'Test', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, op='a')
+    assert histogram.render() == [
+        '# HELP test_seconds Test',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{op="a",le="0.1"} 2',
+        'test_seconds_bucket{op="a",le="1.0"} 3',
+        'test_seconds_bucket{op="a",le="+Inf"} 4',
+        'test_seconds_sum{op="a"} 3.65',
+        'test_seconds_count{op="a"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = metrics.Counter('test_total', 'Test', ('path',))
+    counter.inc(path='a"b\\c\nd')
+    counter.inc(2, path='a"b\\c\nd')
+    assert counter.render()[-1] == 'test_total{path="a\\"b\\\\c\\nd"} 3'
+
+
+def test_timer_observes_failures_too():
+    with metrics.timer('test_ok'):
+        pass
+    with pytest.raises(RuntimeError), metrics.timer('test_fails'):
+        raise RuntimeError('boom')
+    assert _sample('operation_duration_seconds_count', operation='test_ok') == 1
+    assert _sample('operation_duration_seconds_count', operation='test_fails') == 1
+
+
+def test_queries_outside_a_request_are_only_counted():
+    before = _sample('sql_queries_total') or 0
+    metrics.record_query('SELECT 1')
+    assert _sample('sql_queries_total') == before + 1
+    assert metrics._trace.get() is None
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    metrics.init_app(app)
+    # Autocommit, so no implicit BEGIN is traced between the counted statements
+    conn = sqlite3.connect(tmp_path / 'test.db', check_same_thread=False, isolation_level=None)
+    conn.set_trace_callback(metrics.record_query)
+    conn.execute('CREATE TABLE t (x INTEGER)')
+
+    @app.route('/items/<int:n>')
+    def items(n):
+        for i in range(n):
+            conn.execute('INSERT INTO t VALUES (?)', (i,))
+        return str(conn.execute('SELECT COUNT(*) FROM t').fetchone()[0])
+
+    @app.route('/broken')
+    def broken():
+        conn.execute('SELECT 1')
+        raise RuntimeError('boom')
+
+    yield app
+    conn.close()
+
+
+def test_requests_are_timed_by_route_with_their_sql(app):
+    client = app.test_client()
+    assert client.get('/items/2').status_code == 200
+    assert client.get('/items/3').status_code == 200
+    route = '/items/<int:n>'
+    assert _sample('http_request_duration_seconds_count', method='GET', route=route, status=200) == 2
+    # 3 and 4 statements: the INSERTs plus the SELECT
+    assert _sample('http_request_sql_queries_sum', route=route) == 7
+    assert _sample('http_request_sql_queries_bucket', route=route, le=5) == 2
+    assert _sample('http_request_sql_seconds_count', route=route) == 2
+
+
+def test_unmatched_and_failed_requests(app):
+    client = app.test_client()
+    assert client.get('/nowhere').status_code == 404
+    assert _sample('http_request_duration_seconds_count', method='GET', route='<unmatched>', status=404) >= 1
+    assert client.get('/broken').status_code == 500
+    assert _sample('http_request_duration_seconds_count', method='GET', route='/broken', status=500) == 1
+    assert metrics._trace.get() is None
+
+
+def test_metrics_endpoint(app):
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE http_request_duration_seconds histogram' in response.get_data(as_text=True)
+
+
+def test_slow_requests_are_logged_with_their_sql(app, caplog):
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/items/1')
+        assert not caplog.records  # SLOW_REQUEST_MS unset
+
+        app.config['SLOW_REQUEST_MS'] = 0.0001
+        client.get(f'/items/{metrics.MAX_LOGGED_QUERIES + 5}?fast=no')
+    [record] = caplog.records
+    lines = record.getMessage().splitlines()
+    assert lines[0].startswith(f'Slow request GET /items/{metrics.MAX_LOGGED_QUERIES + 5}?fast=no -> 200: ')
+    assert f'{metrics.MAX_LOGGED_QUERIES + 6} queries' in lines[0]
+    assert len(lines) == 1 + metrics.MAX_LOGGED_QUERIES
+    assert lines[1].strip().endswith('INSERT INTO t VALUES (0)')
+
+
+def test_slow_threshold_is_respected(app, caplog):
+    app.config['SLOW_REQUEST_MS'] = 60_000
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        app.test_client().get('/items/1')
+    assert not caplog.records
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+import pytest
+
+# The app creates its database and uploads/ when imported, and its job queue
+# lives next to app.py, so both are pointed at a scratch directory and the app
+# is only imported from inside fixtures
+WORK_DIR = tempfile.mkdtemp(prefix='students-app-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'students.db')
+os.environ['JOBS_DB'] = os.path.join(WORK_DIR, 'jobs.db')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def work_dir():
+    cwd = os.getcwd()
+    os.chdir(WORK_DIR)
+    yield WORK_DIR
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_starts_no_job_workers(tmp_path):
+    """Scripts that import the app (risk_job.py, roster.py) must not run queued jobs"""
+    script = ('import threading\n'
+              'import app\n'
+              'assert app.job_queue._started_pid is None\n'
+              'names = [thread.name for thread in threading.enumerate()]\n'
+              'assert not any(name.startswith("job-") for name in names), names\n'
+              'app.app.test_client().get("/")\n'
+              'assert any(thread.name == "job-dispatcher" for thread in threading.enumerate())\n')
+    env = dict(os.environ, PYTHONPATH=APP_DIR, DATABASE_URL=f'sqlite:///{tmp_path / "students.db"}',
+               JOBS_DB=str(tmp_path / 'jobs.db'))
+    subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, check=True, timeout=120)
+
+
+def test_job_queue_path_is_absolute_by_default(tmp_path):
+    script = 'import app\nprint(app.job_queue.path)\n'
+    env = dict(os.environ, PYTHONPATH=APP_DIR, DATABASE_URL=f'sqlite:///{tmp_path / "students.db"}')
+    env.pop('JOBS_DB', None)
+    out = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, check=True,
+                         capture_output=True, text=True, timeout=120).stdout.strip()
+    assert out == os.path.join(APP_DIR, 'jobs.db')
@@ -0,0 +1,37 @@
+import os
+
+
+def _upload(relpath, data):
+    from app import app
+    path = os.path.join(app.config['UPLOAD_FOLDER'], relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return '/uploads/' + relpath
+
+
+def test_conditional_get_and_ranges(client):
+    data = bytes(range(256)) * 16
+    url = _upload('8/worksheet.pdf', data)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == data
+    etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+    partial = client.get(url, headers={'Range': 'bytes=1000-', 'If-Range': etag})
+    assert partial.status_code == 206
+    assert partial.headers['Content-Range'] == f'bytes 1000-{len(data) - 1}/{len(data)}'
+    assert partial.data == data[1000:]
+    assert client.get(url, headers={'Range': f'bytes={len(data)}-'}).status_code == 416
+
+
+def test_download_streams_from_disk(client):
+    url = _upload('8/large.pdf', os.urandom(8 * 1024 * 1024))
+    response = client.get(url, buffered=False)
+    assert response.is_streamed
+    chunks = [len(chunk) for chunk in response.response]
+    response.close()
+    assert sum(chunks) == 8 * 1024 * 1024
+    assert max(chunks) < 1024 * 1024
@@ -0,0 +1,73 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+CLASS = 43
+
+
+@pytest.fixture(scope='module')
+def submissions():
+    from app import app, db, Assignment, Student
+
+    with app.app_context():
+        student = Student(name='Export, Asha', roll_number='QE1', student_class=CLASS)
+        db.session.add(student)
+        db.session.flush()
+        for title, subject, day in [('Essay', 'English', 31), ('Fractions', 'Maths', 1), ('Cells', 'Science', 2)]:
+            submitted = datetime(2026, 1, 31, 23, 59) if day == 31 else datetime(2026, 2, day, 8, 0)
+            db.session.add(Assignment(student_id=student.id, student_name=student.name,
+                                      roll_number=student.roll_number, class_id=CLASS, filename=f'{title}.pdf',
+                                      assignment_title=f'{title} "draft"', subject=subject,
+                                      submitted_date=submitted))
+        db.session.commit()
+    return app
+
+
+def _rows(client, query):
+    response = client.get(f'/teacher/export/submissions?class={CLASS}&{query}')
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_csv_round_trip(submissions, client):
+    from app import SUBMISSION_EXPORT_COLUMNS
+
+    response = client.get(f'/teacher/export/submissions?class={CLASS}')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=submissions.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert list(rows[0]) == [name for name, _ in SUBMISSION_EXPORT_COLUMNS]
+    assert [(row['student_name'], row['assignment_title'], row['subject']) for row in rows] == [
+        ('Export, Asha', 'Essay "draft"', 'English'), ('Export, Asha', 'Fractions "draft"', 'Maths'),
+        ('Export, Asha', 'Cells "draft"', 'Science')]
+    assert rows[0]['submitted_date'].startswith('2026-01-31 23:59')
+
+
+def test_filters_and_inclusive_dates(submissions, client, monkeypatch):
+    monkeypatch.setattr('app.EXPORT_BATCH_SIZE', 1)  # streamed one row per batch
+    assert [row['subject'] for row in _rows(client, 'subject=Maths')] == ['Maths']
+    # 'to' takes in the whole day, so the submission late on the 31st is included
+    assert [row['subject'] for row in _rows(client, 'from=2026-01-31&to=2026-01-31')] == ['English']
+    assert [row['subject'] for row in _rows(client, 'from=2026-02-01')] == ['Maths', 'Science']
+    assert _rows(client, 'from=2026-03-01') == []
+
+
+def test_parquet_round_trip(submissions, client):
+    pq = pytest.importorskip('pyarrow.parquet')
+    response = client.get(f'/teacher/export/submissions?class={CLASS}&format=parquet')
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.data)).num_rows == 3
+
+
+@pytest.mark.parametrize('query, message', [
+    ('class=eighth', "class must be a number, not 'eighth'"),
+    ('from=31/01/2026', 'from must be a date'),
+    ('to=2026-02-30', 'to must be a date'),
+    ('format=xlsx', 'xlsx'),
+])
+def test_bad_requests(client, query, message):
+    response = client.get(f'/teacher/export/submissions?{query}')
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
@@ -0,0 +1,29 @@
+def _sample(text, prefix):
+    return next(float(line.split()[-1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_sqlalchemy_queries_are_attributed_to_the_request(client):
+    from app import app, query_count
+
+    with app.test_request_context('/teacher/dashboard?class=8'):
+        app.view_functions['dashboard']()
+        statements = query_count()
+    before = client.get('/metrics').get_data(as_text=True)
+    route = 'route="/teacher/dashboard"'
+    count_before = sum_before = 0
+    if f'http_request_sql_queries_sum{{{route}}}' in before:
+        count_before = _sample(before, f'http_request_sql_queries_count{{{route}}}')
+        sum_before = _sample(before, f'http_request_sql_queries_sum{{{route}}}')
+
+    assert client.get('/teacher/dashboard?class=8').status_code == 200
+    after = client.get('/metrics').get_data(as_text=True)
+    assert _sample(after, f'http_request_sql_queries_count{{{route}}}') == count_before + 1
+    assert _sample(after, f'http_request_sql_queries_sum{{{route}}}') == sum_before + statements
+    assert _sample(after, f'http_request_sql_seconds_sum{{{route}}}') > 0
+
+
+def test_metrics_endpoint_is_prometheus_text(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert '# TYPE sql_queries_total counter' in response.get_data(as_text=True)
@@ -0,0 +1,61 @@
+import argparse
+
+import pytest
+
+ROWS = 11000  # 33000 bound variables in one chunk, past SQLite's 32766
+
+
+@pytest.fixture(scope='module')
+def scoreable():
+    from app import app, db, Student
+
+    with app.app_context():
+        db.session.execute(Student.__table__.insert(), [
+            {'name': f'Risk {i}', 'roll_number': f'RJ{i}', 'student_class': 11, 'days_absent': i % 13,
+             'missed_topics': i % 11, 'avg_marks': 40 + i % 60, 'difficulty_score': 1 + i % 10}
+            for i in range(ROWS)])
+        db.session.commit()
+    return app
+
+
+def _levels(app):
+    from app import db, Student
+
+    with app.app_context():
+        return dict(db.session.query(Student.risk_level, db.func.count())
+                    .filter(Student.student_class == 11, Student.risk_inputs.is_not(None))
+                    .group_by(Student.risk_level).all())
+
+
+def test_chunk_larger_than_the_variable_limit(scoreable):
+    import risk_job
+
+    with scoreable.app_context():
+        summary = risk_job.run(chunk_size=ROWS)
+        assert summary['scored'] >= ROWS
+        assert sum(_levels(scoreable).values()) == ROWS
+        assert set(_levels(scoreable)) <= {'Low', 'Medium', 'High'}
+        # Nothing changed, so nothing is rescored
+        assert risk_job.run(chunk_size=ROWS)['scored'] == 0
+
+
+def test_small_statements_write_every_row(scoreable, monkeypatch):
+    import risk_job
+    from app import db, Student
+
+    monkeypatch.setattr(risk_job, 'MAX_ROWS_PER_UPDATE', 7)
+    with scoreable.app_context():
+        db.session.query(Student).filter(Student.student_class == 11).update({'risk_inputs': None})
+        db.session.commit()
+        assert risk_job.run(chunk_size=100)['scored'] >= ROWS
+        assert sum(_levels(scoreable).values()) == ROWS
+
+
+@pytest.mark.parametrize('chunk_size', [0, -5])
+def test_chunk_size_must_be_positive(chunk_size):
+    import risk_job
+
+    with pytest.raises(ValueError):
+        risk_job.run(chunk_size=chunk_size)
+    with pytest.raises(argparse.ArgumentTypeError):
+        risk_job.positive_int(str(chunk_size))
@@ -0,0 +1,106 @@
+import io
+
+import pytest
+
+from roster import RosterError, clean_record, import_roster
+
+HEADER = 'name,roll_number,class,progress,attendance\n'
+
+
+def _import(csv_text, chunk_size=2):
+    from app import app, db, Student
+
+    with app.app_context():
+        return import_roster(db.session, Student.__table__, io.BytesIO(csv_text.encode()), 'roster.csv',
+                             chunk_size=chunk_size)
+
+
+def _student(roll_number):
+    from app import app, Student
+
+    with app.app_context():
+        return Student.query.filter_by(roll_number=roll_number).one_or_none()
+
+
+@pytest.mark.parametrize('progress', ['inf', '-inf', '1e400', 'nan', 'lots'])
+def test_clean_record_reports_non_finite_progress(progress):
+    record = {'name': 'Asha', 'roll_number': 'R1', 'student_class': '8', 'progress': progress}
+    with pytest.raises(ValueError, match='progress .* is not a number'):
+        clean_record(record)
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'roll_number': 'R1', 'student_class': '8'}, 'name is required'),
+    ({'name': 'Asha', 'student_class': '8'}, 'roll_number is required'),
+    ({'name': 'Asha', 'roll_number': 'R1', 'student_class': 'eight'}, 'is not a number'),
+    ({'name': 'Asha', 'roll_number': 'R1', 'student_class': '8', 'progress': '101'}, 'outside 0-100'),
+    ({'name': 'Asha', 'roll_number': 'R1', 'student_class': '8', 'attendance': 'late'}, 'Present/Absent'),
+    ({'name': 'Asha', 'roll_number': 'R1', 'student_class': '8', 'risk_level': 'dire'}, 'Low/Medium/High'),
+])
+def test_clean_record_rejects(record, message):
+    with pytest.raises(ValueError, match=message):
+        clean_record(record)
+
+
+def test_bad_rows_are_reported_and_the_rest_imported():
+    summary = _import(HEADER +
+                      'Asha,R13-1,8,50,present\n'
+                      'Ben,R13-2,8,inf,present\n'
+                      'Chen,R13-3,8,1e400,absent\n'
+                      ',R13-4,8,10,present\n'
+                      'Dev,R13-5,8,75,absent\n')
+    assert (summary['rows'], summary['imported'], summary['invalid']) == (5, 2, 3)
+    assert summary['errors'] == ["line 3: progress 'inf' is not a number",
+                                 "line 4: progress '1e400' is not a number",
+                                 'line 5: name is required']
+    assert _student('R13-1').progress == 50
+    assert _student('R13-5').attendance == 'Absent'
+    assert _student('R13-2') is None
+
+
+def test_reimport_updates_and_keeps_blank_cells():
+    _import(HEADER + 'Esha,R13-6,8,40,present\n')
+    summary = _import(HEADER + 'Esha K,R13-6,9,,\n')
+    assert summary['imported'] == 1
+    student = _student('R13-6')
+    assert (student.name, student.student_class, student.progress, student.attendance) == ('Esha K', 9, 40, 'Present')
+
+
+def test_unreadable_files_raise_roster_error():
+    with pytest.raises(RosterError, match='Missing required column'):
+        _import('name,class\nAsha,8\n')
+    with pytest.raises(RosterError, match='empty'):
+        _import('')
+    from app import app, db, Student
+    with app.app_context(), pytest.raises(RosterError, match='.csv or .xlsx'):
+        import_roster(db.session, Student.__table__, io.BytesIO(b''), 'roster.txt')
+
+
+def test_upload_with_bad_cell_is_not_a_server_error(client):
+    data = {'file': (io.BytesIO((HEADER + 'Farah,R13-7,8,inf,present\nGita,R13-8,8,20,present\n').encode()),
+                     'roster.csv')}
+    response = client.post('/teacher/roster/import', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert b'is not a number' in response.data
+    assert _student('R13-8') is not None
+
+
+@pytest.mark.parametrize('column, value', [
+    ('avg_marks', 'nan'), ('avg_marks', 'inf'), ('days_absent', 'nan'), ('difficulty_score', '-inf'),
+    ('missed_topics', '1e400'),
+])
+def test_clean_record_rejects_non_finite_features(column, value):
+    record = {'name': 'Asha', 'roll_number': 'R1', 'student_class': '8', column: value}
+    with pytest.raises(ValueError, match=f'{column} .* is not a number'):
+        clean_record(record)
+
+
+def test_feature_columns_are_validated_on_import():
+    summary = _import('name,roll_number,class,days_absent,missed_topics,avg_marks,difficulty_score\n'
+                      'Hari,R17-1,8,2,1,85.5,3\n'
+                      'Isha,R17-2,8,2,1,nan,3\n'
+                      'Jai,R17-3,8,2,1,101,3\n')
+    assert (summary['imported'], summary['invalid']) == (1, 2)
+    student = _student('R17-1')
+    assert (student.days_absent, student.missed_topics, student.avg_marks, student.difficulty_score) == (2, 1, 85.5, 3)
+    assert _student('R17-2') is None
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The student table as created before risk_inputs and the feature columns existed
+OLD_STUDENT_TABLE = '''CREATE TABLE student (
+    id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, roll_number VARCHAR(20) NOT NULL UNIQUE,
+    student_class INTEGER NOT NULL, section VARCHAR(10), attendance VARCHAR(10), progress INTEGER,
+    risk_level VARCHAR(20), last_active DATETIME)'''
+
+
+def test_app_upgrades_old_database_on_import(tmp_path):
+    db_file = tmp_path / 'students.db'
+    with sqlite3.connect(db_file) as conn:
+        conn.execute(OLD_STUDENT_TABLE)
+        conn.execute("INSERT INTO student (name, roll_number, student_class, attendance, progress, risk_level) "
+                     "VALUES ('Arjun Kumar', '801', 8, 'Present', 85, 'Low')")
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_file}')
+    script = ('from app import app\n'
+              'response = app.test_client().get("/teacher/dashboard")\n'
+              'assert response.status_code == 200, response.status_code\n')
+    subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=dict(env, PYTHONPATH=APP_DIR),
+                   check=True, timeout=120)
+
+    with sqlite3.connect(db_file) as conn:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(student)')}
+        indexes = {row[1] for row in conn.execute('PRAGMA index_list(student)')}
+    assert {'risk_inputs', 'days_absent', 'missed_topics', 'avg_marks', 'difficulty_score'} <= columns
+    assert 'ix_student_class_attendance' in indexes
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+# SQL statements /student/dashboard may issue, whatever the page size or data
+STUDENT_DASHBOARD_QUERY_BUDGET = 2
+
+
+@pytest.fixture(scope='module')
+def school():
+    from app import app, db, Assignment, Material, Student
+
+    start = datetime(2026, 1, 1)
+    with app.app_context():
+        students = [Student(name=f'Budget {i}', roll_number=f'QB{i}', student_class=7, attendance='Present')
+                    for i in range(3)]
+        db.session.add_all(students)
+        db.session.flush()
+        db.session.add_all(Material(filename=f'm{i}.pdf', class_id=7, title=f'Material {i}', subject='Maths',
+                                    uploaded_date=start + timedelta(hours=i)) for i in range(12))
+        db.session.add_all(Assignment(student_id=students[0].id, student_name=students[0].name,
+                                      roll_number=students[0].roll_number, class_id=7, filename=f'a{i}.pdf',
+                                      assignment_title=f'Homework {i}', subject='Maths',
+                                      submitted_date=start + timedelta(hours=i)) for i in range(12))
+        db.session.commit()
+    return app
+
+
+@pytest.mark.parametrize('url', [
+    '/student/dashboard?class=7',
+    '/student/dashboard?class=7&roll=QB0',
+    '/student/dashboard?class=7&roll=QB1',        # no submissions
+    '/student/dashboard?class=7&roll=missing',
+])
+def test_student_dashboard_query_budget(school, url):
+    from app import query_count, student_dashboard
+
+    with school.test_request_context(url):
+        page = student_dashboard()  # loads and renders, as a request would
+        count = query_count()
+    assert 'Material 11' in page
+    assert count <= STUDENT_DASHBOARD_QUERY_BUDGET, f'{url} issued {count} statements'
+
+
+def test_student_dashboard_pages_stay_within_budget(school):
+    from app import load_student_dashboard, query_count
+
+    materials_before = submissions_before = None
+    seen_materials, seen_submissions = [], []
+    while True:
+        with school.test_request_context():
+            data = load_student_dashboard(7, 'QB0', materials_before, submissions_before, page_size=5)
+            assert query_count() <= STUDENT_DASHBOARD_QUERY_BUDGET
+        seen_materials += [m.title for m in data['materials']]
+        seen_submissions += [s.assignment_title for s in data['student_submissions']]
+        if not (data['next_materials'] or data['next_submissions']):
+            break
+        materials_before = _cursor(data['next_materials'])
+        submissions_before = _cursor(data['next_submissions'])
+    assert seen_materials == [f'Material {i}' for i in reversed(range(12))]
+    assert seen_submissions == [f'Homework {i}' for i in reversed(range(12))]
+
+
+def _cursor(value):
+    from app import decode_cursor
+    return decode_cursor(value) if value else None
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+CLASS = 41
+PAGE_SIZE = 3
+
+
+@pytest.fixture(scope='module')
+def school():
+    from app import app, db, Assignment, Student
+
+    start = datetime(2026, 1, 1)
+    with app.app_context():
+        students = [Student(name=f'Paged {i}', roll_number=f'QP{i}', student_class=CLASS,
+                            attendance='Present' if i % 3 else 'Absent') for i in range(7)]
+        students.append(Student(name='Paged new', roll_number='QP7', student_class=CLASS, attendance=None))
+        db.session.add_all(students)
+        db.session.flush()
+        # Six submissions over four distinct times: pages split ties on submitted_date by id
+        times = [start, start, start + timedelta(days=1), start + timedelta(days=2),
+                 start + timedelta(days=2), start + timedelta(days=3)]
+        db.session.add_all(Assignment(student_id=students[0].id, student_name=students[0].name,
+                                      roll_number=students[0].roll_number, class_id=CLASS, filename=f'p{i}.pdf',
+                                      assignment_title=f'Essay {i}', subject='English', submitted_date=when)
+                           for i, when in enumerate(times))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def dashboard(school, monkeypatch):
+    """Call the view and return the context it renders with"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, 'DASHBOARD_PAGE_SIZE', PAGE_SIZE)
+    monkeypatch.setattr(app_module, 'render_template', lambda template, **context: context)
+
+    def load(**args):
+        with school.test_request_context('/teacher/dashboard', query_string={'class': CLASS, **args}):
+            context = app_module.dashboard()
+            context['query_count'] = app_module.query_count()
+        return context
+    return load
+
+
+def test_attendance_counts(dashboard):
+    context = dashboard()
+    # Students without an attendance value count as absent
+    assert (context['total_students'], context['present_today'], context['absent_today']) == (8, 4, 4)
+
+
+def test_submissions_are_paged_newest_first(dashboard):
+    seen, before, pages = [], None, 0
+    while True:
+        context = dashboard(**({'before': before} if before else {}))
+        assert len(context['assignments']) <= PAGE_SIZE
+        assert context['query_count'] <= 3  # counts, students, submissions: the same on every page
+        seen += [a.assignment_title for a in context['assignments']]
+        pages += 1
+        before = context['next_before']
+        if not before:
+            break
+    # Six rows fill exactly two pages, so the second page has no "older" link
+    assert pages == 2
+    assert seen == ['Essay 5', 'Essay 4', 'Essay 3', 'Essay 2', 'Essay 1', 'Essay 0']
+
+
+def test_cursor_between_equal_timestamps(dashboard):
+    from app import decode_cursor, encode_cursor
+
+    first = dashboard(before=encode_cursor(datetime(2026, 1, 3), 10 ** 9))
+    assert [a.assignment_title for a in first['assignments']] == ['Essay 4', 'Essay 3', 'Essay 2']
+    essay_1 = next(a for a in dashboard(before=first['next_before'])['assignments'] if a.assignment_title == 'Essay 1')
+    # A cursor on Essay 1 returns only the older row with the same submitted_date
+    rest = dashboard(before=encode_cursor(essay_1.submitted_date, essay_1.id))
+    assert [a.assignment_title for a in rest['assignments']] == ['Essay 0']
+    assert rest['next_before'] is None
+    assert decode_cursor(encode_cursor(essay_1.submitted_date, essay_1.id)) == (essay_1.submitted_date, essay_1.id)
+
+
+@pytest.mark.parametrize('cursor', ['', 'garbage', '2026-01-01', 'not-a-date_5', '2026-01-01T00:00:00_x'])
+def test_invalid_cursor_shows_the_newest_page(dashboard, cursor):
+    from app import decode_cursor
+
+    assert decode_cursor(cursor) is None
+    context = dashboard(before=cursor)
+    assert [a.assignment_title for a in context['assignments']] == ['Essay 5', 'Essay 4', 'Essay 3']
+
+
+def test_students_are_paged_by_id(dashboard):
+    seen, after = [], None
+    while True:
+        context = dashboard(**({'after_student': after} if after else {}))
+        assert len(context['students']) <= PAGE_SIZE
+        seen += [s.roll_number for s in context['students']]
+        after = context['next_student']
+        if not after:
+            break
+        assert after == context['students'][-1].id
+    assert seen == [f'QP{i}' for i in range(8)]
+
+
+def test_empty_class(dashboard):
+    from app import encode_cursor
+
+    context = dashboard(**{'class': 42})
+    assert (context['total_students'], context['present_today'], context['absent_today']) == (0, 0, 0)
+    assert context['students'] == [] and context['assignments'] == []
+    assert context['next_student'] is None and context['next_before'] is None
+    assert dashboard(**{'class': 42, 'before': encode_cursor(datetime(2026, 1, 1), 1)})['assignments'] == []
+
+
+def test_dashboard_page_renders(client, school):
+    response = client.get(f'/teacher/dashboard?class={CLASS}')
+    assert response.status_code == 200
+    assert b'Essay 0' in response.data  # everything fits on a default-sized page
+    assert b'Older submissions' not in response.data